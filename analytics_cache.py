@@ -0,0 +1,150 @@
+"""Precomputed aggregates for the analytics page"""
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from config import VECTORSTORE_PATH, ANALYTICS_SUMMARY_FILE
+
+# Summary name -> dataset column whose value counts are kept
+CATEGORY_COLUMNS = {
+    'muscle': 'Main_muscle',
+    'difficulty': 'Difficulty (1-5)',
+    'equipment': 'Equipment',
+    'mechanics': 'Mechanics',
+    'utility': 'Utility'
+}
+
+
+def _rows_fingerprint(rows):
+    """Content hash of the summarised columns of some rows"""
+    import pandas as pd
+    columns = [c for c in CATEGORY_COLUMNS.values() if c in rows.columns]
+    hashes = pd.util.hash_pandas_object(rows[columns], index=False).values
+    return hashlib.md5(hashes.tobytes()).hexdigest()
+
+
+class AnalyticsSummary:
+    """Counts behind every analytics chart, small enough to keep as JSON.
+
+    ``fingerprint`` is the dataset file fingerprint the summary was made
+    for and ``content_hash`` the hash of the rows it counts, so when rows are
+    appended to the file only the new ones are folded in (``add_rows``).
+    """
+
+    def __init__(self, fingerprint, total=0, counts=None, difficulty_sum=0.0, difficulty_count=0, created_at=None,
+                 content_hash=None):
+        self.fingerprint = fingerprint
+        self.content_hash = content_hash
+        self.total = total
+        self.counts = {name: Counter(counts.get(name, {}) if counts else {}) for name in CATEGORY_COLUMNS}
+        self.difficulty_sum = difficulty_sum
+        self.difficulty_count = difficulty_count
+        self.created_at = created_at or datetime.now().isoformat()
+
+    @classmethod
+    def from_dataframe(cls, data, fingerprint):
+        summary = cls(fingerprint, content_hash=_rows_fingerprint(data))
+        summary._accumulate(data)
+        return summary
+
+    def _accumulate(self, rows):
+        self.total += len(rows)
+        for name, column in CATEGORY_COLUMNS.items():
+            if column in rows.columns:
+                values = rows[column].dropna()
+                if name == 'difficulty':
+                    values = values.astype(int)
+                self.counts[name].update(str(v) for v in values)
+
+        difficulty = rows[CATEGORY_COLUMNS['difficulty']].dropna()
+        self.difficulty_sum += float(difficulty.sum())
+        self.difficulty_count += int(len(difficulty))
+
+    def covers_prefix_of(self, data):
+        """True if the rows counted so far are exactly the first rows of ``data``"""
+        return self.content_hash is not None and self.total <= len(data) and \
+            _rows_fingerprint(data.iloc[:self.total]) == self.content_hash
+
+    def add_rows(self, data, fingerprint):
+        """Count the rows of ``data`` past the ones already counted; ``covers_prefix_of(data)`` must hold"""
+        self._accumulate(data.iloc[self.total:])
+        self.fingerprint = fingerprint
+        self.content_hash = _rows_fingerprint(data)
+        self.created_at = datetime.now().isoformat()
+        return self
+
+    @property
+    def num_muscles(self):
+        return len(self.counts['muscle'])
+
+    @property
+    def num_equipment(self):
+        return len(self.counts['equipment'])
+
+    @property
+    def avg_difficulty(self):
+        return self.difficulty_sum / self.difficulty_count if self.difficulty_count else 0.0
+
+    def top(self, name, n=None):
+        """(value, count) pairs ordered by count, like ``value_counts``"""
+        return self.counts[name].most_common(n)
+
+    def to_dict(self):
+        return {
+            'fingerprint': self.fingerprint,
+            'content_hash': self.content_hash,
+            'created_at': self.created_at,
+            'total': self.total,
+            'counts': {name: dict(counter) for name, counter in self.counts.items()},
+            'difficulty_sum': self.difficulty_sum,
+            'difficulty_count': self.difficulty_count
+        }
+
+    @classmethod
+    def from_dict(cls, payload):
+        return cls(payload['fingerprint'], payload['total'], payload['counts'],
+                   payload['difficulty_sum'], payload['difficulty_count'], payload.get('created_at'),
+                   payload.get('content_hash'))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_or_build_summary(processor, fingerprint, path=None):
+    """Load the stored summary if it matches the fingerprint, otherwise update or rebuild and store it.
+
+    When the data only gained rows at the end, the stored counts are kept
+    and just the new rows are added.
+    """
+    path = path or os.path.join(VECTORSTORE_PATH, ANALYTICS_SUMMARY_FILE)
+    stored = None
+    if os.path.exists(path):
+        try:
+            stored = AnalyticsSummary.load(path)
+            if stored.fingerprint == fingerprint:
+                return stored
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring unreadable analytics summary: {e}")
+
+    data = processor.download_and_load_data()
+    if stored is not None and stored.covers_prefix_of(data):
+        print(f"📊 Adding {len(data) - stored.total} new rows to the analytics summary...")
+        summary = stored.add_rows(data, fingerprint)
+    else:
+        print("📊 Computing analytics summary...")
+        summary = AnalyticsSummary.from_dataframe(data, fingerprint)
+    try:
+        summary.save(path)
+    except OSError as e:
+        print(f"⚠️ Could not save analytics summary: {e}")
+    return summary
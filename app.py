@@ -1,22 +1,32 @@
 
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 # import plotly.graph_objects as go
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime
 
 # Import your custom modules
 try:
-    from exercise_recommender import ExerciseRecommender
+    from lazy_imports import lazy_import
     # from visualizations import GymDataVisualizer
     from data_processor import GymDataProcessor
-    from config import VALID_MUSCLES
+    from analytics_cache import load_or_build_summary
+    from lexical_index import normalize_phrase
+    from search_history import SearchHistoryStore
+    from metrics import metrics
+    from config import (VALID_MUSCLES, METRICS_EXPORT_PATH, METRICS_EXPORT_INTERVAL, ANALYTICS_FINGERPRINT_TTL,
+                         RESULTS_PAGE_SIZE, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, HISTORY_TABLE_ROWS, HISTORY_CHART_POINTS)
 except ImportError:
     st.error("Required modules not found. Make sure all the refactored files are in the same directory.")
     st.stop()
 
+# Heavy modules load on the page that needs them: the recommender (torch, FAISS, spaCy)
+# on the search page and plotly on the chart pages
+px = lazy_import("plotly.express")
+exercise_recommender = lazy_import("exercise_recommender")
+
 # Page configuration
 st.set_page_config(
     page_title="💪 Gym Exercise Recommender",
@@ -75,15 +85,24 @@ st.markdown("""
 if 'recommender' not in st.session_state:
     st.session_state.recommender = None
 if 'search_history' not in st.session_state:
-    st.session_state.search_history = []
+    # This session's searches only, in memory; the shared store below never reaches the page
+    st.session_state.search_history = SearchHistoryStore(path=None)
+if 'search_results' not in st.session_state:
+    st.session_state.search_results = None
+if 'results_page' not in st.session_state:
+    st.session_state.results_page = 0
+
+# Partial reruns for the results list where this Streamlit version supports them
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
 
 @st.cache_resource
 def load_recommender():
     """Load and cache the recommender system"""
     try:
         with st.spinner("🔄 Initializing Exercise Recommender..."):
-            recommender = ExerciseRecommender()
+            recommender = exercise_recommender.ExerciseRecommender()
             recommender.initialize()
+            metrics.start_file_exporter(METRICS_EXPORT_PATH, METRICS_EXPORT_INTERVAL)
             # Verify the vectorstore is properly loaded
             if recommender.vectorstore is None:
                 st.error("❌ Failed to initialize vectorstore. Please check your data files.")
@@ -94,11 +113,96 @@ def load_recommender():
         st.info("💡 Make sure you have run the data processing steps and have all required files.")
         return None
 
-@st.cache_data
-def load_gym_data():
-    """Load and cache gym data for analysis"""
-    processor = GymDataProcessor()
-    return processor.generate_exercise_descriptions()
+@st.cache_resource
+def get_search_history():
+    """Process-wide search log, persisted across restarts, for cache prewarming and query counts"""
+    return SearchHistoryStore()
+
+@st.cache_data(ttl=ANALYTICS_FINGERPRINT_TTL, show_spinner=False)
+def get_data_fingerprint():
+    """Fingerprint of the dataset file, re-checked at most once per TTL"""
+    return GymDataProcessor().get_source_fingerprint()
+
+@st.cache_data(show_spinner=False)
+def load_analytics_summary(fingerprint):
+    """Load the precomputed analytics aggregates for this version of the data"""
+    return load_or_build_summary(GymDataProcessor(), fingerprint)
+
+@st.cache_resource(show_spinner=False)
+def build_analytics_figures(fingerprint):
+    """Build the analytics charts once per data fingerprint"""
+    summary = load_analytics_summary(fingerprint)
+    figures = {}
+    
+    muscle_names, muscle_values = zip(*summary.top('muscle')) if summary.total else ((), ())
+    fig_muscle = px.bar(
+        x=muscle_values,
+        y=muscle_names,
+        orientation='h',
+        title="Exercise Distribution by Target Muscle",
+        color=muscle_values,
+        color_continuous_scale="Reds",
+        text=muscle_values
+    )
+    fig_muscle.update_traces(texttemplate='%{text}', textposition='outside')
+    fig_muscle.update_layout(
+        showlegend=False, 
+        height=500,
+        yaxis={'categoryorder': 'total ascending'},
+        xaxis_title="Number of Exercises",
+        yaxis_title="Muscle Group"
+    )
+    figures['muscle'] = fig_muscle
+    
+    difficulty_counts = sorted(summary.top('difficulty'), key=lambda item: int(item[0]))
+    fig_diff = px.pie(
+        values=[count for _, count in difficulty_counts],
+        names=[f"Level {level}" for level, _ in difficulty_counts],
+        title="Exercise Difficulty Breakdown",
+        color_discrete_sequence=px.colors.sequential.Reds_r,
+        hole=0.4
+    )
+    fig_diff.update_traces(textposition='inside', textinfo='percent+label')
+    figures['difficulty'] = fig_diff
+    
+    equipment_counts = summary.top('equipment', 12)
+    fig_equipment = px.bar(
+        x=[name for name, _ in equipment_counts],
+        y=[count for _, count in equipment_counts],
+        title="Top Equipment Types Used in Exercises",
+        color=[count for _, count in equipment_counts],
+        color_continuous_scale="Reds",
+        text=[count for _, count in equipment_counts]
+    )
+    fig_equipment.update_traces(texttemplate='%{text}', textposition='outside')
+    fig_equipment.update_xaxes(tickangle=45)
+    fig_equipment.update_layout(
+        showlegend=False,
+        xaxis_title="Equipment Type",
+        yaxis_title="Number of Exercises",
+        height=500
+    )
+    figures['equipment'] = fig_equipment
+    
+    mechanics_counts = summary.top('mechanics')
+    figures['mechanics'] = px.pie(
+        values=[count for _, count in mechanics_counts],
+        names=[name for name, _ in mechanics_counts],
+        title="Exercise Mechanics Distribution"
+    )
+    
+    utility_counts = summary.top('utility')
+    fig_utility = px.bar(
+        x=[count for _, count in utility_counts],
+        y=[name for name, _ in utility_counts],
+        orientation='h',
+        title="Exercise Utility Types",
+        color=[count for _, count in utility_counts],
+        color_continuous_scale="Blues"
+    )
+    fig_utility.update_layout(showlegend=False)
+    figures['utility'] = fig_utility
+    return figures
 
 def parse_exercise_details(exercise_text):
     """Parse exercise text into structured data"""
@@ -110,33 +214,59 @@ def parse_exercise_details(exercise_text):
             details[key.strip()] = value.strip()
     return details
 
-def display_exercise_card(exercise_text, index):
+@st.cache_data(show_spinner=False, max_entries=4096)
+def build_card_content(fingerprint, row_id, layout, _exercise_text):
+    """Pre-format one result card; memoized per (row id, layout) for each version of the data"""
+    details = parse_exercise_details(_exercise_text)
+    name = details.get('Exercise Name', 'Unknown Exercise')
+    main_muscle = details.get('Main Muscle', 'N/A')
+    difficulty = details.get('Difficulty (1-5)', 'N/A')
+    equipment = details.get('Equipment', 'N/A')
+    mechanics = details.get('Mechanics', 'N/A')
+    
+    if layout == 'compact':
+        return {
+            'summary': f"**🏋️‍♂️ {name}** · {main_muscle} · Level {difficulty}/5 · {equipment} · {mechanics}"
+        }
+    
+    tags = []
+    if main_muscle != 'N/A':
+        tags.append(f'<span class="muscle-tag">{main_muscle}</span>')
+    if difficulty != 'N/A':
+        tags.append(f'<span class="difficulty-badge">Level {difficulty}/5</span>')
+    
+    return {
+        'title': f"### 🏋️‍♂️ {name}",
+        'tags': tags,
+        'info': f"**Equipment:** {equipment}\n\n**Type:** {mechanics}",
+        'preparation': details.get('Preparation', 'N/A'),
+        'execution': details.get('Execution', 'N/A'),
+        'details_left': "\n\n".join(
+            f"**{key}:** {details.get(key, 'N/A')}" for key in ('Force', 'Utility', 'Variation')
+        ),
+        'details_right': "\n\n".join(
+            f"**{key}:** {details.get(key, 'N/A')}" for key in ('Synergist Muscles', 'Secondary Muscles')
+        )
+    }
+
+def display_exercise_card(card, layout='detailed'):
     """Display an exercise in a styled card format"""
-    details = parse_exercise_details(exercise_text)
-    
-    # st.markdown('<div class="exercise-card">', unsafe_allow_html=True)
+    if layout == 'compact':
+        st.markdown(card['summary'])
+        return
     
     # Header with exercise name and key info
     col1, col2 = st.columns([3, 1])
     
     with col1:
-        st.markdown(f"### 🏋️‍♂️ {details.get('Exercise Name', 'Unknown Exercise')}")
+        st.markdown(card['title'])
         
         # Tags for main muscle and difficulty
-        main_muscle = details.get('Main Muscle', 'N/A')
-        difficulty = details.get('Difficulty (1-5)', 'N/A')
-        
-        if main_muscle != 'N/A':
-            st.markdown(f'<span class="muscle-tag">{main_muscle}</span>', unsafe_allow_html=True)
-        
-        if difficulty != 'N/A':
-            st.markdown(f'<span class="difficulty-badge">Level {difficulty}/5</span>', unsafe_allow_html=True)
+        for tag in card['tags']:
+            st.markdown(tag, unsafe_allow_html=True)
     
     with col2:
-        equipment = details.get('Equipment', 'N/A')
-        mechanics = details.get('Mechanics', 'N/A')
-        st.markdown(f"**Equipment:** {equipment}")
-        st.markdown(f"**Type:** {mechanics}")
+        st.markdown(card['info'])
     
     # Key exercise information
     st.markdown("---")
@@ -144,31 +274,167 @@ def display_exercise_card(exercise_text, index):
     col_a, col_b = st.columns(2)
     
     with col_a:
-        preparation = details.get('Preparation', 'N/A')
-        if preparation != 'N/A':
+        if card['preparation'] != 'N/A':
             st.markdown(f"**🎯 Preparation:**")
-            st.markdown(f"{preparation}")
+            st.markdown(card['preparation'])
     
     with col_b:
-        execution = details.get('Execution', 'N/A')
-        if execution != 'N/A':
+        if card['execution'] != 'N/A':
             st.markdown(f"**⚡ Execution:**")
-            st.markdown(f"{execution}")
+            st.markdown(card['execution'])
     
     # Additional details in expandable section
     with st.expander("📋 Additional Details"):
         detail_col1, detail_col2 = st.columns(2)
         
         with detail_col1:
-            st.markdown(f"**Force:** {details.get('Force', 'N/A')}")
-            st.markdown(f"**Utility:** {details.get('Utility', 'N/A')}")
-            st.markdown(f"**Variation:** {details.get('Variation', 'N/A')}")
+            st.markdown(card['details_left'])
         
         with detail_col2:
-            st.markdown(f"**Synergist Muscles:** {details.get('Synergist Muscles', 'N/A')}")
-            st.markdown(f"**Secondary Muscles:** {details.get('Secondary Muscles', 'N/A')}")
+            st.markdown(card['details_right'])
+
+@st.cache_resource
+def get_search_cache():
+    """Search responses shared by every session, keyed on normalized intent.
+
+    An LRU with a TTL rather than st.cache_data: a miss streams its results
+    onto the page, which a cached function cannot do.
+    """
+    return {'entries': OrderedDict(), 'lock': threading.Lock()}
+
+def cache_lookup(intent_key):
+    cache = get_search_cache()
+    with cache['lock']:
+        entry = cache['entries'].get(intent_key)
+        if entry is None or time.time() - entry[0] > SEARCH_CACHE_TTL:
+            cache['entries'].pop(intent_key, None)
+            return None
+        cache['entries'].move_to_end(intent_key)
+        return entry[1]
+
+def cache_store(intent_key, response):
+    cache = get_search_cache()
+    with cache['lock']:
+        cache['entries'][intent_key] = (time.time(), response)
+        cache['entries'].move_to_end(intent_key)
+        while len(cache['entries']) > SEARCH_CACHE_SIZE:
+            cache['entries'].popitem(last=False)
+
+def stream_search(recommender, query, intent, live=None):
+    """Run a search, listing each exercise in the ``live`` placeholder as soon as it is found"""
+    fingerprint = get_data_fingerprint()
+    lines = []
+    for event in recommender.stream_search(query, intent=intent):
+        if event['type'] == 'done':
+            return event['response']
+        if live is not None:
+            card = build_card_content(fingerprint, event['row_id'], 'compact', event['exercise'])
+            lines.append(f"{event['rank'] + 1}. {card['summary']}")
+            live.markdown("\n".join(lines))
+
+def handle_search(query, live=None):
+    """Single entry point for every search on the page.
+
+    Returns a response dict with the results, per-stage timings in
+    milliseconds and whether it was served from the search cache. On a
+    cache miss each exercise is listed in ``live`` as soon as it is found.
+    """
+    recommender = st.session_state.recommender
+    start = time.perf_counter()
+    with metrics.capture() as parse_timing:
+        num_exercises, muscles = recommender.parse_intent(query)
+    intent_key = (get_data_fingerprint(), num_exercises, tuple(muscles), normalize_phrase(query))
+    
+    cache_status = 'hit'
+    result = cache_lookup(intent_key)
+    if result is None:
+        cache_status = 'miss'
+        result = stream_search(recommender, query, (num_exercises, muscles), live)
+        # A failed search is retried next time instead of being served to every session
+        if not result['error'] and result['exercises']:
+            cache_store(intent_key, result)
+    
+    # Cached results are shared by every session: per-request fields go on a copy
+    response = dict(result)
+    response['query'] = query
+    response['cache'] = cache_status
+    response['timings'] = {'parse': parse_timing.get('parse', 0.0) * 1000.0,
+                           **(result['timings'] if cache_status == 'miss' else {})}
+    response['total_ms'] = (time.perf_counter() - start) * 1000.0
+    
+    # Keep the last structured result set so reruns from other widgets can redraw it
+    st.session_state.search_results = response
+    st.session_state.results_page = 0
+    entry = {
+        'query': query,
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'results_count': len(response['exercises']),
+        'search_time': round(response['total_ms'] / 1000.0, 2),
+        'cache': response['cache']
+    }
+    get_search_history().append(entry)
+    st.session_state.search_history.append(entry)
+    return response
+
+def set_results_page(page):
+    st.session_state.results_page = page
+
+@fragment
+def display_search_results():
+    """Draw the stored results one page at a time; paging and layout only rerun this fragment"""
+    results = st.session_state.search_results
+    if results is None:
+        return
     
-    st.markdown('</div>', unsafe_allow_html=True)
+    exercises = results['exercises']
+    if results['error'] or not exercises:
+        st.error("❌ No exercises found. Try using different muscle group names or check your spelling!")
+        st.info("💡 **Tip:** Try searches like 'chest exercises', 'back workout', or 'arm strengthening'")
+        return
+    
+    st.success(f"✅ Found {len(exercises)} perfect exercises for you!")
+    
+    # Results summary
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("🎯 Results Found", len(exercises))
+    with col2:
+        st.metric("⚡ Search Time", f"{results['total_ms'] / 1000.0:.2f}s")
+    with col3:
+        st.metric("🔍 Your Query", f'"{results["query"]}"')
+    
+    stage_times = " · ".join(f"{stage} {ms:.1f} ms" for stage, ms in results['timings'].items())
+    st.caption(f"{'⚡ Cached result' if results['cache'] == 'hit' else '🔎 Fresh search'} · {stage_times}")
+    
+    st.markdown("---")
+    header_col, layout_col = st.columns([3, 1])
+    with header_col:
+        st.subheader("📋 Your Recommended Exercises")
+    with layout_col:
+        layout = st.radio("Layout", ["detailed", "compact"], horizontal=True,
+                          key="results_layout", label_visibility="collapsed")
+    
+    num_pages = max(1, -(-len(exercises) // RESULTS_PAGE_SIZE))
+    page = min(st.session_state.results_page, num_pages - 1)
+    start = page * RESULTS_PAGE_SIZE
+    
+    # Display exercises
+    fingerprint = get_data_fingerprint()
+    with metrics.timer('render'):
+        for row_id, exercise in zip(results['rows'][start:start + RESULTS_PAGE_SIZE],
+                                    exercises[start:start + RESULTS_PAGE_SIZE]):
+            display_exercise_card(build_card_content(fingerprint, row_id, layout, exercise), layout)
+    
+    if num_pages > 1:
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            st.button("⬅️ Previous", disabled=page == 0, use_container_width=True,
+                      on_click=set_results_page, args=(page - 1,))
+        with info_col:
+            st.markdown(f"Page {page + 1} of {num_pages} · exercises {start + 1}-{min(start + RESULTS_PAGE_SIZE, len(exercises))}")
+        with next_col:
+            st.button("Next ➡️", disabled=page >= num_pages - 1, use_container_width=True,
+                      on_click=set_results_page, args=(page + 1,))
 
 def main():
     # Header
@@ -208,13 +474,11 @@ def main():
         4. **View detailed** instructions and tips
         """)
     
-    # Load recommender
-    if st.session_state.recommender is None:
-        st.session_state.recommender = load_recommender()
-        
-    
     # Page routing
     if page == "🔍 Exercise Search":
+        # Load recommender only where it is used, so analytics never pays for the model
+        if st.session_state.recommender is None:
+            st.session_state.recommender = load_recommender()
         exercise_search_page()
     elif page == "📊 Data Analytics":
         analytics_page()
@@ -243,142 +507,74 @@ def exercise_search_page():
     
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # Search execution
-    if search_button and query:
+    # Quick searches set temp_query; both paths go through the same handler
+    pending_query = st.session_state.pop('temp_query', None)
+    run_query = query if search_button and query else pending_query
+    
+    if run_query:
         # Check if recommender is properly initialized
         if st.session_state.recommender is None or st.session_state.recommender.vectorstore is None:
             st.error("❌ Recommender not properly initialized. Please refresh the page.")
             return
-            
-        with st.spinner("🔍 Finding the perfect exercises for you..."):
-            try:
-                start_time = time.time()
-                exercises = st.session_state.recommender.get_exercises(query)
-                search_time = time.time() - start_time
-                
-                # Add to search history
-                st.session_state.search_history.append({
-                    'query': query,
-                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'results_count': len(exercises),
-                    'search_time': round(search_time, 2)
-                })
-            except Exception as e:
-                st.error(f"❌ Error during search: {str(e)}")
-                return
         
-        # Display results
-        if exercises and not exercises[0].startswith("No valid muscles"):
-            st.success(f"✅ Found {len(exercises)} perfect exercises for you!")
-            
-            # Results summary
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("🎯 Results Found", len(exercises))
-            with col2:
-                st.metric("⚡ Search Time", f"{search_time:.2f}s")
-            with col3:
-                st.metric("🔍 Your Query", f'"{query}"')
-            
-            st.markdown("---")
-            st.subheader("📋 Your Recommended Exercises")
-            
-            # Display exercises
-            for i, exercise in enumerate(exercises):
-                display_exercise_card(exercise, i)
-                
-        else:
-            st.error("❌ No exercises found. Try using different muscle group names or check your spelling!")
-            st.info("💡 **Tip:** Try searches like 'chest exercises', 'back workout', or 'arm strengthening'")
+        # Exercises appear here one by one until the full result cards are ready
+        live = st.empty()
+        live.info("🔍 Finding the perfect exercises for you...")
+        try:
+            handle_search(run_query, live)
+        except Exception as e:
+            st.error(f"❌ Error during search: {str(e)}")
+            return
+        finally:
+            live.empty()
     
     elif query and not search_button:
         st.info("👆 Click the Search button to find exercises!")
     
     # Quick search buttons
-    if not query:
-        # st.markdown("### 🚀 Quick Start - Try These Popular Searches:")
-        
-        # quick_searches = [
-        #     "5 chest exercises",
-        #     "back and shoulder workout", 
-        #     "10 leg exercises",
-        #     "beginner arm exercises",
-        #     "core strengthening exercises"
-        # ]
-        
-        # cols = st.columns(len(quick_searches))
-        # for i, search_term in enumerate(quick_searches):
-        #     with cols[i]:
-        #         if st.button(search_term, key=f"quick_{i}", use_container_width=True):
-        #             st.session_state.temp_query = search_term
-        #             st.rerun()
-        
-        # Handle quick search selection
-        if 'temp_query' in st.session_state:
-            query = st.session_state.temp_query
-            del st.session_state.temp_query
-            
-            # Check if recommender is properly initialized
-            if st.session_state.recommender is None or st.session_state.recommender.vectorstore is None:
-                st.error("❌ Recommender not properly initialized. Please refresh the page.")
-                return
-            
-            with st.spinner("🔍 Finding exercises..."):
-                try:
-                    start_time = time.time()
-                    exercises = st.session_state.recommender.get_exercises(query)
-                    search_time = time.time() - start_time
-                    
-                    # Add to search history
-                    st.session_state.search_history.append({
-                        'query': query,
-                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'results_count': len(exercises),
-                        'search_time': round(search_time, 2)
-                    })
-                except Exception as e:
-                    st.error(f"❌ Error during search: {str(e)}")
-                    return
-            
-            # Display results (same as above)
-            if exercises and not exercises[0].startswith("No valid muscles"):
-                st.success(f"✅ Found {len(exercises)} exercises for: **{query}**")
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("🎯 Results Found", len(exercises))
-                with col2:
-                    st.metric("⚡ Search Time", f"{search_time:.2f}s")
-                with col3:
-                    st.metric("🔍 Search", f'"{query}"')
-                
-                st.markdown("---")
-                st.subheader("📋 Your Recommended Exercises")
-                
-                for i, exercise in enumerate(exercises):
-                    display_exercise_card(exercise, i)
+    # if not query:
+    #     st.markdown("### 🚀 Quick Start - Try These Popular Searches:")
+    #     
+    #     quick_searches = [
+    #         "5 chest exercises",
+    #         "back and shoulder workout", 
+    #         "10 leg exercises",
+    #         "beginner arm exercises",
+    #         "core strengthening exercises"
+    #     ]
+    #     
+    #     cols = st.columns(len(quick_searches))
+    #     for i, search_term in enumerate(quick_searches):
+    #         with cols[i]:
+    #             if st.button(search_term, key=f"quick_{i}", use_container_width=True):
+    #                 st.session_state.temp_query = search_term
+    #                 st.rerun()
+    
+    # Last results survive reruns triggered by any other widget
+    display_search_results()
 
 def analytics_page():
     st.header("📊 Exercise Database Analytics")
     st.markdown("Explore insights about our comprehensive exercise database")
     
     try:
-        # Load data
-        gym_data = load_gym_data()
+        # Aggregates and charts are computed once per version of the data
+        fingerprint = get_data_fingerprint()
+        summary = load_analytics_summary(fingerprint)
+        figures = build_analytics_figures(fingerprint)
         
         # Overview metrics
         st.subheader("📈 Database Overview")
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("💪 Total Exercises", len(gym_data))
+            st.metric("💪 Total Exercises", summary.total)
         with col2:
-            st.metric("🎯 Muscle Groups", gym_data['Main_muscle'].nunique())
+            st.metric("🎯 Muscle Groups", summary.num_muscles)
         with col3:
-            st.metric("🛠️ Equipment Types", gym_data['Equipment'].nunique())
+            st.metric("🛠️ Equipment Types", summary.num_equipment)
         with col4:
-            avg_difficulty = gym_data['Difficulty (1-5)'].mean()
-            st.metric("📊 Avg Difficulty", f"{avg_difficulty:.1f}/5")
+            st.metric("📊 Avg Difficulty", f"{summary.avg_difficulty:.1f}/5")
         
         st.markdown("---")
         
@@ -387,85 +583,25 @@ def analytics_page():
         
         with col1:
             st.subheader("🎯 Exercises by Muscle Group")
-            muscle_counts = gym_data['Main_muscle'].value_counts()
-            fig_muscle = px.bar(
-                x=muscle_counts.values,
-                y=muscle_counts.index,
-                orientation='h',
-                title="Exercise Distribution by Target Muscle",
-                color=muscle_counts.values,
-                color_continuous_scale="Reds",
-                text=muscle_counts.values
-            )
-            fig_muscle.update_traces(texttemplate='%{text}', textposition='outside')
-            fig_muscle.update_layout(
-                showlegend=False, 
-                height=500,
-                yaxis={'categoryorder': 'total ascending'},
-                xaxis_title="Number of Exercises",
-                yaxis_title="Muscle Group"
-            )
-            st.plotly_chart(fig_muscle, use_container_width=True)
+            st.plotly_chart(figures['muscle'], use_container_width=True)
         
         with col2:
             st.subheader("⚖️ Difficulty Distribution")
-            difficulty_counts = gym_data['Difficulty (1-5)'].value_counts().sort_index()
-            fig_diff = px.pie(
-                values=difficulty_counts.values,
-                names=[f"Level {x}" for x in difficulty_counts.index],
-                title="Exercise Difficulty Breakdown",
-                color_discrete_sequence=px.colors.sequential.Reds_r,
-                hole=0.4
-            )
-            fig_diff.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig_diff, use_container_width=True)
+            st.plotly_chart(figures['difficulty'], use_container_width=True)
         
         # Equipment analysis
         st.subheader("🛠️ Most Popular Equipment")
-        equipment_counts = gym_data['Equipment'].value_counts().head(12)
-        fig_equipment = px.bar(
-            x=equipment_counts.index,
-            y=equipment_counts.values,
-            title="Top Equipment Types Used in Exercises",
-            color=equipment_counts.values,
-            color_continuous_scale="Reds",
-            text=equipment_counts.values
-        )
-        fig_equipment.update_traces(texttemplate='%{text}', textposition='outside')
-        fig_equipment.update_xaxes(tickangle=45)
-        fig_equipment.update_layout(
-            showlegend=False,
-            xaxis_title="Equipment Type",
-            yaxis_title="Number of Exercises",
-            height=500
-        )
-        st.plotly_chart(fig_equipment, use_container_width=True)
+        st.plotly_chart(figures['equipment'], use_container_width=True)
         
         # Exercise mechanics
         st.subheader("⚙️ Exercise Mechanics Analysis")
         col1, col2 = st.columns(2)
         
         with col1:
-            mechanics_counts = gym_data['Mechanics'].value_counts()
-            fig_mechanics = px.pie(
-                values=mechanics_counts.values,
-                names=mechanics_counts.index,
-                title="Exercise Mechanics Distribution"
-            )
-            st.plotly_chart(fig_mechanics, use_container_width=True)
+            st.plotly_chart(figures['mechanics'], use_container_width=True)
         
         with col2:
-            utility_counts = gym_data['Utility'].value_counts()
-            fig_utility = px.bar(
-                x=utility_counts.values,
-                y=utility_counts.index,
-                orientation='h',
-                title="Exercise Utility Types",
-                color=utility_counts.values,
-                color_continuous_scale="Blues"
-            )
-            fig_utility.update_layout(showlegend=False)
-            st.plotly_chart(fig_utility, use_container_width=True)
+            st.plotly_chart(figures['utility'], use_container_width=True)
         
     except Exception as e:
         st.error(f"Error loading analytics data: {str(e)}")
@@ -475,7 +611,10 @@ def search_history_page():
     st.header("📈 Your Search History")
     st.markdown("Track your workout planning journey and search patterns")
     
-    if not st.session_state.search_history:
+    history = st.session_state.search_history
+    summary = history.get_summary()
+    
+    if not summary['count']:
         st.info("🔍 No search history yet! Start searching for exercises to see your activity here.")
         
         # Show some example searches to get started
@@ -492,68 +631,61 @@ def search_history_page():
         
         return
     
-    # Summary metrics
-    total_searches = len(st.session_state.search_history)
-    total_results = sum(h['results_count'] for h in st.session_state.search_history)
-    avg_results = total_results / total_searches
-    avg_time = sum(h['search_time'] for h in st.session_state.search_history) / total_searches
-    
+    # Summary metrics, maintained incrementally by the history store
     st.subheader("📊 Search Statistics")
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("🔍 Total Searches", total_searches)
+        st.metric("🔍 Total Searches", summary['count'])
     with col2:
-        st.metric("💪 Total Results", total_results)
+        st.metric("💪 Total Results", summary['total_results'])
     with col3:
-        st.metric("📈 Avg Results/Search", f"{avg_results:.1f}")
+        st.metric("📈 Avg Results/Search", f"{summary['avg_results']:.1f}")
     with col4:
-        st.metric("⚡ Avg Search Time", f"{avg_time:.2f}s")
+        st.metric("⚡ Avg Search Time", f"{summary['avg_time']:.2f}s",
+                  help=f"p50 {summary['p50_time']:.2f}s · p95 {summary['p95_time']:.2f}s · "
+                       f"{summary['cache_hit_rate']:.0%} served from cache")
     
     # Clear history button
     col1, col2 = st.columns([1, 4])
     with col1:
         if st.button("🗑️ Clear History", type="secondary"):
-            st.session_state.search_history = []
+            history.clear()
             st.rerun()
     
     st.markdown("---")
     
-    # Recent searches
+    # Recent searches, newest first straight from the ring buffer
     st.subheader("📋 Recent Searches")
-    history_df = pd.DataFrame(st.session_state.search_history)
-    history_df = history_df.sort_values('timestamp', ascending=False)
-    
-    # Style the dataframe
-    styled_df = history_df.rename(columns={
-        "query": "🔍 Search Query",
-        "timestamp": "📅 Date & Time", 
-        "results_count": "💪 Results Found",
-        "search_time": "⚡ Time (seconds)"
-    })
+    recent = history.recent(HISTORY_TABLE_ROWS)
     
     st.dataframe(
-        styled_df,
+        {
+            "🔍 Search Query": [h['query'] for h in recent],
+            "📅 Date & Time": [h['timestamp'] for h in recent],
+            "💪 Results Found": [h['results_count'] for h in recent],
+            "⚡ Time (seconds)": [h['search_time'] for h in recent],
+            "🗄️ Cache": [h.get('cache', '') for h in recent]
+        },
         use_container_width=True,
         hide_index=True
     )
     
     # Search performance trends
-    if len(st.session_state.search_history) > 2:
+    trend = history.recent(HISTORY_CHART_POINTS)[::-1]
+    if len(trend) > 2:
         st.subheader("📊 Search Performance Trends")
         
-        # Convert timestamps to datetime for plotting
-        history_df['datetime'] = pd.to_datetime(history_df['timestamp'])
-        history_df = history_df.sort_values('datetime')
+        # ISO-style timestamps plot as dates without parsing them
+        timestamps = [h['timestamp'] for h in trend]
         
         col1, col2 = st.columns(2)
         
         with col1:
             # Search time trend
             fig_time = px.line(
-                history_df,
-                x='datetime',
-                y='search_time',
+                x=timestamps,
+                y=[h['search_time'] for h in trend],
                 title='Search Response Time Trend',
                 markers=True,
                 color_discrete_sequence=['#ff4b4b']
@@ -567,9 +699,8 @@ def search_history_page():
         with col2:
             # Results count trend
             fig_results = px.line(
-                history_df,
-                x='datetime',
-                y='results_count',
+                x=timestamps,
+                y=[h['results_count'] for h in trend],
                 title='Results Found per Search',
                 markers=True,
                 color_discrete_sequence=['#28a745']
@@ -582,15 +713,15 @@ def search_history_page():
         
         # Most searched terms
         st.subheader("🏆 Your Most Popular Searches")
-        query_counts = history_df['query'].value_counts().head(5)
+        query_counts = history.top_queries(5)
         
         if len(query_counts) > 0:
             fig_popular = px.bar(
-                x=query_counts.values,
-                y=query_counts.index,
+                x=[count for _, count in query_counts],
+                y=[query for query, _ in query_counts],
                 orientation='h',
                 title="Top 5 Most Repeated Searches",
-                color=query_counts.values,
+                color=[count for _, count in query_counts],
                 color_continuous_scale="Reds"
             )
             fig_popular.update_layout(
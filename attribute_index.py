@@ -0,0 +1,230 @@
+"""Bitmap index over categorical exercise attributes and a selectivity-based filter planner"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+import numpy as np
+from lexical_index import normalize_phrase, equipment_terms
+from config import PREFILTER_MAX_SELECTIVITY, POSTFILTER_SAFETY
+
+# Filterable columns of the cleaned table and the short names accepted in filters
+ATTRIBUTE_COLUMNS = {
+    'equipment': 'Equipment',
+    'variation': 'Variation',
+    'utility': 'Utility',
+    'mechanics': 'Mechanics',
+    'force': 'Force',
+    'difficulty': 'Difficulty (1-5)',
+    'muscle': 'Main_muscle'
+}
+
+# Columns whose values hint at what a free-text query is about (never applied as filters)
+QUERY_ATTRIBUTES = ['equipment', 'utility', 'mechanics', 'force']
+
+# "difficulty <= 2", "level 3", "difficulty≥4"
+DIFFICULTY_PATTERN = re.compile(r'\b(?:difficulty|level)\s*(<=|≤|=<|<|>=|≥|=>|>|=|:)?\s*([1-5])\b', re.IGNORECASE)
+
+# Explicit "attribute: value" filters in a query: "equipment: cable, force = pull", "equipment: cable | barbell"
+_FILTER_NAMES = 'equipment|variation|utility|mechanics|force|muscle'
+FILTER_PATTERN = re.compile(
+    rf'\b({_FILTER_NAMES})\s*[:=]\s*([^,;]+?)\s*(?=[,;]|$|\b(?:{_FILTER_NAMES})\s*[:=]|\b(?:difficulty|level)\b)',
+    re.IGNORECASE
+)
+
+# Bits set in every byte value, for counting rows in a packed bitmap
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+def _value_key(value):
+    """Normalized form of a cell; "Smith​" and "smith" are the same value"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return normalize_phrase(value)
+
+
+def _attribute(key):
+    """Short attribute name for a filter key, accepting the column name too"""
+    for name, column in ATTRIBUTE_COLUMNS.items():
+        if key in (name, column):
+            return name
+    raise ValueError(f"Unknown attribute filter: {key}. Valid attributes: {', '.join(ATTRIBUTE_COLUMNS)}")
+
+
+def validate_filters(filters):
+    """Raise ValueError for an unknown attribute or a range other than numeric 'min' / 'max' bounds"""
+    for key, condition in (filters or {}).items():
+        _attribute(key)
+        if not isinstance(condition, dict):
+            continue
+        unknown = set(condition) - {'min', 'max'}
+        if unknown:
+            raise ValueError(f"Invalid range for {key}: unknown bound {', '.join(sorted(map(str, unknown)))}, "
+                             f"use 'min' and 'max'")
+        for bound, value in condition.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"Invalid range for {key}: '{bound}' must be a number")
+
+
+class AttributeIndex:
+    """One packed bitmap per (attribute, value), built with the vectorstore.
+
+    Bitmaps are bit-packed uint8 arrays over row ids (one byte per eight
+    exercises), so predicates combine with bitwise AND/OR and their
+    cardinality is a popcount; no row list is materialized until the
+    planner has chosen a strategy. Equipment also gets one bitmap per head
+    term, so "lever" covers both lever variants.
+    """
+
+    def __init__(self, num_rows, bitmaps):
+        self.num_rows = num_rows
+        self.bitmaps = bitmaps
+
+    @classmethod
+    def from_dataframe(cls, data):
+        bitmaps = {}
+        for name, column in ATTRIBUTE_COLUMNS.items():
+            if column not in data.columns:
+                continue
+            values = {}
+            for row_id, cell in enumerate(data[column].tolist()):
+                if cell is None or (isinstance(cell, float) and math.isnan(cell)):
+                    continue
+                keys = equipment_terms(cell) if name == 'equipment' else {_value_key(cell)}
+                for key in keys:
+                    if key:
+                        values.setdefault(key, []).append(row_id)
+            bitmaps[name] = {key: cls._pack(rows, len(data)) for key, rows in values.items()}
+        return cls(len(data), bitmaps)
+
+    @staticmethod
+    def _pack(rows, num_rows):
+        mask = np.zeros(num_rows, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def full(self):
+        return self._pack(np.arange(self.num_rows), self.num_rows)
+
+    def empty(self):
+        return np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+
+    def cardinality(self, bitmap):
+        return int(_POPCOUNT[bitmap].sum())
+
+    def to_mask(self, bitmap):
+        return np.unpackbits(bitmap, count=self.num_rows).astype(bool)
+
+    def values(self, attribute):
+        return sorted(self.bitmaps.get(attribute, {}))
+
+    def _predicate(self, attribute, condition):
+        """Bitmap for one attribute: a value, a list of values (any of) or a {'min', 'max'} range"""
+        bitmaps = self.bitmaps.get(attribute, {})
+        if isinstance(condition, dict):
+            low, high = condition.get('min', -math.inf), condition.get('max', math.inf)
+            keys = [key for key in bitmaps if key.isdigit() and low <= int(key) <= high]
+        elif isinstance(condition, (list, tuple, set)):
+            keys = [_value_key(value) for value in condition]
+        else:
+            keys = [_value_key(condition)]
+
+        bitmap = self.empty()
+        for key in keys:
+            if key in bitmaps:
+                bitmap |= bitmaps[key]
+        return bitmap
+
+    def evaluate(self, filters):
+        """AND of all attribute predicates; None when there is nothing to filter on"""
+        if not filters:
+            return None
+        validate_filters(filters)
+        bitmap = self.full()
+        for key, condition in filters.items():
+            bitmap &= self._predicate(_attribute(key), condition)
+        return bitmap
+
+    def named_attributes(self, query):
+        """Attributes whose values a free-text query mentions, e.g. {'equipment', 'force'} for "cable pull" """
+        padded = f" {normalize_phrase(query)} "
+        return {attribute for attribute in QUERY_ATTRIBUTES
+                if any(f" {key} " in padded for key in self.bitmaps.get(attribute, {}))}
+
+    def parse_filters(self, query):
+        """Filters a query spells out explicitly, e.g. "pulls, equipment: cable, difficulty <= 2".
+
+        Only "attribute: value" (or "attribute = value", several values
+        separated by "|") and difficulty comparisons count; attribute values
+        that merely appear in the text ("cable rows") do not filter.
+        """
+        filters = {}
+        for match in FILTER_PATTERN.finditer(query):
+            values = [value.strip() for value in match.group(2).split('|') if value.strip()]
+            if values:
+                filters[match.group(1).lower()] = values
+
+        match = DIFFICULTY_PATTERN.search(query)
+        if match:
+            op, level = match.group(1) or '=', int(match.group(2))
+            bounds = {
+                '<=': {'max': level}, '≤': {'max': level}, '=<': {'max': level}, '<': {'max': level - 1},
+                '>=': {'min': level}, '≥': {'min': level}, '=>': {'min': level}, '>': {'min': level + 1}
+            }
+            filters['difficulty'] = bounds.get(op, {'min': level, 'max': level})
+        return filters
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        arrays = {'num_rows': np.int64(self.num_rows)}
+        keys = {}
+        for attribute, bitmaps in self.bitmaps.items():
+            keys[attribute] = list(bitmaps)
+            if bitmaps:
+                arrays[attribute] = np.stack(list(bitmaps.values()))
+        arrays['keys'] = np.asarray(json.dumps(keys))
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            keys = json.loads(str(data['keys']))
+            bitmaps = {
+                attribute: dict(zip(names, data[attribute])) if names else {}
+                for attribute, names in keys.items()
+            }
+            return cls(int(data['num_rows']), bitmaps)
+
+
+class FilterPlanner:
+    """Chooses how to combine a filter with vector search.
+
+    Selective filters are served by scoring the matching rows exactly;
+    broad ones by an over-fetched ANN search whose misses are dropped,
+    falling back to the exact path when too few rows survive.
+    """
+
+    def __init__(self, max_selectivity=PREFILTER_MAX_SELECTIVITY, safety=POSTFILTER_SAFETY):
+        self.max_selectivity = max_selectivity
+        self.safety = safety
+        self.strategies = Counter()
+        self._lock = threading.Lock()
+
+    def plan(self, matching, index_size, k):
+        """('prefilter', rows to score) or ('postfilter', ANN fetch size)"""
+        selectivity = matching / index_size if index_size else 0.0
+        if matching <= k or selectivity <= self.max_selectivity:
+            strategy, size = 'prefilter', matching
+        else:
+            strategy, size = 'postfilter', min(index_size, math.ceil(k * self.safety / selectivity))
+        self.record(strategy)
+        return strategy, size
+
+    def record(self, strategy):
+        with self._lock:
+            self.strategies[strategy] += 1
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.strategies)
@@ -0,0 +1,332 @@
+"""Offline benchmarks for query parsing, retrieval and end-to-end recommendation
+
+Usage:
+    python benchmark.py                    # run all suites and compare with the baseline
+    python benchmark.py --save-baseline    # run all suites and store the results as the baseline
+    python benchmark.py --suites parse     # run a single suite
+
+Each suite runs in its own process so cold start and peak RSS are measured
+from a clean interpreter. Everything runs against the bundled CSV and a
+locally cached embedding model.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLED_CSV = os.path.join(BASE_DIR, "gym_exercise_dataset.csv")
+
+
+def offline_env():
+    """Stay offline: bundled dataset instead of kagglehub, cached model instead of the hub.
+
+    Call before importing config, which reads the dataset path on import.
+    """
+    os.environ.setdefault("GYM_DATASET_CSV", BUNDLED_CSV)
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+
+offline_env()
+
+from config import BENCHMARK_BASELINE_PATH, BENCHMARK_REGRESSION_THRESHOLD
+
+# Fixed query corpus, grouped by the kind of work each query triggers
+QUERY_CORPUS = {
+    'single_muscle': ["5 chest exercises", "back workout", "3 shoulder exercises", "calves", "8 thighs exercises"],
+    'multi_muscle': ["back and shoulder workout", "10 chest and back exercises", "neck forearm calves", "4 hips thighs calves chest"],
+    'typos': ["5 chst exercises", "sholder workout", "bakc and thigs", "forarm exercises"],
+    'counts': ["1 chest exercise", "20 back exercises", "50 thighs exercises", "2 neck back chest shoulder"],
+    'fallback_heavy': ["barbell", "lever chest", "neck flexion", "cable pull isolated back", "body weight hips"]
+}
+
+ALL_QUERIES = [q for queries in QUERY_CORPUS.values() for q in queries]
+
+# Metrics where higher is better; every other tracked metric is a cost
+HIGHER_IS_BETTER = ('throughput',)
+
+# Modules whose import cost is reported, and dependencies that should only load on first use
+IMPORT_TARGETS = ['config', 'data_processor', 'query_processor', 'visualizations', 'vectorstore_manager', 'exercise_recommender']
+HEAVY_MODULES = {'torch', 'sentence_transformers', 'spacy', 'faiss', 'plotly', 'matplotlib', 'seaborn', 'kagglehub', 'langchain'}
+
+
+def _percentiles(samples):
+    import numpy as np
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': float(values.mean())
+    }
+
+
+def _time_calls(func, inputs, reps):
+    samples = []
+    for _ in range(reps):
+        for item in inputs:
+            start = time.perf_counter()
+            func(item)
+            samples.append(time.perf_counter() - start)
+    return _percentiles(samples)
+
+
+def _throughput(func, inputs, reps, concurrency_levels):
+    results = {}
+    work = list(inputs) * reps
+    for level in concurrency_levels:
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            start = time.perf_counter()
+            list(executor.map(func, work))
+            elapsed = time.perf_counter() - start
+        results[f'throughput_c{level}_qps'] = len(work) / elapsed if elapsed else 0.0
+    return results
+
+
+def _peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def import_report(module):
+    """Import one module in a fresh interpreter under -X importtime"""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, capture_output=True, text=True
+    )
+    spawn = time.perf_counter() - start
+
+    total_us = 0
+    loaded = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        package = name.strip().split(".")[0]
+        loaded.add(package)
+        # Entries without indentation are the top-level imports, whose cumulative times add up
+        if not name[1:].startswith(" "):
+            total_us += int(cumulative)
+
+    heavy = sorted(loaded & HEAVY_MODULES)
+    return {'import_ms': total_us / 1000.0, 'spawn_s': spawn, 'heavy_modules': len(heavy), 'heavy_loaded': heavy}
+
+
+def suite_imports(args):
+    """Startup cost: -X importtime per module and which heavy dependencies each one drags in"""
+    return {module: import_report(module) for module in IMPORT_TARGETS}
+
+
+def suite_parse(args):
+    """QueryProcessor: cold start and parse latency"""
+    start = time.perf_counter()
+    from query_processor import QueryProcessor
+    processor = QueryProcessor()
+    result = {'cold_start_s': time.perf_counter() - start}
+
+    result['parse'] = _time_calls(processor.parse_query, ALL_QUERIES, args.reps)
+    result.update(_throughput(processor.parse_query, ALL_QUERIES, args.reps, args.concurrency))
+    return result
+
+
+def suite_vectorstore(args):
+    """VectorStoreManager: index build, load, embed and raw search latency"""
+    start = time.perf_counter()
+    from vectorstore_manager import VectorStoreManager
+    manager = VectorStoreManager(args.vectorstore)
+    result = {'cold_start_s': time.perf_counter() - start}
+
+    start = time.perf_counter()
+    manager.load_or_create_vectorstore(force_rebuild=True)
+    result['index_build_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loaded = VectorStoreManager(args.vectorstore)
+    loaded._load_existing_vectorstore()
+    result['index_load_s'] = time.perf_counter() - start
+
+    # First pass encodes every query, later passes are served by the embedding cache
+    result['embed_cold'] = _time_calls(lambda q: loaded.embed_queries([q]), ALL_QUERIES, 1)
+    result['embed_warm'] = _time_calls(lambda q: loaded.embed_queries([q]), ALL_QUERIES, args.reps)
+
+    vectors = loaded.embed_queries(ALL_QUERIES)
+    result['search'] = _time_calls(lambda v: loaded.search_vectors(v[None, :], 20), vectors, args.reps)
+    return result
+
+
+def suite_recommender(args):
+    """ExerciseRecommender: cold start, end-to-end latency and throughput"""
+    start = time.perf_counter()
+    from exercise_recommender import ExerciseRecommender
+    from metrics import metrics
+    recommender = ExerciseRecommender(args.vectorstore)
+    recommender.initialize()
+    result = {'cold_start_s': time.perf_counter() - start}
+
+    start = time.perf_counter()
+    recommender.get_exercises(ALL_QUERIES[0])
+    result['first_query_s'] = time.perf_counter() - start
+
+    for category, queries in QUERY_CORPUS.items():
+        result[f'recommend_{category}'] = _time_calls(recommender.get_exercises, queries, args.reps)
+    result['recommend'] = _time_calls(recommender.get_exercises, ALL_QUERIES, args.reps)
+    result.update(_throughput(recommender.get_exercises, ALL_QUERIES, args.reps, args.concurrency))
+    result['stages'] = metrics.get_summary()
+    return result
+
+
+SUITES = {
+    'imports': suite_imports,
+    'parse': suite_parse,
+    'vectorstore': suite_vectorstore,
+    'recommender': suite_recommender
+}
+
+
+def run_suite_in_child(name, args):
+    """Run one suite in a fresh interpreter and return its JSON result"""
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", name,
+        "--vectorstore", args.vectorstore, "--reps", str(args.reps),
+        "--concurrency", *[str(c) for c in args.concurrency]
+    ]
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=BASE_DIR, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+
+    if completed.returncode != 0:
+        print(completed.stdout)
+        print(completed.stderr, file=sys.stderr)
+        raise RuntimeError(f"Benchmark suite '{name}' failed")
+
+    # The suite prints its result as the last line; everything before is log output
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_wall_s'] = wall
+    return result
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = float(value)
+    return flat
+
+
+def is_tracked(metric):
+    # Per-stage breakdowns and counts are informative only; gate on the headline numbers
+    return '.stages.' not in metric and not metric.endswith('.count')
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """Return (metric, baseline, current, change) tuples that regressed beyond the threshold"""
+    current = flatten(results)
+    previous = flatten(baseline.get('results', {}))
+    regressions = []
+    for metric, old in previous.items():
+        if metric not in current or not is_tracked(metric) or old <= 0:
+            continue
+        new = current[metric]
+        change = (new - old) / old
+        if any(tag in metric for tag in HIGHER_IS_BETTER):
+            change = -change
+        if change > threshold:
+            regressions.append((metric, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gym Exercise Recommender benchmarks")
+    parser.add_argument("--suites", nargs="+", choices=list(SUITES), default=list(SUITES))
+    parser.add_argument("--reps", type=int, default=5, help="Repetitions of the query corpus")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--vectorstore", default=None, help="Index directory (defaults to a temporary one)")
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=BENCHMARK_REGRESSION_THRESHOLD)
+    parser.add_argument("--output", default=None, help="Also write the results to this JSON file")
+    parser.add_argument("--child", choices=list(SUITES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = SUITES[args.child](args)
+        result['peak_rss_mb'] = _peak_rss_mb()
+        print(json.dumps(result))
+        return 0
+
+    print("🏋️‍♂️ Gym Exercise Recommender - Benchmarks")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory(prefix="gym_bench_") as tmp_dir:
+        if args.vectorstore is None:
+            args.vectorstore = os.path.join(tmp_dir, "vectorstore")
+
+        # The recommender suite loads the index the vectorstore suite builds
+        suites = list(args.suites)
+        if 'recommender' in suites and 'vectorstore' not in suites and not os.path.exists(args.vectorstore):
+            suites.insert(0, 'vectorstore')
+
+        results = {}
+        for name in [s for s in SUITES if s in suites]:
+            print(f"⏱️ Running {name} suite...")
+            results[name] = run_suite_in_child(name, args)
+
+    report = {
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': sys.version.split()[0],
+        'reps': args.reps,
+        'concurrency': args.concurrency,
+        'results': results
+    }
+
+    for metric, value in sorted(flatten(results).items()):
+        if is_tracked(metric):
+            print(f"  {metric:.<55} {value:.3f}")
+
+    for module, report_item in results.get('imports', {}).items():
+        if isinstance(report_item, dict) and report_item.get('heavy_loaded'):
+            print(f"  ⚠️ import {module} loads: {', '.join(report_item['heavy_loaded'])}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("📁 No baseline found; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}:")
+        for metric, old, new, change in regressions:
+            print(f"  {metric}: {old:.3f} -> {new:.3f} ({change:+.0%})")
+        return 1
+
+    print(f"\n✅ No regressions beyond {args.threshold:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,13 @@ import os
 
 # Dataset settings
 DATASET_PATH = "rishitmurarka/gym-exercises-dataset"
-VECTORSTORE_PATH = "./data/vectorstore"  # Changed path for better organization
+LOCAL_DATASET_PATH = os.environ.get("GYM_DATASET_CSV", "")  # Read this CSV instead of downloading when set
+VECTORSTORE_PATH = os.environ.get("GYM_VECTORSTORE_PATH", "./data/vectorstore")  # Changed path for better organization
+TENANTS_PATH = os.environ.get("GYM_TENANTS_PATH", "./data/tenants")  # per-gym catalogue overlays
+VECTORSTORE_MMAP = os.environ.get("GYM_VECTORSTORE_MMAP", "0") == "1"  # memory-map the FAISS index read-only
+VECTOR_COMPRESSION = os.environ.get("GYM_VECTOR_COMPRESSION", "none")  # none, float16, pca or binary
+MULTI_VECTOR_ENABLED = os.environ.get("GYM_MULTI_VECTOR", "0") == "1"  # also embed name / muscles / execution separately
+RERANK_ENABLED = os.environ.get("GYM_RERANK", "0") == "1"  # rerank the top candidates with a cross-encoder
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
 # Valid muscle groups
@@ -11,6 +17,125 @@ VALID_MUSCLES = ['Neck', 'Shoulder', 'Upper Arms', 'Forearm', 'Back', 'Chest', '
 # Query settings
 DEFAULT_NUM_EXERCISES = 5
 FUZZY_MATCH_THRESHOLD = 80
+MUSCLE_QUERY_TEMPLATE = "exercises for {muscle}"
 
-# Create data directory if it doesn't exist
-os.makedirs(os.path.dirname(VECTORSTORE_PATH), exist_ok=True)
\ No newline at end of file
+# Embedding batching settings
+EMBED_BATCHING_ENABLED = True
+EMBED_BATCH_MAX_SIZE = 32
+EMBED_BATCH_MAX_WAIT_MS = 3
+
+# Embedding cache settings
+EMBED_CACHE_ENABLED = True
+EMBED_CACHE_SIZE = 4096
+
+# Hybrid retrieval settings
+HYBRID_SEARCH_ENABLED = True
+LEXICAL_INDEX_FILE = "lexical_index.json"
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+# Attribute filter settings
+ATTRIBUTE_INDEX_FILE = "attribute_index.npz"
+QUERY_FILTERS_ENABLED = True  # apply explicit "equipment: cable" / "difficulty <= 2" filters written in queries
+PREFILTER_MAX_SELECTIVITY = 0.05  # score matching rows exactly when at most this share of rows match
+POSTFILTER_SAFETY = 2.0  # extra over-fetch on top of 1 / selectivity for filtered ANN search
+
+# Compressed vector settings (VECTOR_COMPRESSION)
+COMPRESSED_VECTORS_FILE = "compressed_vectors.npz"
+VECTOR_PCA_DIM = 128  # principal components kept by 'pca'
+VECTOR_SHORTLIST_FACTOR = 10  # 'pca' and 'binary' re-score k * this many rows exactly
+VECTOR_SCORE_CHUNK_ROWS = 4096  # rows converted to float32 at a time while scoring
+VECTOR_RECALL_K = 10  # recall@k recorded in metadata.json when the codes are built
+VECTOR_RECALL_QUERIES = 256
+
+# Multi-vector field index settings (MULTI_VECTOR_ENABLED)
+FIELD_INDEX_FILE = "field_vectors.npz"
+FIELD_WEIGHTS = {  # how much each field counts for each kind of query
+    'muscle': {'name': 0.15, 'muscles': 0.7, 'execution': 0.15},  # per-muscle prompts
+    'equipment': {'name': 0.6, 'muscles': 0.2, 'execution': 0.2},  # queries naming equipment or mechanics
+    'general': {'name': 0.35, 'muscles': 0.35, 'execution': 0.3}
+}
+
+# Cross-encoder reranking settings (RERANK_ENABLED)
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_TOP_M = 20  # candidates scored per request, in one batch
+RERANK_BUDGET_MS = 150  # past this the request keeps the retrieval order
+RERANK_CACHE_SIZE = 20000  # cached (tenant, query, row id) scores
+
+# Muscle involvement settings
+MUSCLE_MATRIX_FILE = "muscle_matrix.npz"
+MUSCLE_ROLE_WEIGHTS = {  # how much each role counts when weighing muscle involvement
+    'target': 1.0,
+    'synergist': 0.5,
+    'dynamic_stabilizer': 0.3,
+    'stabilizer': 0.2,
+    'antagonist': 0.1
+}
+
+# Similarity graph settings
+SIMILARITY_GRAPH_FILE = "similarity_graph.npz"
+SIMILARITY_GRAPH_K = 20  # neighbours kept per exercise, overall and within the same muscle
+
+# Result diversity settings
+MMR_LAMBDA = 0.7
+MAX_RESULTS_PER_EXERCISE_NAME = 1
+
+# Workout plan settings
+PLAN_EXERCISES_PER_MUSCLE = 2
+PLAN_REDUNDANCY_WEIGHT = 0.3  # penalty per unit of similarity to exercises already on the same day
+PLAN_EQUIPMENT_REPEAT_PENALTY = 0.05
+PLAN_MECHANICS_BONUS = 0.1  # compound first, isolation after
+PLAN_JITTER = 0.05  # seeded noise so members with the same split get different plans
+
+# Retrieval planning settings
+RETRIEVAL_MIN_OVERFETCH = 2.0
+RETRIEVAL_MAX_OVERFETCH = 8.0
+RETRIEVAL_STATS_WINDOW = 1000
+
+# Metrics settings (set GYM_METRICS=0 to turn instrumentation off)
+METRICS_ENABLED = os.environ.get("GYM_METRICS", "1") != "0"
+METRICS_PREFIX = "gym_recommender"
+METRICS_EXPORT_PATH = "./data/metrics.prom"
+METRICS_EXPORT_INTERVAL = 15
+
+# Profiling settings (GYM_PROFILE_RATE=1 profiles every request)
+PROFILE_SAMPLE_RATE = float(os.environ.get("GYM_PROFILE_RATE", "0"))
+PROFILE_MODE = os.environ.get("GYM_PROFILE_MODE", "sampling")  # "sampling" or "cprofile"
+PROFILE_OUTPUT_DIR = os.environ.get("GYM_PROFILE_DIR", "./data/profiles")
+PROFILE_INTERVAL_MS = 1
+PROFILE_INITIALIZE = os.environ.get("GYM_PROFILE_INIT", "0") == "1"
+
+# Benchmark settings
+BENCHMARK_BASELINE_PATH = "./data/benchmark_baseline.json"
+BENCHMARK_REGRESSION_THRESHOLD = 0.25
+
+# Analytics settings
+ANALYTICS_SUMMARY_FILE = "analytics_summary.json"
+ANALYTICS_FINGERPRINT_TTL = 60  # seconds between dataset change checks
+
+# Search page settings
+RESULTS_PAGE_SIZE = 10
+SEARCH_CACHE_SIZE = 512  # cached search responses, keyed on normalized intent
+SEARCH_CACHE_TTL = 3600  # seconds
+
+# Search history settings
+SEARCH_HISTORY_PATH = os.environ.get("GYM_SEARCH_HISTORY", "./data/search_history.jsonl")
+SEARCH_HISTORY_SIZE = 1000  # searches kept in memory and after compaction
+SEARCH_HISTORY_TOP_K = 100  # counters in the heavy-hitters sketch
+SEARCH_HISTORY_COMPACT_FACTOR = 4  # compact once the file holds this many times SEARCH_HISTORY_SIZE lines
+SEARCH_HISTORY_PREWARM = 256  # logged queries embedded at startup
+HISTORY_TABLE_ROWS = 50
+HISTORY_CHART_POINTS = 200
+
+# HTTP service settings
+SERVICE_HOST = os.environ.get("GYM_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("GYM_SERVICE_PORT", "8000"))
+SERVICE_WORKERS = int(os.environ.get("GYM_SERVICE_WORKERS", "1"))
+SERVICE_KEEP_ALIVE = 30  # seconds an idle keep-alive connection stays open
+SERVICE_RELOAD_INTERVAL = 10  # seconds between checks for a new index version
+SERVICE_MAX_BATCH = 64  # queries per batch request
+SERVICE_MAX_BODY_BYTES = 1024 * 1024
+SERVICE_PRELOAD = os.environ.get("GYM_SERVICE_PRELOAD", "0") == "1"  # load once, then fork workers (prefork.py)
+PREFORK_WARM_QUERY = "5 chest and back exercises"  # run once in the parent before forking
+PREFORK_MIN_SHARED_FRACTION = 0.5  # /health flags a worker sharing less of its RSS than this
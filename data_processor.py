@@ -1,23 +1,58 @@
 """Data loading and preprocessing"""
 import pandas as pd
-import kagglehub
 import os
-from config import DATASET_PATH
+import hashlib
+from lazy_imports import lazy_import
+from config import DATASET_PATH, LOCAL_DATASET_PATH
+
+# Only needed when the dataset has to be downloaded
+kagglehub = lazy_import("kagglehub")
+
+def format_exercise_description(row):
+    """LLM-ready description of one exercise; this text is what gets embedded"""
+    return f"""
+            Exercise Name: {row['Exercise Name']}
+            Equipment: {row['Equipment']}
+            Variation: {row['Variation']}
+            Utility: {row['Utility']}
+            Mechanics: {row['Mechanics']}
+            Force: {row['Force']}
+            Preparation: {row['Preparation']}
+            Execution: {row['Execution']}
+            Difficulty (1-5): {row['Difficulty (1-5)']}
+            Main Muscle: {row['Main_muscle']}
+            Synergist Muscles: {row['Synergist_Muscles']}
+            Secondary Muscles: {row['Secondary Muscles']}
+            """
 
 class GymDataProcessor:
-    def __init__(self):
+    def __init__(self, csv_path=LOCAL_DATASET_PATH):
+        self.csv_path = csv_path
         self.data = None
         self.processed_data = None
     
+    def get_source_path(self):
+        """Path of the dataset CSV, downloading it first if needed"""
+        if self.csv_path:
+            # Offline mode: use a local copy of the dataset
+            return self.csv_path
+        
+        path = kagglehub.dataset_download(DATASET_PATH)
+        print(f"Dataset downloaded to: {path}")
+        return f"{path}/gym_exercise_dataset.csv"
+    
+    def get_source_fingerprint(self):
+        """Cheap fingerprint of the dataset file from its path, size and modification time"""
+        source = os.path.abspath(self.get_source_path())
+        stat = os.stat(source)
+        return hashlib.md5(f"{source}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8')).hexdigest()
+    
     def download_and_load_data(self):
         """Download and load the gym dataset"""
         if self.data is not None:
             return self.data
-            
-        path = kagglehub.dataset_download(DATASET_PATH)
-        print(f"Dataset downloaded to: {path}")
         
-        self.data = pd.read_csv(f"{path}/gym_exercise_dataset.csv")
+        self.data = pd.read_csv(self.get_source_path())
         return self.data
     
     def clean_data(self):
@@ -25,8 +60,8 @@ class GymDataProcessor:
         if self.data is None:
             self.download_and_load_data()
         
-        # Drop unnecessary columns
-        columns_to_drop = ['Stabilizer_Muscles', 'Antagonist_Muscles', 'parent_id', 'Dynamic_Stabilizer_Muscles']
+        # Drop unnecessary columns; every muscle column is kept for the muscle matrix
+        columns_to_drop = ['parent_id']
         self.processed_data = self.data.drop(columns_to_drop, axis=1)
         
         return self.processed_data
@@ -36,21 +71,5 @@ class GymDataProcessor:
         if self.processed_data is None:
             self.clean_data()
         
-        def _generate_description(row):
-            return f"""
-            Exercise Name: {row['Exercise Name']}
-            Equipment: {row['Equipment']}
-            Variation: {row['Variation']}
-            Utility: {row['Utility']}
-            Mechanics: {row['Mechanics']}
-            Force: {row['Force']}
-            Preparation: {row['Preparation']}
-            Execution: {row['Execution']}
-            Difficulty (1-5): {row['Difficulty (1-5)']}
-            Main Muscle: {row['Main_muscle']}
-            Synergist Muscles: {row['Synergist_Muscles']}
-            Secondary Muscles: {row['Secondary Muscles']}
-            """
-        
-        self.processed_data['llm_entry'] = self.processed_data.apply(_generate_description, axis=1)
+        self.processed_data['llm_entry'] = self.processed_data.apply(format_exercise_description, axis=1)
         return self.processed_data
\ No newline at end of file
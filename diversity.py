@@ -0,0 +1,98 @@
+"""Diversity-aware re-ranking of retrieved exercises"""
+import numpy as np
+from config import MMR_LAMBDA, MAX_RESULTS_PER_EXERCISE_NAME
+
+
+def merge_candidates(rows, relevance, groups):
+    """Collapse candidates found by several searches to one entry per row id.
+
+    When a row was retrieved for more than one group it keeps the group
+    where it was most relevant. Returns (rows, relevance, groups) arrays.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    relevance = np.asarray(relevance, dtype=np.float32)
+    groups = np.asarray(groups, dtype=np.int64)
+    if len(rows) == 0:
+        return rows, relevance, groups
+
+    # Sort by row id, most relevant first within a row, then keep the first of each row
+    order = np.lexsort((-relevance, rows))
+    _, first = np.unique(rows[order], return_index=True)
+    keep = order[first]
+    keep = keep[np.argsort(-relevance[keep], kind='stable')]
+    return rows[keep], relevance[keep], groups[keep]
+
+
+def mmr_rerank(vectors, relevance, groups=None, quotas=None, top_n=None, name_ids=None,
+               lambda_=MMR_LAMBDA, max_per_name=MAX_RESULTS_PER_EXERCISE_NAME, picked_vectors=None,
+               picked_name_ids=None):
+    """Pick a diverse top-N with maximal marginal relevance.
+
+    ``vectors`` holds one row per candidate. Candidates are chosen in order
+    of ``lambda_ * relevance - (1 - lambda_) * max similarity to the picks
+    so far``. Groups with quota left are served first, then the remaining
+    slots are filled globally. At most ``max_per_name`` picks share a name
+    id (e.g. the Cable and Lever variants of one exercise) unless that would
+    leave slots empty. ``picked_vectors`` and ``picked_name_ids`` describe
+    exercises chosen earlier (e.g. by a previous streaming stage); they count
+    towards similarity and the name limit without being candidates. Returns
+    candidate positions in selection order.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    num_candidates = len(relevance)
+    top_n = num_candidates if top_n is None else min(top_n, num_candidates)
+    if top_n <= 0:
+        return []
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1, norms)
+    similarity = unit @ unit.T
+
+    selected = np.zeros(num_candidates, dtype=bool)
+    max_similarity = np.zeros(num_candidates, dtype=np.float32)
+    if picked_vectors is not None and len(picked_vectors):
+        picked = np.asarray(picked_vectors, dtype=np.float32)
+        picked = picked / np.maximum(np.linalg.norm(picked, axis=1, keepdims=True), 1e-12)
+        max_similarity = np.maximum((unit @ picked.T).max(axis=1), 0).astype(np.float32)
+
+    remaining = None
+    if groups is not None and quotas is not None:
+        groups = np.asarray(groups, dtype=np.int64)
+        remaining = np.asarray(quotas, dtype=np.int64).copy()
+
+    name_counts = None
+    if name_ids is not None and max_per_name:
+        name_ids = np.asarray(name_ids, dtype=np.int64)
+        picked_name_ids = np.asarray(picked_name_ids if picked_name_ids is not None else [], dtype=np.int64)
+        name_counts = np.bincount(picked_name_ids, minlength=max(name_ids.max(), picked_name_ids.max(initial=0)) + 1)
+
+    order = []
+    while len(order) < top_n:
+        available = ~selected
+        in_quota = remaining[groups] > 0 if remaining is not None else None
+        diverse = name_counts[name_ids] < max_per_name if name_counts is not None else None
+
+        # Relax constraints one at a time: quota+diversity, quota, diversity, anything
+        for constraint in (
+            (in_quota, diverse), (in_quota, None), (None, diverse), (None, None)
+        ):
+            mask = available
+            for part in constraint:
+                if part is not None:
+                    mask = mask & part
+            if mask.any():
+                break
+
+        scores = lambda_ * relevance - (1 - lambda_) * max_similarity
+        pick = int(np.argmax(np.where(mask, scores, -np.inf)))
+
+        order.append(pick)
+        selected[pick] = True
+        np.maximum(max_similarity, similarity[pick], out=max_similarity)
+        if remaining is not None:
+            remaining[groups[pick]] -= 1
+        if name_counts is not None:
+            name_counts[name_ids[pick]] += 1
+
+    return order
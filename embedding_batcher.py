@@ -0,0 +1,122 @@
+"""Micro-batching scheduler for query embeddings"""
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from config import EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS
+
+
+class BatchingEmbeddings:
+    """Embeddings wrapper that coalesces concurrent query encodes into batches.
+
+    Every thread calling ``embed_query`` enqueues its text and waits on a
+    future. A single background worker flushes the queue through one
+    ``embed_documents`` call as soon as it holds ``max_batch_size`` texts or
+    the oldest request has waited ``max_wait_ms``.
+    """
+
+    def __init__(self, embedding, max_batch_size=EMBED_BATCH_MAX_SIZE, max_wait_ms=EMBED_BATCH_MAX_WAIT_MS):
+        self.embedding = embedding
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self._pending = []
+        self._cond = threading.Condition()
+        self._worker = None
+        self._closed = False
+        self.stats = {'requests': 0, 'flushed': 0, 'batches': 0, 'encoded': 0, 'max_batch': 0}
+        # A forked worker inherits the queue and its lock but not the flush thread
+        if hasattr(os, 'register_at_fork'):
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._after_fork())
+
+    def _after_fork(self):
+        self._pending = []
+        self._cond = threading.Condition()
+        self._worker = None
+
+    def _ensure_worker(self):
+        """Start the flush thread on first use"""
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def submit(self, text):
+        """Queue a text for embedding and return a future for its vector"""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Embedding batcher has been closed")
+            self._ensure_worker()
+            self._pending.append((text, future, time.monotonic()))
+            self.stats['requests'] += 1
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+
+                # Wait for the batch to fill up, but never past the oldest request's deadline
+                deadline = self._pending[0][2] + self.max_wait
+                while len(self._pending) < self.max_batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+
+            self._flush(batch)
+
+    def _flush(self, batch):
+        """Encode one batch, sharing a single forward pass between identical texts"""
+        unique_texts = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            vectors = self.embedding.embed_documents(unique_texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        by_text = dict(zip(unique_texts, vectors))
+        for text, future, _ in batch:
+            future.set_result(by_text[text])
+
+        self.stats['batches'] += 1
+        self.stats['flushed'] += len(batch)
+        self.stats['encoded'] += len(unique_texts)
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+
+    def embed_query(self, text):
+        """Embed a single query through the shared batch queue"""
+        return self.submit(text).result()
+
+    def embed_queries(self, texts):
+        """Embed several queries, letting them share a batch with other threads"""
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def embed_documents(self, texts):
+        """Bulk document encodes are already batched, so they bypass the queue"""
+        return self.embedding.embed_documents(texts)
+
+    def get_stats(self):
+        """Get batching statistics"""
+        stats = dict(self.stats)
+        stats['avg_batch'] = stats['flushed'] / stats['batches'] if stats['batches'] else 0.0
+        stats['queued'] = len(self._pending)
+        return stats
+
+    def close(self):
+        """Flush outstanding requests and stop the worker thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join()
@@ -0,0 +1,108 @@
+"""Memoizing cache for query embeddings"""
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import EMBED_CACHE_SIZE
+
+
+class CachedEmbeddings:
+    """Bounded LRU cache in front of an embeddings object.
+
+    Entries are keyed by ``(model_name, text)`` so several models can share
+    one cache, and vectors are handed out as read-only float32 arrays so a
+    caller can never corrupt a cached entry in place.
+    """
+
+    def __init__(self, embedding, model_name, max_size=EMBED_CACHE_SIZE):
+        self.embedding = embedding
+        self.model_name = model_name
+        self.max_size = max(1, int(max_size))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _freeze(vector):
+        array = np.asarray(vector, dtype=np.float32)
+        if array.flags.writeable:
+            array = array.copy()
+            array.setflags(write=False)
+        return array
+
+    def _get(self, key):
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def _put(self, key, vector):
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def _encode(self, texts):
+        """Encode cache misses, batching them when the wrapped object supports it"""
+        if hasattr(self.embedding, 'embed_queries'):
+            return self.embedding.embed_queries(texts)
+        if len(texts) == 1:
+            return [self.embedding.embed_query(texts[0])]
+        return self.embedding.embed_documents(texts)
+
+    def embed_query(self, text):
+        """Embed a query, answering from the cache when possible"""
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts):
+        """Embed several queries, encoding only the ones not cached yet"""
+        results = [self._get((self.model_name, text)) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, results) if vector is None))
+
+        if missing:
+            encoded = {}
+            for text, vector in zip(missing, self._encode(missing)):
+                encoded[text] = self._freeze(vector)
+                self._put((self.model_name, text), encoded[text])
+            results = [vector if vector is not None else encoded[text] for text, vector in zip(texts, results)]
+
+        return results
+
+    def embed_documents(self, texts):
+        """Document encodes happen once per index build and are not cached"""
+        return self.embedding.embed_documents(texts)
+
+    def prewarm(self, texts):
+        """Load embeddings for the given texts into the cache"""
+        texts = [text for text in dict.fromkeys(texts) if text]
+        missing = [text for text in texts if (self.model_name, text) not in self._cache]
+        if missing:
+            for text, vector in zip(missing, self._encode(missing)):
+                self._put((self.model_name, text), self._freeze(vector))
+        return len(missing)
+
+    def get_stats(self):
+        """Get cache hit-rate statistics"""
+        lookups = self.hits + self.misses
+        return {
+            'model': self.model_name,
+            'size': len(self._cache),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        """Drop all cached embeddings and reset the counters"""
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = self.evictions = 0
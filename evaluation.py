@@ -0,0 +1,211 @@
+"""Retrieval quality and latency evaluation on auto-labelled queries
+
+Usage:
+    python evaluation.py                       # evaluate every retrieval configuration
+    python evaluation.py --configs default dense_only --k 10
+
+Queries are generated from the Main_muscle, Equipment and Difficulty
+columns of the bundled dataset, so every query comes with the set of rows
+that are correct answers. Each configuration of ExerciseRecommender is
+scored on recall@k, muscle precision and nDCG@k next to its latency and
+memory, and the configurations are summarised as a Pareto table.
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmark import offline_env
+
+offline_env()
+
+import numpy as np
+from lexical_index import normalize_phrase
+
+# Attribute overrides applied to ExerciseRecommender for each configuration
+RETRIEVAL_CONFIGS = {
+    'default': {},
+    'dense_only': {'lexical_index': None},
+    'no_diversity': {'mmr_lambda': 1.0, 'max_per_name': 0},
+    'dense_no_diversity': {'lexical_index': None, 'mmr_lambda': 1.0, 'max_per_name': 0}
+}
+
+DIFFICULTY_LEVELS = {
+    'beginner': (1, 2),
+    'intermediate': (3, 3),
+    'advanced': (4, 5)
+}
+
+
+def _equipment_term(equipment):
+    """Plain equipment word a user would type, e.g. "Lever (plate loaded)" -> "lever" """
+    return normalize_phrase(str(equipment).split('(')[0])
+
+
+def generate_labelled_queries(table, k=5, max_queries=None, seed=0):
+    """Build queries with known relevant rows from the exercise table.
+
+    Returns a list of dicts with the query text, its target muscle and the
+    set of relevant row ids. Only combinations with at least ``k`` relevant
+    rows are kept so recall@k can reach 1.
+    """
+    table = table.reset_index(drop=True)
+    muscles = table['Main_muscle'].astype(str)
+    equipment = table['Equipment'].map(_equipment_term)
+    difficulty = table['Difficulty (1-5)']
+
+    queries = []
+    for muscle in sorted(muscles.unique()):
+        in_muscle = muscles == muscle
+        queries.append({
+            'query': f"{k} {muscle.lower()} exercises",
+            'kind': 'muscle',
+            'muscle': muscle,
+            'relevant': set(np.flatnonzero(in_muscle.values).tolist())
+        })
+
+        for term in sorted(equipment[in_muscle].unique()):
+            rows = np.flatnonzero((in_muscle & (equipment == term)).values)
+            if term and len(rows) >= k:
+                queries.append({
+                    'query': f"{k} {term} {muscle.lower()} exercises",
+                    'kind': 'muscle_equipment',
+                    'muscle': muscle,
+                    'relevant': set(rows.tolist())
+                })
+
+        for level, (low, high) in DIFFICULTY_LEVELS.items():
+            rows = np.flatnonzero((in_muscle & difficulty.between(low, high)).values)
+            if len(rows) >= k:
+                queries.append({
+                    'query': f"{k} {level} {muscle.lower()} exercises",
+                    'kind': 'muscle_difficulty',
+                    'muscle': muscle,
+                    'relevant': set(rows.tolist())
+                })
+
+    if max_queries and len(queries) > max_queries:
+        queries = random.Random(seed).sample(queries, max_queries)
+    return queries
+
+
+def score_ranking(rows, relevant, row_muscles, muscle, k):
+    """recall@k, muscle precision and binary nDCG@k for one ranked list"""
+    rows = rows[:k]
+    hits = [1.0 if r in relevant else 0.0 for r in rows]
+    ideal = min(k, len(relevant))
+
+    dcg = sum(hit / math.log2(rank + 2) for rank, hit in enumerate(hits))
+    idcg = sum(1.0 / math.log2(rank + 2) for rank in range(ideal))
+    return {
+        'recall': sum(hits) / ideal if ideal else 0.0,
+        'muscle_precision': sum(1 for r in rows if row_muscles[r] == muscle) / len(rows) if rows else 0.0,
+        'ndcg': dcg / idcg if idcg else 0.0
+    }
+
+
+def evaluate_config(recommender, overrides, queries, row_muscles, k):
+    """Run every query with the overrides applied and aggregate quality, latency and memory"""
+    originals = {name: getattr(recommender, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(recommender, name, value)
+
+    scores, latencies = [], []
+    try:
+        for item in queries:
+            start = time.perf_counter()
+            result = recommender.recommend(item['query'])
+            latencies.append(time.perf_counter() - start)
+            scores.append(score_ranking(result['rows'], item['relevant'], row_muscles, item['muscle'], k))
+
+        # Memory is traced in a separate pass so tracing overhead does not skew latency
+        tracemalloc.start()
+        try:
+            for item in queries:
+                recommender.recommend(item['query'])
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        for name, value in originals.items():
+            setattr(recommender, name, value)
+
+    latencies_ms = np.asarray(latencies) * 1000.0
+    return {
+        'queries': len(queries),
+        f'recall@{k}': float(np.mean([s['recall'] for s in scores])),
+        'muscle_precision': float(np.mean([s['muscle_precision'] for s in scores])),
+        f'ndcg@{k}': float(np.mean([s['ndcg'] for s in scores])),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'peak_alloc_mb': peak_memory / (1024 * 1024)
+    }
+
+
+def pareto_front(results, quality_key, cost_key='p95_ms'):
+    """Names of configurations that no other configuration beats on both quality and cost"""
+    front = []
+    for name, result in results.items():
+        dominated = any(
+            other[quality_key] >= result[quality_key] and other[cost_key] <= result[cost_key]
+            and (other[quality_key] > result[quality_key] or other[cost_key] < result[cost_key])
+            for other_name, other in results.items() if other_name != name
+        )
+        if not dominated:
+            front.append(name)
+    return front
+
+
+def print_pareto_table(results, k):
+    quality_key = f'ndcg@{k}'
+    front = set(pareto_front(results, quality_key))
+    header = f"{'config':<22}{'recall@' + str(k):>10}{'musc.prec':>11}{quality_key:>10}{'p50 ms':>9}{'p95 ms':>9}{'alloc MB':>10}  pareto"
+    print(header)
+    print("-" * len(header))
+    for name, r in sorted(results.items(), key=lambda item: item[1]['p95_ms']):
+        print(f"{name:<22}{r[f'recall@{k}']:>10.3f}{r['muscle_precision']:>11.3f}{r[quality_key]:>10.3f}"
+              f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['peak_alloc_mb']:>10.2f}  {'★' if name in front else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gym Exercise Recommender retrieval evaluation")
+    parser.add_argument("--configs", nargs="+", choices=list(RETRIEVAL_CONFIGS), default=list(RETRIEVAL_CONFIGS))
+    parser.add_argument("--k", type=int, default=5, help="Results requested per query")
+    parser.add_argument("--max-queries", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--vectorstore", default=None, help="Index directory (defaults to the configured one)")
+    parser.add_argument("--output", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    from exercise_recommender import ExerciseRecommender
+    recommender = ExerciseRecommender(args.vectorstore) if args.vectorstore else ExerciseRecommender()
+    recommender.initialize()
+
+    table = recommender.vectorstore_manager.get_exercise_table()
+    row_muscles = table['Main_muscle'].astype(str).tolist()
+    queries = generate_labelled_queries(table, k=args.k, max_queries=args.max_queries, seed=args.seed)
+    print(f"📝 Evaluating {len(queries)} labelled queries at k={args.k}")
+
+    # One untimed pass so every configuration sees a warm embedding cache
+    for item in queries:
+        recommender.recommend(item['query'])
+
+    results = {}
+    for name in args.configs:
+        print(f"⏱️ Evaluating {name}...")
+        results[name] = evaluate_config(recommender, RETRIEVAL_CONFIGS[name], queries, row_muscles, args.k)
+
+    print()
+    print_pareto_table(results, args.k)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'k': args.k, 'queries': len(queries), 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
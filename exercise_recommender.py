@@ -1,19 +1,58 @@
 
 """Main recommendation engine with improved error handling"""
 import os
+import time
 import traceback
+import numpy as np
+from lazy_imports import lazy_import
 from vectorstore_manager import VectorStoreManager
 from query_processor import QueryProcessor
+from lexical_index import reciprocal_rank_fusion, normalize_phrase
+from diversity import merge_candidates, mmr_rerank
+from retrieval_planner import RetrievalPlanner
+from metrics import metrics
+from profiling import RequestProfiler
+from search_history import SearchHistoryStore
+from similarity_graph import GRAPH_FILTERS
+from workout_planner import WorkoutPlanner
+from tenant_catalog import TenantRegistry
+from attribute_index import FilterPlanner, validate_filters
+from reranker import Reranker
+from config import VECTORSTORE_PATH, VALID_MUSCLES, DEFAULT_NUM_EXERCISES, MUSCLE_QUERY_TEMPLATE, HYBRID_SEARCH_ENABLED, MMR_LAMBDA, \
+    MAX_RESULTS_PER_EXERCISE_NAME, PROFILE_INITIALIZE, SEARCH_HISTORY_PATH, SEARCH_HISTORY_PREWARM, \
+    VECTORSTORE_MMAP, QUERY_FILTERS_ENABLED, RERANK_ENABLED
+
+pd = lazy_import("pandas")
 
 class ExerciseRecommender:
-    def __init__(self):
-        self.vectorstore_manager = VectorStoreManager()
+    def __init__(self, vectorstore_path=VECTORSTORE_PATH, mmap_index=VECTORSTORE_MMAP):
+        self.vectorstore_manager = VectorStoreManager(vectorstore_path, mmap_index=mmap_index)
+        self.tenants = TenantRegistry(self.vectorstore_manager)
         self.query_processor = QueryProcessor()
+        self.retrieval_planner = RetrievalPlanner()
+        self.filter_planner = FilterPlanner()
+        self.profiler = RequestProfiler()
         self.vectorstore = None
+        self.lexical_index = None
+        self.attribute_index = None
+        self.muscle_matrix = None
+        self.field_index = None
+        self.reranker = Reranker() if RERANK_ENABLED else None
+        self._name_ids = None
+        self._workout_planner = None
+        self.mmr_lambda = MMR_LAMBDA
+        self.max_per_name = MAX_RESULTS_PER_EXERCISE_NAME
         self._initialized = False
     
-    def initialize(self):
+    def initialize(self, profile=PROFILE_INITIALIZE):
         """Initialize the recommender system with proper error handling"""
+        if not profile:
+            return self._initialize()
+        with self.profiler.profile('initialize') as info:
+            info['vectorstore_path'] = self.vectorstore_manager.vectorstore_path
+            return self._initialize()
+    
+    def _initialize(self):
         try:
             print("Initializing Exercise Recommender...")
             
@@ -24,11 +63,31 @@ class ExerciseRecommender:
             if self.vectorstore is None:
                 raise ValueError("Failed to create or load vectorstore")
             
+            if HYBRID_SEARCH_ENABLED:
+                self.lexical_index = self.vectorstore_manager.lexical_index
+            self.attribute_index = self.vectorstore_manager.attribute_index
+            self.muscle_matrix = self.vectorstore_manager.muscle_matrix
+            self.field_index = self.vectorstore_manager.field_index
+            self._load_row_attributes()
+            
+            if self.reranker is not None:
+                try:
+                    self.reranker.load()
+                except Exception as e:
+                    print(f"⚠️ Reranker unavailable, keeping the retrieval order: {str(e)}")
+                    self.reranker = None
+            
+            # Warm the embedding cache with the per-muscle prompts and the most searched queries
+            hot_queries = ["test"] + [MUSCLE_QUERY_TEMPLATE.format(muscle=m) for m in VALID_MUSCLES]
+            hot_queries += SearchHistoryStore(SEARCH_HISTORY_PATH).hot_queries(SEARCH_HISTORY_PREWARM)
+            warmed = self.vectorstore_manager.prewarm_query_cache(hot_queries)
+            print(f"Prewarmed {warmed} query embeddings")
+            
             # Test the vectorstore with a simple query
             print("Testing vectorstore...")
-            test_results = self.vectorstore.similarity_search("test", k=1)
+            test_rows = self._test_search()
             
-            if not test_results:
+            if not test_rows:
                 raise ValueError("Vectorstore is empty or not working properly")
             
             self._initialized = True
@@ -39,63 +98,585 @@ class ExerciseRecommender:
             print("Full traceback:")
             traceback.print_exc()
             self.vectorstore = None
+            self.lexical_index = None
             self._initialized = False
             raise e
     
+    def _test_search(self):
+        """Row ids found for a probe query, through the same search path as requests"""
+        manager = self.vectorstore_manager
+        _, rows = manager.search_vectors(manager.embed_queries(["test"]), 1)
+        return [int(row_id) for row_id in rows[0] if row_id >= 0]
+    
     def is_initialized(self):
         """Check if the recommender is properly initialized"""
         return self._initialized and self.vectorstore is not None
     
-    def get_exercises(self, query: str):
-        """Get exercise recommendations based on user query"""
-        if not self.is_initialized():
-            return ["❌ Recommender not properly initialized. Please check the setup."]
+    def _exact_match_search(self, query, muscles, num_exercises, allowed=None):
+        """Answer from the lexical index alone when the query names exercises or equipment.
+
+        Every exact match is ranked by BM25 and then picked with the same MMR,
+        per-name limit and per-muscle quotas as dense results. Returns None when
+        there are not enough exact matches, or not enough distinct exercises
+        among them, so the caller falls through to dense search.
+        """
+        if self.lexical_index is None:
+            return None
+        
+        rows = self.lexical_index.exact_matches(query)
+        if muscles:
+            rows = {r for r in rows if self.lexical_index.row_muscles[r] in muscles}
+        if allowed is not None:
+            rows = {r for r in rows if allowed[r]}
+        if len(rows) < num_exercises:
+            return None
+        
+        ranked = self.lexical_index.search(query, k=len(rows), rows=rows)
+        if len(ranked) < num_exercises:
+            return None
+        candidates = np.asarray([row_id for row_id, _ in ranked])
+        relevance = np.asarray([score for _, score in ranked], dtype=np.float32)
+        
+        # Variants of one exercise count once per allowed slot
+        name_ids = self._row_name_ids(candidates)
+        if name_ids is not None and self.max_per_name and \
+                np.minimum(np.bincount(name_ids), self.max_per_name).sum() < num_exercises:
+            return None
+        
+        groups = quotas = None
+        if muscles:
+            groups = np.asarray([muscles.index(self.lexical_index.row_muscles[r]) for r in candidates])
+            quotas = self.retrieval_planner.allocate_quotas(num_exercises, len(muscles))
+        # BM25 scores scaled to [0, 1] so the MMR trade-off matches dense relevance
+        order = mmr_rerank(
+            self._row_vectors(candidates), relevance / relevance.max(), groups,
+            quotas=quotas, top_n=num_exercises, name_ids=name_ids,
+            lambda_=self.mmr_lambda, max_per_name=self.max_per_name
+        )
+        return [int(candidates[i]) for i in order]
+    
+    def _row_vectors(self, rows, overlay=None):
+        """Unit vectors for row ids, including a tenant's custom rows"""
+        vectors = self.vectorstore_manager.get_vectors()
+        if overlay is None or not overlay.size:
+            return vectors[rows]
+        rows = np.asarray(rows)
+        is_base = rows < overlay.base_size
+        out = np.empty((len(rows), vectors.shape[1]), dtype=np.float32)
+        out[is_base] = vectors[rows[is_base]]
+        out[~is_base] = overlay.vectors[rows[~is_base] - overlay.base_size]
+        return out
+    
+    def _row_name_ids(self, rows, overlay=None):
+        """Exercise-name ids for row ids; every custom exercise counts as its own name"""
+        if self._name_ids is None:
+            return None
+        if overlay is None or not overlay.size:
+            return self._name_ids[rows]
+        rows = np.asarray(rows)
+        custom_ids = self._name_ids.max() + 1 + (rows - overlay.base_size)
+        return np.where(rows < overlay.base_size, self._name_ids[np.minimum(rows, overlay.base_size - 1)], custom_ids)
+    
+    def get_documents(self, row_ids, tenant=None):
+        """Documents for row ids, resolving a tenant's custom rows from its overlay"""
+        overlay = self.tenants.get(tenant) if tenant else None
+        if overlay is None or not overlay.size:
+            return self.vectorstore_manager.get_documents(row_ids)
+        return [
+            overlay.documents[row_id - overlay.base_size] if row_id >= overlay.base_size
+            else self.vectorstore_manager.get_documents([row_id])[0]
+            for row_id in row_ids
+        ]
+    
+    def _allowed_rows(self, filters, overlay=None, involvement=None):
+        """Base rows the request may return as a boolean mask, or None when nothing is excluded"""
+        allowed = overlay.available if overlay is not None else None
+        if filters:
+            if self.attribute_index is None:
+                raise ValueError("Attribute filters are unavailable for this index")
+            mask = self.attribute_index.to_mask(self.attribute_index.evaluate(filters))
+            allowed = mask if allowed is None else allowed & mask
+        if involvement:
+            role, muscle_ids = involvement
+            mask = self.muscle_matrix.rows_with(muscle_ids, [role])
+            allowed = mask if allowed is None else allowed & mask
+        return allowed
+    
+    def _field_weights(self, num_prompts, query=None):
+        """Field fusion weights for the muscle prompts and the full query, None without a field index"""
+        if self.field_index is None:
+            return None
+        kinds = ['muscle'] * num_prompts
+        if query:
+            named = self.attribute_index.named_attributes(query) if self.attribute_index is not None else set()
+            kinds.append('equipment' if named & {'equipment', 'mechanics', 'force', 'utility'} else 'general')
+        return self.field_index.weights(kinds)
+    
+    def _relevance(self, rows, unit_queries, query_ids, overlay=None, field_weights=None):
+        """Similarity of ``rows[i]`` to query ``query_ids[i]``; field-fused for base rows when available"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if field_weights is None:
+            return np.einsum('ij,ij->i', self._row_vectors(rows, overlay), unit_queries[query_ids])
+        relevance = np.empty(len(rows), dtype=np.float32)
+        base = rows < self.field_index.num_rows
+        relevance[base] = self.field_index.pair_scores(
+            unit_queries[query_ids[base]], field_weights[query_ids[base]], rows[base]
+        )
+        # Tenant custom exercises only have their single whole-entry vector
+        relevance[~base] = np.einsum('ij,ij->i', self._row_vectors(rows[~base], overlay), unit_queries[query_ids[~base]])
+        return relevance
+    
+    def _base_search(self, query_vectors, unit_queries, k, allowed=None, field_weights=None):
+        """Row ids of the k nearest allowed base rows per query, -1 where there are fewer"""
+        if allowed is None:
+            return self.vectorstore_manager.search_vectors(query_vectors, k, field_weights)[1]
+        
+        matching = int(allowed.sum())
+        strategy, size = self.filter_planner.plan(matching, len(allowed), k)
+        if strategy == 'postfilter':
+            _, rows = self.vectorstore_manager.search_vectors(query_vectors, size, field_weights)
+            rows = np.where((rows >= 0) & allowed[np.maximum(rows, 0)], rows, -1)
+            if (rows >= 0).sum(axis=1).min() >= min(k, matching):
+                return rows
+            self.filter_planner.record('fallback')
         
+        # Selective filter (or too few post-filter survivors): score the matching rows exactly
+        candidate_rows = np.flatnonzero(allowed)
+        with metrics.timer('search'):
+            scores = self.vectorstore_manager.score_rows(unit_queries, candidate_rows, field_weights)
+            top = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+        return candidate_rows[top]
+    
+    def _search_candidates(self, prompts, k, query=None, overlay=None, allowed=None, custom_allowed=None):
+        """Search all prompts (and the full query) in one batch and score every candidate.
+
+        Returns (rows, relevance, groups, fetched) with one entry per distinct
+        row id. ``groups`` is the index of the prompt the row was kept for;
+        rows found only for the full query get the extra group ``len(prompts)``.
+        Candidates for the full query are dense results fused with BM25
+        through reciprocal-rank fusion. ``allowed`` masks the base rows (tenant
+        availability and attribute filters); with a tenant ``overlay`` its
+        custom exercises inside ``custom_allowed`` are merged in. With the
+        field index every query searches all field sub-indexes at once and
+        the fields are weighted by the kind of query.
+        """
+        texts = list(prompts) + ([query] if query else [])
+        query_vectors = self.vectorstore_manager.embed_queries(texts)
+        norms = np.linalg.norm(query_vectors, axis=1, keepdims=True)
+        unit_queries = query_vectors / np.where(norms == 0, 1, norms)
+        field_weights = self._field_weights(len(prompts), query)
+        
+        rows = self._base_search(query_vectors, unit_queries, k, allowed, field_weights)
+        if overlay is not None and overlay.size:
+            _, custom_rows = overlay.search_custom(unit_queries, k, custom_allowed)
+            rows = np.concatenate([rows, custom_rows], axis=1)
+        fetched = int((rows >= 0).sum())
+        query_vectors = unit_queries
+        
+        groups = np.repeat(np.arange(len(prompts)), rows.shape[1])
+        muscle_rows = rows[:len(prompts)].ravel()
+        valid = muscle_rows >= 0
+        muscle_rows, groups = muscle_rows[valid], groups[valid]
+        relevance = self._relevance(muscle_rows, query_vectors, groups, overlay, field_weights)
+        rows_out, relevance, groups = merge_candidates(muscle_rows, relevance, groups)
+        
+        if not query:
+            return rows_out, relevance, groups, fetched
+        
+        # Full-query candidates only add rows that no muscle prompt already found
+        query_rows = rows[-1][rows[-1] >= 0]
+        query_relevance = self._relevance(
+            query_rows, query_vectors, np.full(len(query_rows), len(texts) - 1), overlay, field_weights
+        )
+        order = np.argsort(-query_relevance, kind='stable')[:k]
+        query_rows, query_relevance = [int(r) for r in query_rows[order]], query_relevance[order]
+        if self.lexical_index is not None and query_rows:
+            with metrics.timer('lexical'):
+                lexical_rows = [row_id for row_id, _ in self.lexical_index.search(query, k)]
+                if allowed is not None:
+                    lexical_rows = [row_id for row_id in lexical_rows if allowed[row_id]]
+            fetched += len(lexical_rows)
+            query_rows = reciprocal_rank_fusion([query_rows, lexical_rows])[:k]
+            # Keep the fused order but reuse the dense scores by rank, so they stay on the same scale
+            ranks = np.minimum(np.arange(len(query_rows)), len(query_relevance) - 1)
+            query_relevance = query_relevance[ranks]
+        
+        query_rows = np.asarray(query_rows, dtype=np.int64)
+        extra = ~np.isin(query_rows, rows_out)
+        rows_out = np.concatenate([rows_out, query_rows[extra]])
+        relevance = np.concatenate([relevance, query_relevance[extra]])
+        groups = np.concatenate([groups, np.full(int(extra.sum()), len(prompts))])
+        return rows_out, relevance, groups, fetched
+    
+    def _load_row_attributes(self):
+        """Load per-row exercise names used to keep near-duplicates out of the results"""
         try:
-            num_exercises, muscles = self.query_processor.parse_query(query)
+            table = self.vectorstore_manager.get_exercise_table()
+            if len(table) != self.vectorstore.index.ntotal:
+                raise ValueError("exercise table does not match the vectorstore")
+            self._name_ids = pd.factorize(table['Exercise Name'].map(normalize_phrase))[0]
+        except Exception as e:
+            print(f"Warning: exercise names unavailable, diversity limited to MMR: {e}")
+            self._name_ids = None
+    
+    def parse_intent(self, query: str):
+        """Parsed intent of a query as ``(num_exercises, muscles)``"""
+        return self.query_processor.parse_query(query)
+    
+    def recommend(self, query: str, profile=False, intent=None, tenant=None, filters=None):
+        """Get recommendations as a structured result.
+
+        Returns a dict with the parsed intent (``num_exercises``, ``muscles``),
+        the selected ``rows`` in ranked order and an ``error`` message, which
+        is None on success. ``profile=True`` profiles this request regardless
+        of the configured sampling rate. An ``intent`` already returned by
+        ``parse_intent`` skips parsing the query again. ``tenant`` restricts
+        and extends the catalogue with that gym's overlay. ``filters`` maps
+        attributes (equipment, mechanics, force, utility, difficulty, ...) to
+        a value, a list of values or a ``{'min', 'max'}`` range; filters spelled
+        out in the query ("equipment: cable", "difficulty <= 2") are added to
+        them, and all applied filters are returned as ``filters``.
+        """
+        with metrics.timer('recommend'):
+            if not self.profiler.should_profile(profile):
+                return self._recommend(query, intent, tenant, filters)
             
-            if not muscles:
-                return ["❌ No valid muscles found. Try muscle names like: Chest, Back, Shoulder, Arms, Legs, etc."]
+            with self.profiler.profile('recommend', {'query': query}) as info:
+                result = self._recommend(query, intent, tenant, filters)
+                info.update({k: result[k] for k in ('num_exercises', 'muscles', 'rows', 'error')})
+                return result
+    
+    def _rerank(self, query, rows, relevance, tenant, result, deadline=None):
+        """Cross-encoder reranking of the top candidates when enabled; adds its cost to ``result['rerank']``"""
+        if self.reranker is None or not len(rows):
+            return relevance
+        
+        with metrics.timer('rerank'):
+            documents_fn = lambda row_ids: [doc.page_content for doc in self.get_documents(row_ids, tenant)]
+            relevance, info = self.reranker.rerank(query, rows, relevance, documents_fn, tenant, deadline)
+        
+        # Streaming reranks once per stage; report the request as a whole
+        previous = result.get('rerank')
+        if previous:
+            for key in ('candidates', 'cached', 'scored', 'ms'):
+                info[key] += previous[key]
+            info['timed_out'] = info['timed_out'] or previous['timed_out']
+        info['hit_rate'] = info['cached'] / info['candidates'] if info['candidates'] else 0.0
+        result['rerank'] = info
+        return relevance
+    
+    def _new_result(self, query, tenant):
+        """Empty result for a request, and the tenant overlay it runs against (None on error)"""
+        result = {'query': query, 'num_exercises': 0, 'muscles': [], 'filters': {}, 'involvement': None, 'rows': [],
+                  'rerank': None, 'error': None}
+        if not self.is_initialized():
+            result['error'] = "❌ Recommender not properly initialized. Please check the setup."
+            return result, None
+        
+        try:
+            return result, self.tenants.get(tenant) if tenant else None
+        except (KeyError, ValueError):
+            # ValueError: not a valid tenant id at all
+            result['error'] = f"❌ Unknown gym: {tenant}"
+            return result, None
+    
+    def _prepare_request(self, query, intent, overlay, filters, result):
+        """Parse the intent and filters of a request into ``result``.
+
+        Returns ``(muscles, allowed, custom_allowed)`` for the dense search, or
+        None when ``result`` is already complete (exact matches or an error).
+        """
+        num_exercises, muscles = intent if intent is not None else self.parse_intent(query)
+        muscles = list(muscles)
+        result.update({'num_exercises': num_exercises, 'muscles': muscles})
+        try:
+            validate_filters(filters)
+        except ValueError as e:
+            result['error'] = f"❌ {e}"
+            return None
+        
+        with metrics.timer('filter'):
+            if QUERY_FILTERS_ENABLED and self.attribute_index is not None:
+                filters = {**self.attribute_index.parse_filters(query), **(filters or {})}
+            result['filters'] = filters or {}
+            # "works rear delts as synergist" restricts results to exercises listing that role
+            involvement = self.muscle_matrix.parse_query(query) if self.muscle_matrix is not None else None
+            if involvement:
+                role, muscle_ids = involvement
+                result['involvement'] = {'role': role, 'muscles': self.muscle_matrix.muscle_names(muscle_ids)}
+            allowed = self._allowed_rows(filters, overlay, involvement)
+            custom_allowed = overlay.custom_allowed(filters) if overlay is not None else None
+            if involvement and overlay is not None:
+                # Custom exercises carry no per-role muscle columns
+                custom_allowed = np.zeros(overlay.size, dtype=bool)
+        
+        # Queries naming an exercise or equipment short-circuit dense search
+        with metrics.timer('lexical'):
+            exact_rows = self._exact_match_search(query, muscles, num_exercises, allowed)
+        if exact_rows:
+            result['rows'] = exact_rows
+            return None
+        
+        # With attribute or muscle-role filters the query alone is enough to search on
+        if not muscles and not filters and not involvement:
+            result['error'] = "❌ No valid muscles found. Try muscle names like: Chest, Back, Shoulder, Arms, Legs, etc."
+            return None
+        return muscles, allowed, custom_allowed
+    
+    def _recommend(self, query: str, intent=None, tenant=None, filters=None):
+        result, overlay = self._new_result(query, tenant)
+        if result['error']:
+            return result
+        
+        try:
+            request = self._prepare_request(query, intent, overlay, filters, result)
+            if request is None:
+                return result
+            muscles, allowed, custom_allowed = request
+            num_exercises = result['num_exercises']
             
-            per_muscle = max(1, num_exercises // len(muscles))
-            all_results = []
-            seen = set()
+            index_size = self.vectorstore.index.ntotal
+            plan = self.retrieval_planner.plan(num_exercises, len(muscles), index_size)
             
-            # Get exercises for each muscle group
-            for muscle in muscles:
-                try:
-                    results = self.vectorstore.similarity_search(f"exercises for {muscle}", k=per_muscle * 2)
-                    count = 0
-                    for res in results:
-                        if res.page_content not in seen and count < per_muscle:
-                            all_results.append(res)
-                            seen.add(res.page_content)
-                            count += 1
-                except Exception as e:
-                    print(f"Error searching for muscle {muscle}: {e}")
-                    continue
+            # Retrieve candidates for every muscle group and the full query in one batched search
+            prompts = [MUSCLE_QUERY_TEMPLATE.format(muscle=muscle) for muscle in muscles]
+            rows, relevance, groups, fetched = self._search_candidates(
+                prompts, plan['k'], query=query, overlay=overlay, allowed=allowed, custom_allowed=custom_allowed
+            )
+            relevance = self._rerank(query, rows, relevance, tenant, result)
             
-            # Fill remaining slots if needed
-            if len(all_results) < num_exercises:
-                try:
-                    extra_needed = num_exercises - len(all_results)
-                    fallback = self.vectorstore.similarity_search(query, k=extra_needed * 2)
-                    for res in fallback:
-                        if res.page_content not in seen and len(all_results) < num_exercises:
-                            all_results.append(res)
-                            seen.add(res.page_content)
-                except Exception as e:
-                    print(f"Error in fallback search: {e}")
+            # Re-rank for diversity under exact per-muscle quotas, deduping on row ids
+            with metrics.timer('dedup'):
+                order = mmr_rerank(
+                    self._row_vectors(rows, overlay), relevance, groups,
+                    quotas=plan['quotas'] + [0], top_n=plan['top_n'],
+                    name_ids=self._row_name_ids(rows, overlay),
+                    lambda_=self.mmr_lambda, max_per_name=self.max_per_name
+                )
+            result['rows'] = [int(rows[i]) for i in order]
             
-            if not all_results:
-                return ["❌ No exercises found. Try different muscle groups or check your spelling."]
+            filled = np.bincount(groups[order], minlength=len(muscles) + 1)[:len(muscles)]
+            shortfall = int(np.maximum(np.asarray(plan['quotas']) - filled, 0).sum())
+            self.retrieval_planner.record(plan, len(prompts) + 1, fetched, len(rows), shortfall, index_size)
             
-            return [doc.page_content for doc in all_results[:num_exercises]]
+            if not result['rows']:
+                result['error'] = "❌ No exercises found. Try different muscle groups or check your spelling."
             
         except Exception as e:
             print(f"Error in get_exercises: {str(e)}")
             traceback.print_exc()
-            return [f"❌ Error searching for exercises: {str(e)}"]
+            result['error'] = f"❌ Error searching for exercises: {str(e)}"
+        
+        return result
+    
+    def search(self, query: str, profile=False, intent=None, tenant=None, filters=None):
+        """Handle one search request end to end.
+
+        Returns the ``recommend`` result extended with the document texts
+        (``exercises``), per-stage ``timings`` and the total time, both in
+        milliseconds.
+        """
+        start = time.perf_counter()
+        with metrics.capture() as timings:
+            result = self.recommend(query, profile=profile, intent=intent, tenant=tenant, filters=filters)
+            with metrics.timer('fetch'):
+                documents = [] if result['error'] else self.get_documents(result['rows'], tenant)
+        result['exercises'] = [doc.page_content for doc in documents]
+        result['timings'] = {stage: seconds * 1000.0 for stage, seconds in timings.items()}
+        result['total_ms'] = (time.perf_counter() - start) * 1000.0
+        return result
+    
+    def _recommend_stages(self, query, intent, tenant, filters, result):
+        """Run a request one retrieval stage at a time, yielding each stage's picks.
+
+        A stage is one muscle group, then the full query for whatever the
+        muscle quotas left open. Every stage yields a list of (row_id, group,
+        score) and ``result`` is complete when the generator is exhausted.
+        """
+        new_result, overlay = self._new_result(query, tenant)
+        result.update(new_result)
+        if result['error']:
+            return
+        
+        try:
+            request = self._prepare_request(query, intent, overlay, filters, result)
+            if request is None:
+                if result['rows']:
+                    yield [(row_id, None, None) for row_id in result['rows']]
+                return
+            muscles, allowed, custom_allowed = request
+            
+            index_size = self.vectorstore.index.ntotal
+            plan = self.retrieval_planner.plan(result['num_exercises'], len(muscles), index_size)
+            prompts = [MUSCLE_QUERY_TEMPLATE.format(muscle=muscle) for muscle in muscles]
+            stages = [([prompt], None, quota) for prompt, quota in zip(prompts, plan['quotas'])] + [([], query, None)]
+            
+            picked, fetched, distinct = [], 0, 0
+            deadline = self.reranker.deadline() if self.reranker is not None else None
+            for group, (stage_prompts, stage_query, quota) in enumerate(stages):
+                wanted = quota if quota is not None else plan['top_n'] - len(picked)
+                if wanted <= 0:
+                    continue
+                rows, relevance, _, stage_fetched = self._search_candidates(
+                    stage_prompts, plan['k'], query=stage_query, overlay=overlay, allowed=allowed,
+                    custom_allowed=custom_allowed
+                )
+                relevance = self._rerank(query, rows, relevance, tenant, result, deadline)
+                fetched += stage_fetched
+                distinct += len(rows)
+                
+                # Earlier stages' picks are already on screen: skip them and stay diverse from them
+                fresh = ~np.isin(rows, picked)
+                rows, relevance = rows[fresh], relevance[fresh]
+                picked_rows = np.asarray(picked, dtype=np.int64)
+                with metrics.timer('dedup'):
+                    order = mmr_rerank(
+                        self._row_vectors(rows, overlay), relevance, top_n=wanted,
+                        name_ids=self._row_name_ids(rows, overlay),
+                        lambda_=self.mmr_lambda, max_per_name=self.max_per_name,
+                        picked_vectors=self._row_vectors(picked_rows, overlay),
+                        picked_name_ids=self._row_name_ids(picked_rows, overlay) if picked else None
+                    )
+                picks = [(int(rows[i]), muscles[group] if group < len(muscles) else None, float(relevance[i]))
+                         for i in order]
+                picked.extend(row_id for row_id, _, _ in picks)
+                result['rows'] = list(picked)
+                if picks:
+                    yield picks
+            
+            shortfall = max(plan['top_n'] - len(picked), 0)
+            self.retrieval_planner.record(plan, len(stages), fetched, distinct, shortfall, index_size)
+            if not picked:
+                result['error'] = "❌ No exercises found. Try different muscle groups or check your spelling."
+            
+        except Exception as e:
+            print(f"Error in stream_search: {str(e)}")
+            traceback.print_exc()
+            result['error'] = f"❌ Error searching for exercises: {str(e)}"
+    
+    def stream_search(self, query: str, intent=None, tenant=None, filters=None):
+        """Handle one search request, yielding each exercise as soon as its stage has picked it.
+
+        Yields ``{'type': 'result', ...}`` events with the ``rank``, ``row_id``,
+        muscle ``group`` (None for rows found for the full query or by exact
+        match), relevance ``score``, document text (``exercise``) and
+        ``elapsed_ms``, then one ``{'type': 'done', 'response': ...}`` event
+        holding the same response ``search`` returns. Muscle groups are searched
+        one after another so the first exercises only wait for the first
+        search; ``search`` is cheaper when only the full set matters.
+        """
+        start = time.perf_counter()
+        result, timings = {}, {}
+        stages = self._recommend_stages(query, intent, tenant, filters, result)
+        exercises = []
+        while True:
+            # Each step may run on a different thread (e.g. the HTTP executor), so capture per step
+            with metrics.capture() as step_timings:
+                picks = next(stages, None)
+                if picks is not None:
+                    with metrics.timer('fetch'):
+                        documents = self.get_documents([row_id for row_id, _, _ in picks], tenant)
+            for stage, seconds in step_timings.items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+            if picks is None:
+                break
+            
+            for (row_id, group, score), document in zip(picks, documents):
+                exercises.append(document.page_content)
+                yield {
+                    'type': 'result',
+                    'rank': len(exercises) - 1,
+                    'row_id': row_id,
+                    'group': group,
+                    'score': score,
+                    'exercise': document.page_content,
+                    'elapsed_ms': (time.perf_counter() - start) * 1000.0
+                }
+        
+        result['exercises'] = [] if result['error'] else exercises
+        result['timings'] = {stage: seconds * 1000.0 for stage, seconds in timings.items()}
+        result['total_ms'] = (time.perf_counter() - start) * 1000.0
+        yield {'type': 'done', 'response': result}
+    
+    def similar_exercises(self, row_id, filters=None, k=DEFAULT_NUM_EXERCISES):
+        """Substitutes for one exercise from the precomputed similarity graph.
+
+        ``filters`` may set ``same_muscle`` and ``different_equipment`` to
+        True, or ``equipment`` to the equipment names that are available.
+        Returns up to ``k`` (row_id, similarity) pairs, most similar first.
+        """
+        graph = self.vectorstore_manager.similarity_graph
+        if not self.is_initialized() or graph is None:
+            raise RuntimeError("Similarity graph not available. Please check the setup.")
+        
+        filters = filters or {}
+        unknown = set(filters) - set(GRAPH_FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown similarity filters: {sorted(unknown)}")
+        if not 0 <= row_id < len(graph.neighbors):
+            raise ValueError(f"Unknown exercise row id: {row_id}")
+        return graph.neighbors_of(row_id, k=k, **filters)
+    
+    def muscle_roles(self, row_id):
+        """Muscles an exercise works by role: target, synergist, stabilizer, dynamic_stabilizer, antagonist"""
+        if not self.is_initialized() or self.muscle_matrix is None:
+            raise RuntimeError("Muscle matrix not available. Please check the setup.")
+        if not 0 <= row_id < self.muscle_matrix.matrix.shape[0]:
+            raise ValueError(f"Unknown exercise row id: {row_id}")
+        return self.muscle_matrix.muscles_of(row_id)
+    
+    def antagonist_superset(self, row_id, k=DEFAULT_NUM_EXERCISES):
+        """Exercises to superset with ``row_id``, training the muscles that oppose its targets.
+
+        Returns up to ``k`` (row_id, score) pairs, highest overlap first; ties go
+        to the exercises closest to ``row_id`` in the embedding space, and only
+        one variant per exercise name is kept.
+        """
+        if not self.is_initialized() or self.muscle_matrix is None:
+            raise RuntimeError("Muscle matrix not available. Please check the setup.")
+        if not 0 <= row_id < self.muscle_matrix.matrix.shape[0]:
+            raise ValueError(f"Unknown exercise row id: {row_id}")
+        
+        scores = self.muscle_matrix.antagonist_scores(row_id)
+        vectors = self.vectorstore_manager.get_vectors()
+        similarity = vectors @ vectors[row_id]
+        order = np.lexsort((-similarity, -scores))
+        
+        pairs, seen_names = [], set()
+        for row in order:
+            if scores[row] <= 0 or len(pairs) == k:
+                break
+            name_id = self._name_ids[row] if self._name_ids is not None else row
+            if name_id in seen_names:
+                continue
+            seen_names.add(name_id)
+            pairs.append((int(row), float(scores[row])))
+        return pairs
+    
+    def generate_plan(self, days, **constraints):
+        """Generate a multi-day workout plan in one call.
+
+        ``days`` lists the muscles trained each day; ``constraints`` are passed
+        to ``WorkoutPlanner.generate`` (per_muscle, max_difficulty, equipment,
+        exclude by exercise name, seed, day_names).
+        """
+        if not self.is_initialized():
+            raise RuntimeError("Recommender not properly initialized. Please check the setup.")
+        
+        if self._workout_planner is None:
+            self._workout_planner = WorkoutPlanner(
+                self.vectorstore_manager.get_exercise_table(),
+                self.vectorstore_manager.get_vectors(),
+                name_ids=self._name_ids
+            )
+        return self._workout_planner.generate(days, **constraints)
+    
+    def get_exercises(self, query: str, profile=False):
+        """Get exercise recommendations based on user query"""
+        result = self.recommend(query, profile=profile)
+        if result['error']:
+            return [result['error']]
+        return [doc.page_content for doc in self.vectorstore_manager.get_documents(result['rows'])]
     
     def get_status(self):
         """Get detailed status information about the recommender"""
@@ -107,12 +688,18 @@ class ExerciseRecommender:
         
         if self.vectorstore:
             try:
-                # Try to get the number of documents
-                test_search = self.vectorstore.similarity_search("test", k=1)
-                status['vectorstore_working'] = len(test_search) > 0
+                status['vectorstore_working'] = len(self._test_search()) > 0
             except:
                 status['vectorstore_working'] = False
         else:
             status['vectorstore_working'] = False
         
+        status['embedding'] = self.vectorstore_manager.get_embedding_stats()
+        status['index_mapping'] = self.vectorstore_manager.get_index_mapping()
+        status['retrieval'] = self.retrieval_planner.get_stats()
+        status['filters'] = self.filter_planner.get_stats()
+        status['field_index'] = self.field_index.fields if self.field_index is not None else None
+        status['reranker'] = self.reranker.get_stats() if self.reranker is not None else None
+        status['latency'] = metrics.get_summary()
+        
         return status
\ No newline at end of file
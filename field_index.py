@@ -0,0 +1,91 @@
+"""Per-field exercise vectors, searched in one batch and fused by query intent"""
+import os
+import numpy as np
+from vector_codec import chunked_scores
+from config import FIELD_WEIGHTS
+
+# Sub-indexes and the columns embedded into each; short queries about muscles
+# no longer compete with the long preparation / execution text
+INDEX_FIELDS = {
+    'name': ['Exercise Name', 'Equipment', 'Variation', 'Utility', 'Mechanics', 'Force'],
+    'muscles': ['Main_muscle', 'Target_Muscles', 'Synergist_Muscles', 'Secondary Muscles'],
+    'execution': ['Preparation', 'Execution']
+}
+
+
+def format_field_text(row, columns):
+    """Text embedded for one field of one exercise"""
+    return "\n".join(f"{column.replace('_', ' ')}: {row.get(column, 'N/A')}" for column in columns)
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+class FieldIndex:
+    """One float16 vector per (field, exercise), stored as a (fields, rows, dim) array.
+
+    A query is scored against each field in turn and the per-field cosine
+    similarities are combined with weights that depend on
+    the kind of query (FIELD_WEIGHTS): per-muscle prompts lean on the muscle
+    field, queries naming equipment or mechanics on the name field.
+    """
+
+    def __init__(self, fields, vectors):
+        self.fields = list(fields)
+        self.vectors = vectors
+
+    @classmethod
+    def build(cls, data, embed_documents):
+        """Embed every field of every row with ``embed_documents`` (a list of texts -> list of vectors)"""
+        vectors = []
+        for columns in INDEX_FIELDS.values():
+            texts = [format_field_text(row, columns) for _, row in data.iterrows()]
+            vectors.append(_unit(embed_documents(texts)).astype(np.float16))
+        return cls(list(INDEX_FIELDS), np.stack(vectors))
+
+    @property
+    def num_rows(self):
+        return self.vectors.shape[1]
+
+    def weights(self, kinds):
+        """(queries, fields) fusion weights for a list of query kinds ('muscle', 'equipment', 'general')"""
+        weights = np.asarray([[FIELD_WEIGHTS[kind].get(field, 0.0) for field in self.fields] for kind in kinds],
+                             dtype=np.float32).reshape(len(kinds), len(self.fields))
+        return weights / np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+
+    def score(self, queries, weights, rows=None):
+        """Fused similarity of every query to every row (or to ``rows``), as a (queries, rows) matrix"""
+        queries = _unit(queries)
+        scores = np.zeros((len(queries), self.num_rows if rows is None else len(rows)), dtype=np.float32)
+        # One field at a time against the stored float16 vectors, widened chunk by chunk
+        for field in range(len(self.fields)):
+            if not weights[:, field].any():
+                continue
+            vectors = self.vectors[field] if rows is None else self.vectors[field, rows]
+            scores += weights[:, field:field + 1] * chunked_scores(queries, vectors)
+        return scores
+
+    def pair_scores(self, queries, weights, rows):
+        """Fused similarity of ``rows[i]`` to ``queries[i]``"""
+        similarity = np.einsum('qd,fqd->qf', _unit(queries), self.vectors[:, rows].astype(np.float32))
+        return (similarity * weights).sum(axis=1)
+
+    def search(self, queries, weights, k):
+        """(scores, row_ids) of the k best rows per query, best first"""
+        scores = self.score(queries, weights)
+        k = min(k, self.num_rows)
+        rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(scores, rows, axis=1)
+        order = np.argsort(-top, axis=1, kind='stable')
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, fields=np.asarray(self.fields, dtype=str), vectors=self.vectors)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['fields'].tolist(), data['vectors'])
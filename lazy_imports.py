@@ -0,0 +1,52 @@
+"""Deferred imports for heavy dependencies"""
+import importlib
+import sys
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that performs the real import on first attribute access.
+
+    Lets a module name torch-, spaCy- or plotly-backed dependencies at the
+    top of the file while only paying for them on the code paths that use
+    them.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__['_lazy_module'] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name):
+    """Return the module if it is already imported, otherwise a lazy proxy for it"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def is_loaded(name):
+    """Whether a module has really been imported in this process"""
+    return name in sys.modules
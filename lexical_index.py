@@ -0,0 +1,173 @@
+"""BM25 lexical index over exercise fields"""
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+import numpy as np
+from config import BM25_K1, BM25_B, RRF_K
+
+# Fields indexed for BM25 and how many times their tokens are counted
+LEXICAL_FIELDS = {
+    'Exercise Name': 3,
+    'Equipment': 2,
+    'Variation': 1,
+    'Utility': 1,
+    'Mechanics': 1,
+    'Force': 1,
+    'Main_muscle': 2,
+    'Target_Muscles': 1,
+    'Synergist_Muscles': 1,
+    'Secondary Muscles': 1
+}
+
+# Fields whose full value can be matched as an exact phrase in a query
+PHRASE_FIELDS = ['Exercise Name', 'Equipment']
+
+
+def tokenize(text):
+    """Lowercase word tokens, ignoring punctuation"""
+    return re.findall(r'[a-z0-9]+', str(text).lower())
+
+
+def normalize_phrase(text):
+    return " ".join(tokenize(text))
+
+
+def equipment_terms(equipment):
+    """Phrases that name a piece of equipment: "Lever (plate loaded)" is also just "lever" """
+    equipment = str(equipment)
+    return {normalize_phrase(equipment), normalize_phrase(equipment.split('(')[0])}
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse several ranked lists of row ids into one ordering"""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, row_id in enumerate(ranking):
+            scores[row_id] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda row_id: scores[row_id], reverse=True)
+
+
+class LexicalIndex:
+    """Inverted index with BM25 scoring and exact phrase lookup.
+
+    Row ids are positions in the exercise table, which are also the
+    positions of the exercise vectors in the FAISS index.
+    """
+
+    def __init__(self, postings, doc_lengths, phrases, row_muscles, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.num_docs = len(self.doc_lengths)
+        self.avg_length = float(self.doc_lengths.mean()) if self.num_docs else 0.0
+        self.postings = {
+            term: (np.asarray(rows, dtype=np.int32), np.asarray(freqs, dtype=np.float32))
+            for term, (rows, freqs) in postings.items()
+        }
+        self.phrases = phrases
+        self.row_muscles = row_muscles
+
+    @classmethod
+    def from_dataframe(cls, data):
+        """Build the index from the processed exercise table"""
+        postings = defaultdict(lambda: ([], []))
+        doc_lengths = []
+        phrases = defaultdict(lambda: defaultdict(list))
+
+        for row_id, (_, row) in enumerate(data.iterrows()):
+            counts = Counter()
+            for field, weight in LEXICAL_FIELDS.items():
+                value = row.get(field)
+                if value is None or (isinstance(value, float) and math.isnan(value)):
+                    continue
+                for token in tokenize(value):
+                    counts[token] += weight
+
+            for term, freq in counts.items():
+                postings[term][0].append(row_id)
+                postings[term][1].append(freq)
+            doc_lengths.append(sum(counts.values()))
+
+            for field in PHRASE_FIELDS:
+                value = row.get(field)
+                if not isinstance(value, str):
+                    continue
+                phrases[field][normalize_phrase(value)].append(row_id)
+                # "Lever (plate loaded)" should also match a plain "lever"
+                head = value.split('(')[0]
+                if head != value:
+                    phrases[field][normalize_phrase(head)].append(row_id)
+
+        row_muscles = [str(m) for m in data['Main_muscle']]
+        return cls(dict(postings), doc_lengths, {f: dict(p) for f, p in phrases.items()}, row_muscles)
+
+    def save(self, path):
+        """Persist the index as JSON"""
+        payload = {
+            'k1': self.k1,
+            'b': self.b,
+            'doc_lengths': self.doc_lengths.tolist(),
+            'postings': {term: [rows.tolist(), freqs.tolist()] for term, (rows, freqs) in self.postings.items()},
+            'phrases': self.phrases,
+            'row_muscles': self.row_muscles
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(payload, f)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved with ``save``"""
+        with open(path, 'r') as f:
+            payload = json.load(f)
+        return cls(payload['postings'], payload['doc_lengths'], payload['phrases'],
+                   payload['row_muscles'], k1=payload['k1'], b=payload['b'])
+
+    def score(self, query):
+        """BM25 score of every row for the query, as a dense array"""
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        if not self.num_docs:
+            return scores
+
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / self.avg_length)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            rows, freqs = self.postings[term]
+            idf = math.log(1 + (self.num_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * freqs * (self.k1 + 1) / (freqs + norm[rows])
+        return scores
+
+    def search(self, query, k, rows=None):
+        """Top-k (row_id, score) pairs with a positive BM25 score"""
+        scores = self.score(query)
+        if rows is not None:
+            mask = np.zeros(self.num_docs, dtype=bool)
+            mask[list(rows)] = True
+            scores = np.where(mask, scores, 0.0)
+
+        k = min(k, self.num_docs)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(row_id), float(scores[row_id])) for row_id in top if scores[row_id] > 0]
+
+    def exact_matches(self, query):
+        """Rows whose exercise name or equipment appears verbatim in the query.
+
+        Matches within a field are unioned and matches across fields are
+        intersected, so "barbell neck flexion" only returns barbell rows.
+        """
+        padded = f" {normalize_phrase(query)} "
+        matched = None
+        for field, field_phrases in self.phrases.items():
+            rows = set()
+            for phrase, phrase_rows in field_phrases.items():
+                if phrase and f" {phrase} " in padded:
+                    rows.update(phrase_rows)
+            if rows:
+                matched = rows if matched is None else matched & rows
+        return matched or set()
@@ -0,0 +1,183 @@
+"""Low-overhead latency histograms with Prometheus text export"""
+import bisect
+import contextlib
+import os
+import threading
+import time
+from config import METRICS_ENABLED, METRICS_PREFIX
+
+# Upper bounds (seconds) of the latency buckets, Prometheus style
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Shared no-op context manager handed out when metrics are disabled
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing a value is one bisect and three adds"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.total += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if count == 0:
+            return 0.0
+
+        target = q * count
+        cumulative = 0
+        for slot, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= target and bucket_count:
+                lower = self.buckets[slot - 1] if slot > 0 else 0.0
+                upper = self.buckets[slot] if slot < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (target - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.count
+
+
+class _Timer:
+    __slots__ = ('histogram', 'stage', 'trace', 'start')
+
+    def __init__(self, histogram, stage=None, trace=None):
+        self.histogram = histogram
+        self.stage = stage
+        self.trace = trace
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.histogram is not None:
+            self.histogram.observe(elapsed)
+        if self.trace is not None:
+            self.trace[self.stage] = self.trace.get(self.stage, 0.0) + elapsed
+        return False
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms for the recommendation path"""
+
+    def __init__(self, enabled=METRICS_ENABLED, prefix=METRICS_PREFIX):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+        self._local = threading.local()
+
+    def _histogram(self, stage):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram())
+        return histogram
+
+    def timer(self, stage):
+        """Context manager timing one stage; a shared no-op when metrics are off and nothing is captured"""
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            return _Timer(self._histogram(stage)) if self.enabled else _NULL_TIMER
+        return _Timer(self._histogram(stage) if self.enabled else None, stage, trace)
+
+    @contextlib.contextmanager
+    def capture(self):
+        """Collect the stage durations (seconds) timed on this thread inside the block"""
+        previous = getattr(self._local, 'trace', None)
+        trace = {}
+        self._local.trace = trace
+        try:
+            yield trace
+        finally:
+            self._local.trace = previous
+            if previous is not None:
+                for stage, seconds in trace.items():
+                    previous[stage] = previous.get(stage, 0.0) + seconds
+
+    def observe(self, stage, seconds):
+        """Record an externally measured duration"""
+        if self.enabled:
+            self._histogram(stage).observe(seconds)
+
+    def get_summary(self):
+        """Count, mean and tail latencies per stage, in seconds"""
+        summary = {}
+        for stage, histogram in sorted(self.stages.items()):
+            _, total, count = histogram.snapshot()
+            summary[stage] = {
+                'count': count,
+                'mean': total / count if count else 0.0,
+                'p50': histogram.quantile(0.50),
+                'p95': histogram.quantile(0.95),
+                'p99': histogram.quantile(0.99)
+            }
+        return summary
+
+    def render_prometheus(self):
+        """Render all histograms in the Prometheus text exposition format"""
+        name = f"{self.prefix}_stage_seconds"
+        lines = [
+            f"# HELP {name} Latency of each stage of the recommendation path.",
+            f"# TYPE {name} histogram"
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically write the metrics to a file for a node-exporter textfile collector"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def start_file_exporter(self, path, interval):
+        """Rewrite the metrics file every ``interval`` seconds from a daemon thread"""
+        if not self.enabled or self._exporter is not None:
+            return
+
+        def _export():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_prometheus(path)
+                except OSError as e:
+                    print(f"⚠️ Could not write metrics to {path}: {e}")
+
+        self._exporter = threading.Thread(target=_export, name="metrics-exporter", daemon=True)
+        self._exporter.start()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+
+
+# Process-wide registry used by the recommendation path
+metrics = MetricsRegistry()
@@ -0,0 +1,245 @@
+"""Sparse exercise x muscle x role matrix parsed from the dataset's muscle columns"""
+import os
+import re
+import numpy as np
+from scipy import sparse
+from lexical_index import normalize_phrase
+from config import MUSCLE_ROLE_WEIGHTS
+
+# Role of a muscle in an exercise and the dataset column listing it
+MUSCLE_ROLES = {
+    'target': 'Target_Muscles',
+    'synergist': 'Synergist_Muscles',
+    'stabilizer': 'Stabilizer_Muscles',
+    'dynamic_stabilizer': 'Dynamic_Stabilizer_Muscles',
+    'antagonist': 'Antagonist_Muscles'
+}
+
+# Words that name a role in a query, longest first so "dynamic stabilizer" wins over "stabilizer"
+ROLE_TERMS = [
+    ('dynamic stabilizer', 'dynamic_stabilizer'),
+    ('dynamic stabilizers', 'dynamic_stabilizer'),
+    ('prime mover', 'target'),
+    ('target', 'target'),
+    ('targets', 'target'),
+    ('synergist', 'synergist'),
+    ('synergists', 'synergist'),
+    ('stabilizer', 'stabilizer'),
+    ('stabilizers', 'stabilizer'),
+    ('antagonist', 'antagonist'),
+    ('antagonists', 'antagonist')
+]
+
+# Cells that list no muscle at all
+NOT_MUSCLES = {'', 'none', 'no significant stabilizers', 'see comments'}
+
+# Head or region qualifiers the dataset writes as their own item: "Deltoid, Posterior"
+PREFIX_QUALIFIERS = {'upper', 'middle', 'lower', 'anterior', 'posterior', 'lateral'}
+SUFFIX_QUALIFIERS = {'sternal', 'clavicular', 'long head', 'short head', 'inferior digitations'}
+
+# Spellings and gym slang mapped to one canonical name
+MUSCLE_ALIASES = {
+    'triceps': 'triceps brachii',
+    'biceps': 'biceps brachii',
+    'hip adductors': 'adductors',
+    'psoas major': 'iliopsoas',
+    'pecs': 'pectoralis major',
+    'pec': 'pectoralis major',
+    'lats': 'latissimus dorsi',
+    'lat': 'latissimus dorsi',
+    'traps': 'trapezius',
+    'delts': 'deltoid',
+    'front delts': 'anterior deltoid',
+    'front delt': 'anterior deltoid',
+    'side delts': 'lateral deltoid',
+    'side delt': 'lateral deltoid',
+    'rear delts': 'posterior deltoid',
+    'rear delt': 'posterior deltoid',
+    'glutes': 'gluteus maximus',
+    'quads': 'quadriceps',
+    'hams': 'hamstrings',
+    'abs': 'rectus abdominis',
+    'calves': 'gastrocnemius'
+}
+
+# Opposing muscle pairs; a pair also covers the heads of both muscles
+ANTAGONIST_PAIRS = [
+    ('biceps brachii', 'triceps brachii'),
+    ('brachialis', 'triceps brachii'),
+    ('pectoralis major', 'latissimus dorsi'),
+    ('pectoralis major', 'rhomboids'),
+    ('anterior deltoid', 'posterior deltoid'),
+    ('quadriceps', 'hamstrings'),
+    ('rectus abdominis', 'erector spinae'),
+    ('hip flexors', 'gluteus maximus'),
+    ('iliopsoas', 'gluteus maximus'),
+    ('wrist flexors', 'wrist extensors'),
+    ('tibialis anterior', 'gastrocnemius'),
+    ('tibialis anterior', 'soleus'),
+    ('adductors', 'gluteus medius')
+]
+
+
+def parse_muscles(cell):
+    """Canonical muscle names in one muscle cell, e.g. "Deltoid, Posterior, None, " -> ['posterior deltoid']"""
+    if cell is None or (isinstance(cell, float) and np.isnan(cell)):
+        return []
+    muscles, base = [], None
+    for item in str(cell).split(','):
+        # Parenthesized notes ("(lead leg)", "(see notes)") do not change the muscle
+        name = normalize_phrase(re.sub(r'\(.*?\)', ' ', item))
+        if name in NOT_MUSCLES:
+            continue
+        fibers = name.endswith(' fibers')
+        if fibers:
+            name = name[:-len(' fibers')]
+        if name in PREFIX_QUALIFIERS or name in SUFFIX_QUALIFIERS:
+            if base is not None:
+                qualified = f"{name} {base}" if name in PREFIX_QUALIFIERS else f"{base} {name}"
+                if muscles and muscles[-1] == base:
+                    muscles[-1] = qualified
+                else:
+                    muscles.append(qualified)
+            continue
+        if fibers:
+            # Other fibre bundles ("Cervicis & Capitis Fibers") stay part of the muscle before them
+            continue
+        base = MUSCLE_ALIASES.get(name, name)
+        muscles.append(base)
+    return list(dict.fromkeys(muscles))
+
+
+class MuscleMatrix:
+    """Which muscles each exercise works, and in which role.
+
+    A CSR matrix with one row per exercise (row ids as in the index) and one
+    column per (role, muscle): column ``role_index * num_muscles + muscle_id``.
+    Muscle names are canonical lowercase phrases; a muscle also stands for
+    its heads, so "deltoid" covers "posterior deltoid".
+    """
+
+    def __init__(self, matrix, muscles):
+        self.matrix = sparse.csr_matrix(matrix)
+        self.muscles = list(muscles)
+        self.roles = list(MUSCLE_ROLES)
+        self._muscle_lookup = {name: i for i, name in enumerate(self.muscles)}
+        self._opposing = None
+
+    @classmethod
+    def from_dataframe(cls, data):
+        parsed = {
+            role: [parse_muscles(cell) for cell in data[column]] if column in data.columns else [[]] * len(data)
+            for role, column in MUSCLE_ROLES.items()
+        }
+        muscles = sorted({name for cells in parsed.values() for names in cells for name in names})
+        lookup = {name: i for i, name in enumerate(muscles)}
+
+        rows, cols = [], []
+        for role_index, cells in enumerate(parsed.values()):
+            for row_id, names in enumerate(cells):
+                for name in names:
+                    rows.append(row_id)
+                    cols.append(role_index * len(muscles) + lookup[name])
+        shape = (len(data), len(MUSCLE_ROLES) * len(muscles))
+        matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+        return cls(matrix, muscles)
+
+    @property
+    def num_muscles(self):
+        return len(self.muscles)
+
+    def role_matrix(self, role):
+        """Exercise x muscle matrix for one role"""
+        if role not in MUSCLE_ROLES:
+            raise ValueError(f"Unknown muscle role: {role}. Valid roles: {', '.join(MUSCLE_ROLES)}")
+        start = self.roles.index(role) * self.num_muscles
+        return self.matrix[:, start:start + self.num_muscles]
+
+    def involvement(self):
+        """Exercise x muscle matrix weighted by role (MUSCLE_ROLE_WEIGHTS)"""
+        return sum(MUSCLE_ROLE_WEIGHTS.get(role, 0.0) * self.role_matrix(role) for role in self.roles)
+
+    def resolve(self, muscle):
+        """Muscle ids for a name or alias, including its heads; empty when unknown"""
+        name = normalize_phrase(muscle)
+        name = MUSCLE_ALIASES.get(name, name)
+        return [i for i, other in enumerate(self.muscles) if f" {name} " in f" {other} "]
+
+    def muscle_names(self, muscle_ids):
+        return [self.muscles[i].title() for i in muscle_ids]
+
+    def muscles_of(self, row_id):
+        """Muscles an exercise works, by role"""
+        columns = self.matrix[row_id].indices
+        return {
+            role: self.muscle_names(sorted(columns[columns // self.num_muscles == role_index] % self.num_muscles))
+            for role_index, role in enumerate(self.roles)
+        }
+
+    def rows_with(self, muscle_ids, roles=None):
+        """Boolean mask of exercises working any of the muscles in any of the roles (all roles by default)"""
+        roles = roles or self.roles
+        columns = [self.roles.index(role) * self.num_muscles + m for role in roles for m in muscle_ids]
+        return self.matrix[:, columns].getnnz(axis=1) > 0
+
+    def parse_query(self, query):
+        """(role, muscle ids) for queries such as "works rear delts as synergist", None otherwise"""
+        padded = f" {normalize_phrase(query)} "
+        role = next((role for term, role in ROLE_TERMS if f" {term} " in padded), None)
+        if role is None:
+            return None
+
+        words = padded.split()
+        names = set(self._muscle_lookup) | set(MUSCLE_ALIASES)
+        for size in (3, 2, 1):
+            for start in range(len(words) - size + 1):
+                phrase = " ".join(words[start:start + size])
+                if phrase in names:
+                    return role, self.resolve(phrase)
+        return None
+
+    def _opposing_muscles(self):
+        """Symmetric muscle x muscle matrix of ANTAGONIST_PAIRS, heads included"""
+        if self._opposing is None:
+            rows, cols = [], []
+            for first, second in ANTAGONIST_PAIRS:
+                for a in self.resolve(first):
+                    for b in self.resolve(second):
+                        rows.extend((a, b))
+                        cols.extend((b, a))
+            shape = (self.num_muscles, self.num_muscles)
+            self._opposing = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+            self._opposing.data[:] = 1.0
+        return self._opposing
+
+    def antagonist_scores(self, row_id):
+        """How well every exercise pairs with ``row_id`` in an antagonist superset.
+
+        An exercise scores for each of its target muscles that opposes one of
+        this exercise's targets or is listed as this exercise's antagonist, and
+        for each of this exercise's targets it lists as an antagonist.
+        """
+        target = self.role_matrix('target')
+        antagonist = self.role_matrix('antagonist')
+        opposing = target[row_id] @ self._opposing_muscles() + antagonist[row_id]
+        scores = target @ opposing.T + antagonist @ target[row_id].T
+        scores = np.asarray(scores.todense()).ravel()
+        scores[row_id] = 0.0
+        return scores
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path,
+            data=self.matrix.data,
+            indices=self.matrix.indices,
+            indptr=self.matrix.indptr,
+            shape=np.asarray(self.matrix.shape),
+            muscles=np.asarray(self.muscles, dtype=str)
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            matrix = sparse.csr_matrix((data['data'], data['indices'], data['indptr']), shape=tuple(data['shape']))
+            return cls(matrix, data['muscles'].tolist())
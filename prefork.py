@@ -0,0 +1,194 @@
+"""Preload-then-fork launcher: one fully initialized recommender shared copy-on-write by every worker
+
+Usage:
+    python service.py --preload --workers 4
+
+The parent process loads the embedding model, spaCy, the index and the
+lexicon tables once, runs a warm-up query, moves everything it allocated
+into the garbage collector's permanent generation (``gc.freeze()``) so
+collections in the workers never write to those pages, then forks the
+workers. Each worker serves the shared listening socket with uvicorn and
+starts in milliseconds; ``/health`` reports its proportional set size (PSS)
+to confirm the pages are actually shared. The parent restarts workers that
+die and, when a new index version appears, loads it once and replaces the
+workers one at a time.
+"""
+import gc
+import os
+import signal
+import socket
+import time
+
+# One worker process per core: keep torch and the tokenizers from spawning their own thread pools
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+from metrics import metrics
+from config import SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS, SERVICE_KEEP_ALIVE, SERVICE_RELOAD_INTERVAL, \
+    PREFORK_WARM_QUERY, PREFORK_MIN_SHARED_FRACTION
+
+
+def memory_usage():
+    """RSS, PSS and shared / private memory of this process in MB, None where /proc is unavailable.
+
+    PSS charges every shared page to each process mapping it divided by the
+    number of those processes, so N workers sharing the model report roughly
+    1/N of its size each.
+    """
+    try:
+        with open("/proc/self/smaps_rollup", 'r') as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024.0
+    except OSError:
+        return None
+
+    rss = fields.get('Rss', 0.0)
+    shared = fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0)
+    shared_fraction = shared / rss if rss else 0.0
+    return {
+        'rss_mb': rss,
+        'pss_mb': fields.get('Pss', 0.0),
+        'shared_mb': shared,
+        'private_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0),
+        'shared_fraction': shared_fraction,
+        'sharing_ok': shared_fraction >= PREFORK_MIN_SHARED_FRACTION
+    }
+
+
+class PreforkServer:
+    """Loads the service's recommender in the parent and supervises forked uvicorn workers"""
+
+    def __init__(self, app, host=SERVICE_HOST, port=SERVICE_PORT, workers=SERVICE_WORKERS,
+                 reload_interval=SERVICE_RELOAD_INTERVAL):
+        if not hasattr(os, 'fork'):
+            raise RuntimeError("Preloading workers needs os.fork (Linux or macOS)")
+        self.app = app
+        self.host = host
+        self.port = port
+        self.num_workers = max(1, int(workers))
+        self.reload_interval = reload_interval
+        self.socket = None
+        self.workers = set()
+        self._stopping = False
+
+    def preload(self):
+        """Initialize the recommender once and freeze it for copy-on-write sharing"""
+        start = time.perf_counter()
+        # No collections until the freeze: objects freed now would leave holes the workers' allocations dirty
+        gc.disable()
+        self.app.holder.load()
+        self._warm_up()
+        self._freeze()
+        print(f"✅ Preloaded in {time.perf_counter() - start:.1f}s, {gc.get_freeze_count()} objects frozen")
+
+    def _warm_up(self):
+        # Touch every lazily loaded path (pandas, torch kernels, spaCy pipeline) before forking
+        self.app.holder.recommender.search(PREFORK_WARM_QUERY)
+        metrics.reset()
+
+    def _freeze(self):
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+
+    def _bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def spawn(self):
+        """Fork one worker; returns its pid in the parent and never returns in the worker"""
+        forked_at = time.perf_counter()
+        pid = os.fork()
+        if pid:
+            self.workers.add(pid)
+            return pid
+
+        status = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            gc.enable()
+            self.app.worker = {'pid': os.getpid(), 'forked_at': forked_at, 'startup_ms': None}
+            self._serve()
+        except BaseException as e:
+            print(f"❌ Worker {os.getpid()} failed: {e}")
+            status = 1
+        finally:
+            os._exit(status)
+
+    def _serve(self):
+        import uvicorn
+        config = uvicorn.Config(self.app, timeout_keep_alive=SERVICE_KEEP_ALIVE, log_level="info")
+        uvicorn.Server(config).run(sockets=[self.socket])
+
+    def run(self):
+        self.socket = self._bind()
+        # The parent watches for new index versions; workers only serve
+        self.app.reload_interval = 0
+        self.preload()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.num_workers):
+            self.spawn()
+        gc.enable()
+        print(f"🚀 Serving http://{self.host}:{self.port} with {self.num_workers} preloaded workers")
+
+        next_reload = time.monotonic() + self.reload_interval
+        while not self._stopping:
+            self._reap()
+            if self.reload_interval and time.monotonic() >= next_reload:
+                self._reload()
+                next_reload = time.monotonic() + self.reload_interval
+            time.sleep(0.2)
+        self._shutdown()
+
+    def _reap(self):
+        """Replace workers that exited"""
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                return
+            self.workers.discard(pid)
+            if not self._stopping:
+                print(f"⚠️ Worker {pid} exited with status {status}, restarting")
+                self.spawn()
+
+    def _reload(self):
+        """Load a new index version once in the parent, then replace the workers one by one"""
+        gc.disable()
+        try:
+            if not self.app.holder.reload_if_changed():
+                return
+            self._warm_up()
+            self._freeze()
+        finally:
+            gc.enable()
+
+        for pid in list(self.workers):
+            self.spawn()
+            self._terminate(pid)
+
+    def _terminate(self, pid):
+        self.workers.discard(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+
+    def _shutdown(self):
+        print("🛑 Stopping workers...")
+        for pid in list(self.workers):
+            self._terminate(pid)
+        self.socket.close()
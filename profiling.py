@@ -0,0 +1,158 @@
+"""Opt-in per-request profiling with speedscope / pstats output"""
+import contextlib
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from config import PROFILE_SAMPLE_RATE, PROFILE_MODE, PROFILE_OUTPUT_DIR, PROFILE_INTERVAL_MS
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval.
+
+    The sampler needs the GIL to read frames, so pure-Python stretches are
+    sampled at roughly the interpreter switch interval while native code
+    (encoder, FAISS, NumPy) is sampled at the requested interval.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfiler:
+    """Profiles a sampled fraction of requests, or any request that asks for it.
+
+    Each profiled call writes to ``output_dir``: a speedscope JSON profile
+    and a collapsed-stack copy in ``sampling`` mode, or a pstats dump plus a
+    JSON sidecar in ``cprofile`` mode. The query and parsed intent are stored with it.
+    """
+
+    def __init__(self, rate=PROFILE_SAMPLE_RATE, mode=PROFILE_MODE, output_dir=PROFILE_OUTPUT_DIR,
+                 interval_ms=PROFILE_INTERVAL_MS):
+        if mode not in ('sampling', 'cprofile'):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.rate = rate
+        self.mode = mode
+        self.output_dir = output_dir
+        self.interval = interval_ms / 1000.0
+
+    def should_profile(self, force=False):
+        """Decide whether to profile this request; cheap enough to call on every request"""
+        return force or (self.rate > 0 and random.random() < self.rate)
+
+    def _output_path(self, name, extension):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return os.path.join(self.output_dir, f"{name}-{stamp}-{os.getpid()}{extension}")
+
+    @contextlib.contextmanager
+    def profile(self, name, metadata=None):
+        """Profile the block; the yielded dict can be filled with metadata before it ends"""
+        info = dict(metadata or {})
+        start = time.perf_counter()
+
+        if self.mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield info
+            finally:
+                profiler.disable()
+                info['duration_ms'] = (time.perf_counter() - start) * 1000.0
+                self._write_cprofile(name, profiler, info)
+        else:
+            sampler = _StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+            try:
+                yield info
+            finally:
+                sampler.stop()
+                info['duration_ms'] = (time.perf_counter() - start) * 1000.0
+                self._write_speedscope(name, sampler.samples, info)
+
+    def _write_cprofile(self, name, profiler, info):
+        try:
+            path = self._output_path(name, ".prof")
+            profiler.dump_stats(path)
+            with open(f"{path}.json", 'w') as f:
+                json.dump(info, f, indent=2, default=str)
+            print(f"🔬 Profile written to {path}")
+        except OSError as e:
+            print(f"⚠️ Could not write profile: {e}")
+
+    def _write_speedscope(self, name, samples, info):
+        frames, frame_index = [], {}
+        stacks, weights = [], []
+        for stack, count in samples.items():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    func, filename, line = frame
+                    frames.append({'name': func, 'file': filename, 'line': line})
+                indices.append(frame_index[frame])
+            stacks.append(indices)
+            weights.append(count * self.interval * 1000.0)
+
+        title = f"{name}: {info.get('query', '')}".strip(": ")
+        document = {
+            '$schema': "https://www.speedscope.app/file-format-schema.json",
+            'name': title,
+            'exporter': "gym_recommender",
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': title,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': stacks,
+                'weights': weights
+            }],
+            'metadata': info
+        }
+
+        try:
+            path = self._output_path(name, ".speedscope.json")
+            with open(path, 'w') as f:
+                json.dump(document, f, default=str)
+            # Same samples for flamegraph.pl / inferno
+            with open(path.replace(".speedscope.json", ".collapsed"), 'w') as f:
+                f.write(collapse_stacks(samples))
+            print(f"🔬 Profile written to {path}")
+        except OSError as e:
+            print(f"⚠️ Could not write profile: {e}")
+
+
+def collapse_stacks(samples):
+    """Render stack samples in the collapsed format read by flamegraph.pl"""
+    lines = []
+    for stack, count in samples.items():
+        names = [re.sub(r'[;\s]', '_', func) for func, _, _ in stack]
+        lines.append(f"{';'.join(names)} {count}")
+    return "\n".join(lines) + "\n"
@@ -1,9 +1,13 @@
 """Query parsing and processing"""
 import re
-import spacy
 from rapidfuzz import process
+from lazy_imports import lazy_import
+from metrics import metrics
+from attribute_index import DIFFICULTY_PATTERN
 from config import VALID_MUSCLES, DEFAULT_NUM_EXERCISES, FUZZY_MATCH_THRESHOLD
 
+spacy = lazy_import("spacy")
+
 class QueryProcessor:
     def __init__(self):
         try:
@@ -19,8 +23,12 @@ class QueryProcessor:
     
     def parse_query(self, query: str):
         """Parse user query to extract number of exercises and target muscles"""
-        # Extract number
-        number_match = re.search(r'(\d+)', query)
+        with metrics.timer('parse'):
+            return self._parse_query(query)
+    
+    def _parse_query(self, query: str):
+        # Extract number ("difficulty <= 2" is a filter, not a count)
+        number_match = re.search(r'(\d+)', DIFFICULTY_PATTERN.sub(' ', query))
         num_exercises = int(number_match.group(1)) if number_match else DEFAULT_NUM_EXERCISES
         
         found_muscles = set()
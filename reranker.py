@@ -0,0 +1,159 @@
+"""Optional cross-encoder reranking of the top candidates under a per-request time budget"""
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import numpy as np
+from lazy_imports import lazy_import
+from lexical_index import normalize_phrase
+from config import RERANK_MODEL, RERANK_TOP_M, RERANK_BUDGET_MS, RERANK_CACHE_SIZE
+
+sentence_transformers = lazy_import("sentence_transformers")
+
+
+class Reranker:
+    """Re-orders the top-M candidates of a request by cross-encoder score.
+
+    Only the ``top_m`` most relevant candidates are scored, in one batch on a
+    single worker thread. When the batch does not finish within the request's
+    budget the candidates keep their retrieval order; a batch that already
+    started still completes in the background and its scores are cached, so
+    a repeated query is reranked from the cache. At most one batch is in
+    flight: while it runs, other requests skip reranking and count it as a
+    timeout instead of queueing behind it. Scores are cached per (tenant,
+    normalized query, row id).
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, top_m=RERANK_TOP_M, budget_ms=RERANK_BUDGET_MS,
+                 cache_size=RERANK_CACHE_SIZE):
+        self.model_name = model_name
+        self.top_m = top_m
+        self.budget_ms = budget_ms
+        self.cache_size = max(1, int(cache_size))
+        self.model = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._in_flight = threading.Semaphore(1)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.timeouts = 0
+        self.hits = 0
+        self.misses = 0
+        # A forked worker inherits the executor but not its thread
+        if hasattr(os, 'register_at_fork'):
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._after_fork())
+
+    def _after_fork(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._in_flight = threading.Semaphore(1)
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self.model is None:
+            print(f"Loading reranker {self.model_name}...")
+            self.model = sentence_transformers.CrossEncoder(self.model_name)
+        return self
+
+    def deadline(self):
+        """perf_counter time at which a request starting now runs out of rerank budget"""
+        return time.perf_counter() + self.budget_ms / 1000.0
+
+    def _cached(self, keys):
+        with self._lock:
+            scores = []
+            for key in keys:
+                score = self._cache.get(key)
+                if score is not None:
+                    self._cache.move_to_end(key)
+                scores.append(score)
+            return scores
+
+    def _score(self, query, keys, texts):
+        """Score (query, text) pairs in one batch and cache them; runs on the worker thread"""
+        scores = np.asarray(self.model.predict([(query, text) for text in texts]), dtype=np.float32).ravel()
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._cache[key] = float(score)
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query, rows, relevance, documents_fn, scope=None, deadline=None):
+        """Relevance with the top-M candidates re-ordered by cross-encoder score, and what it cost.
+
+        ``documents_fn`` maps a list of row ids to their texts and is only
+        called for rows missing from the cache. The top-M relevance values
+        are handed out again in cross-encoder order, so downstream scoring
+        keeps its scale. Returns ``(relevance, info)`` where ``info`` holds the
+        ``candidates``, ``cached`` and ``scored`` counts, ``ms`` and ``timed_out``.
+        """
+        start = time.perf_counter()
+        deadline = deadline if deadline is not None else start + self.budget_ms / 1000.0
+        relevance = np.asarray(relevance, dtype=np.float32)
+        info = {'candidates': 0, 'cached': 0, 'scored': 0, 'ms': 0.0, 'timed_out': False}
+        if self.model is None or len(rows) < 2:
+            return relevance, info
+
+        top = np.argsort(-relevance, kind='stable')[:self.top_m]
+        text = normalize_phrase(query)
+        keys = [(scope, text, int(rows[i])) for i in top]
+        scores = self._cached(keys)
+        missing = [i for i, score in enumerate(scores) if score is None]
+        info.update(candidates=len(top), cached=len(top) - len(missing))
+
+        if missing:
+            remaining = deadline - time.perf_counter()
+            # Never queue behind a batch that is still running
+            if remaining <= 0 or not self._in_flight.acquire(blocking=False):
+                info['timed_out'] = True
+            else:
+                try:
+                    future = self._executor.submit(
+                        self._score, query, [keys[i] for i in missing],
+                        documents_fn([int(rows[top[i]]) for i in missing])
+                    )
+                except Exception:
+                    self._in_flight.release()
+                    raise
+                future.add_done_callback(lambda _: self._in_flight.release())
+                try:
+                    for i, score in zip(missing, future.result(timeout=remaining)):
+                        scores[i] = float(score)
+                    info['scored'] = len(missing)
+                except FutureTimeout:
+                    future.cancel()
+                    info['timed_out'] = True
+                except Exception as e:
+                    print(f"⚠️ Reranking failed: {str(e)}")
+                    info['timed_out'] = True
+
+        with self._lock:
+            self.requests += 1
+            self.timeouts += info['timed_out']
+            self.hits += info['cached']
+            self.misses += len(missing)
+
+        if not info['timed_out']:
+            order = np.argsort(-np.asarray(scores, dtype=np.float32), kind='stable')
+            relevance = relevance.copy()
+            relevance[top[order]] = relevance[top]
+        info['ms'] = (time.perf_counter() - start) * 1000.0
+        return relevance, info
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'model': self.model_name,
+                'loaded': self.model is not None,
+                'top_m': self.top_m,
+                'budget_ms': self.budget_ms,
+                'requests': self.requests,
+                'timeouts': self.timeouts,
+                'cache_size': len(self._cache),
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
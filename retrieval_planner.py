@@ -0,0 +1,77 @@
+"""Quota allocation and fetch sizing for multi-muscle retrieval"""
+import math
+import threading
+from collections import deque
+from config import RETRIEVAL_MIN_OVERFETCH, RETRIEVAL_MAX_OVERFETCH, RETRIEVAL_STATS_WINDOW
+
+
+class RetrievalPlanner:
+    """Plans one batched fetch that is guaranteed to cover the requested count.
+
+    The over-fetch factor adapts to the traffic: it grows whenever a request
+    could not fill a muscle quota from its own candidates and decays slowly
+    back towards the minimum otherwise.
+    """
+
+    def __init__(self, min_overfetch=RETRIEVAL_MIN_OVERFETCH, max_overfetch=RETRIEVAL_MAX_OVERFETCH):
+        self.min_overfetch = min_overfetch
+        self.max_overfetch = max_overfetch
+        self.overfetch = min_overfetch
+        self.history = deque(maxlen=RETRIEVAL_STATS_WINDOW)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def allocate_quotas(num_exercises, num_groups):
+        """Split the count exactly across groups, giving the remainder to the first groups"""
+        if num_groups <= 0:
+            return []
+        base, remainder = divmod(max(0, num_exercises), num_groups)
+        return [base + (1 if i < remainder else 0) for i in range(num_groups)]
+
+    def plan(self, num_exercises, num_groups, index_size):
+        """Quotas per group, the per-query fetch size k and the number of results to return"""
+        top_n = min(num_exercises, index_size)
+        quotas = self.allocate_quotas(top_n, num_groups)
+        # Every fetched list holds at least top_n rows, so the union always covers the request
+        k = math.ceil(max(quotas, default=0) * self.overfetch)
+        k = min(index_size, max(k, top_n, 1))
+        return {'quotas': quotas, 'k': k, 'top_n': top_n}
+
+    def record(self, plan, num_queries, fetched, distinct, shortfall, index_size):
+        """Record candidate counts for one request and adapt the over-fetch factor"""
+        with self._lock:
+            if shortfall > 0:
+                self.overfetch = min(self.max_overfetch, self.overfetch * 1.25)
+            else:
+                self.overfetch = max(self.min_overfetch, self.overfetch * 0.98)
+
+            self.history.append({
+                'top_n': plan['top_n'],
+                'k': plan['k'],
+                'queries': num_queries,
+                # A flat index scores every stored vector for every query
+                'scored': num_queries * index_size,
+                'fetched': fetched,
+                'distinct': distinct,
+                'shortfall': shortfall
+            })
+
+    def get_stats(self):
+        """Aggregate candidate counts over the recent request window"""
+        with self._lock:
+            history = list(self.history)
+            overfetch = self.overfetch
+        if not history:
+            return {'requests': 0, 'overfetch': overfetch}
+
+        count = len(history)
+        return {
+            'requests': count,
+            'overfetch': overfetch,
+            'avg_k': sum(h['k'] for h in history) / count,
+            'avg_scored': sum(h['scored'] for h in history) / count,
+            'avg_fetched': sum(h['fetched'] for h in history) / count,
+            'avg_distinct': sum(h['distinct'] for h in history) / count,
+            'shortfall_rate': sum(1 for h in history if h['shortfall']) / count,
+            'last': history[-1]
+        }
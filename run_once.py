@@ -4,7 +4,7 @@ def main():
     # Check if already set up
     if os.path.exists("./data/vectorstore/index.faiss"):
         print("✅ Already set up! Running Streamlit app...")
-        os.system("streamlit run streamlit_app.py")
+        os.system("streamlit run app.py")
     else:
         print("🔧 First time setup required...")
         import easy_setup
@@ -13,7 +13,7 @@ def main():
         # After setup, run the app
         if os.path.exists("./data/vectorstore/index.faiss"):
             print("\n🚀 Starting Streamlit app...")
-            os.system("streamlit run streamlit_app.py")
+            os.system("streamlit run app.py")
         else:
             print("❌ Setup failed. Please check the errors above.")
 
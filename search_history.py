@@ -0,0 +1,214 @@
+"""Bounded, persistent search history with incrementally maintained statistics"""
+import json
+import os
+import threading
+from collections import deque
+from metrics import Histogram
+from config import SEARCH_HISTORY_PATH, SEARCH_HISTORY_SIZE, SEARCH_HISTORY_TOP_K, SEARCH_HISTORY_COMPACT_FACTOR
+
+
+class HeavyHitters:
+    """Space-Saving sketch: approximate top queries in ``capacity`` counters.
+
+    Any query seen more than total / capacity times is guaranteed to be kept;
+    a reported count overestimates the true count by at most ``errors[key]``.
+    """
+
+    def __init__(self, capacity=SEARCH_HISTORY_TOP_K):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, key):
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = 1
+            self.errors[key] = 0
+        else:
+            # Replace the smallest counter; its count becomes the new key's error bound
+            smallest = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(smallest)
+            self.errors.pop(smallest)
+            self.counts[key] = floor + 1
+            self.errors[key] = floor
+
+    def top(self, n=None):
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:n] if n else ranked
+
+    def to_dict(self):
+        return {'capacity': self.capacity, 'counts': self.counts, 'errors': self.errors}
+
+    @classmethod
+    def from_dict(cls, payload):
+        sketch = cls(payload['capacity'])
+        sketch.counts = dict(payload['counts'])
+        sketch.errors = dict(payload['errors'])
+        return sketch
+
+
+class SearchHistoryStore:
+    """Recent searches in a ring buffer, backed by an append-only JSONL file.
+
+    Count, totals, a latency histogram and a heavy-hitters sketch are updated
+    on every append, so reading the statistics never scans the history. When
+    the file grows past ``compact_factor`` times the ring size it is rewritten
+    as one aggregates line followed by the entries still in the ring.
+    """
+
+    def __init__(self, path=SEARCH_HISTORY_PATH, capacity=SEARCH_HISTORY_SIZE, top_k=SEARCH_HISTORY_TOP_K,
+                 compact_factor=SEARCH_HISTORY_COMPACT_FACTOR):
+        self.path = path
+        self.capacity = capacity
+        self.top_k = top_k
+        self.compact_factor = compact_factor
+        self._lock = threading.Lock()
+        self._reset()
+        self._file_lines = 0
+        if path:
+            self._load()
+
+    def _reset(self):
+        self.entries = deque(maxlen=self.capacity)
+        self.count = 0
+        self.total_time = 0.0
+        self.total_results = 0
+        self.cache_hits = 0
+        self.latency = Histogram()
+        self.heavy_hitters = HeavyHitters(self.top_k)
+
+    def _accumulate(self, entry):
+        self.count += 1
+        self.total_time += entry.get('search_time', 0.0)
+        self.total_results += entry.get('results_count', 0)
+        self.cache_hits += entry.get('cache') == 'hit'
+        self.latency.observe(entry.get('search_time', 0.0))
+        self.heavy_hitters.add(entry['query'].strip())
+
+    def _aggregates(self, covered):
+        counts, total, count = self.latency.snapshot()
+        return {
+            'type': 'aggregates',
+            'covered': covered,
+            'count': self.count,
+            'total_time': self.total_time,
+            'total_results': self.total_results,
+            'cache_hits': self.cache_hits,
+            'latency': {'counts': counts, 'total': total, 'count': count},
+            'heavy_hitters': self.heavy_hitters.to_dict()
+        }
+
+    def _restore(self, snapshot):
+        self.count = snapshot['count']
+        self.total_time = snapshot['total_time']
+        self.total_results = snapshot['total_results']
+        self.cache_hits = snapshot.get('cache_hits', 0)
+        latency = snapshot['latency']
+        self.latency.counts = list(latency['counts'])
+        self.latency.total = latency['total']
+        self.latency.count = latency['count']
+        self.heavy_hitters = HeavyHitters.from_dict(snapshot['heavy_hitters'])
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        # Entries right after an aggregates line are already counted in it
+        already_counted = 0
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    self._file_lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn last line after a crash
+                        continue
+                    if record.get('type') == 'aggregates':
+                        self._restore(record)
+                        already_counted = record['covered']
+                        continue
+                    self.entries.append(record)
+                    if already_counted:
+                        already_counted -= 1
+                    else:
+                        self._accumulate(record)
+        except OSError as e:
+            print(f"⚠️ Could not read search history {self.path}: {e}")
+
+    def append(self, entry):
+        """Record one search: a dict with query, timestamp, results_count, search_time and cache"""
+        with self._lock:
+            self.entries.append(entry)
+            self._accumulate(entry)
+            if not self.path:
+                return
+
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(entry) + "\n")
+                self._file_lines += 1
+                if self._file_lines > self.capacity * self.compact_factor:
+                    self._compact()
+            except OSError as e:
+                print(f"⚠️ Could not write search history {self.path}: {e}")
+
+    def _compact(self):
+        """Rewrite the file as the current aggregates plus the entries still in the ring"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(self._aggregates(len(self.entries))) + "\n")
+            for entry in self.entries:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+        self._file_lines = len(self.entries) + 1
+
+    def recent(self, n=None):
+        """Most recent searches first"""
+        with self._lock:
+            entries = list(self.entries)
+        entries.reverse()
+        return entries[:n] if n else entries
+
+    def top_queries(self, n=None):
+        """Approximate (query, count) pairs for the most repeated searches"""
+        with self._lock:
+            return self.heavy_hitters.top(n)
+
+    def hot_queries(self, limit=None):
+        """Queries worth prewarming: frequent ones first, then the most recent"""
+        queries = [query for query, _ in self.top_queries()]
+        seen = set(queries)
+        for entry in self.recent():
+            query = entry['query'].strip()
+            if query not in seen:
+                seen.add(query)
+                queries.append(query)
+        return queries[:limit] if limit else queries
+
+    def get_summary(self):
+        """Running statistics over every search ever recorded"""
+        with self._lock:
+            count = self.count
+            return {
+                'count': count,
+                'total_results': self.total_results,
+                'avg_results': self.total_results / count if count else 0.0,
+                'avg_time': self.total_time / count if count else 0.0,
+                'p50_time': self.latency.quantile(0.50),
+                'p95_time': self.latency.quantile(0.95),
+                'cache_hit_rate': self.cache_hits / count if count else 0.0
+            }
+
+    def clear(self):
+        """Forget all history, on disk as well"""
+        with self._lock:
+            self._reset()
+            self._file_lines = 0
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
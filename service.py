@@ -0,0 +1,408 @@
+"""Headless JSON API for the recommender, separate from the Streamlit UI
+
+Usage:
+    python service.py --workers 4            # uvicorn with keep-alive and a memory-mapped index
+    python service.py --preload --workers 4  # load once, then fork workers sharing it copy-on-write
+    uvicorn service:app --workers 4          # any ASGI server works
+
+Endpoints:
+    POST /recommend         {"query": "5 chest exercises", "profile": false, "filters": {"equipment": "cable"},
+                             "tenant": "my-gym"}
+    POST /recommend/stream  same body as /recommend; NDJSON, one line per exercise as it is found,
+                            then {"type": "done", "response": ...}
+    POST /recommend/batch   {"queries": ["5 chest exercises", "back workout"], "tenant": "my-gym"}
+    GET  /tenants           gyms with their equipment, share of the base catalogue and custom exercises
+    POST /tenants           {"tenant_id": "my-gym", "equipment": ["barbell", "cable"], "exclude": [...],
+                             "custom_exercises": [{"Exercise Name": ..., "Main_muscle": ...}]}
+    DELETE /tenants         {"tenant_id": "my-gym"}
+    GET  /status            recommender, embedding and retrieval status
+    GET  /metrics           per-stage latency histograms (Prometheus text, per worker)
+    GET  /health            readiness probe and how the index is mapped; with --preload also the worker's
+                            startup time and PSS
+
+Build the index once (setup_vectorstore.py) before starting several workers,
+otherwise each worker builds its own. Workers reload in the background when
+a new index version appears on disk; requests keep being served by the
+previous index until the new one is ready.
+"""
+import argparse
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+# Workers serving the same index share its pages instead of holding one copy each
+os.environ.setdefault("GYM_VECTORSTORE_MMAP", "1")
+
+from metrics import metrics
+from attribute_index import validate_filters
+from config import VECTORSTORE_PATH, SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS, SERVICE_KEEP_ALIVE, \
+    SERVICE_RELOAD_INTERVAL, SERVICE_MAX_BATCH, SERVICE_MAX_BODY_BYTES, SERVICE_PRELOAD
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_default(obj):
+    # NumPy scalars and arrays from the retrieval path
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """Serialize to JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+
+def loads(body):
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+class RecommenderHolder:
+    """Owns the live recommender and swaps in a new one when the index changes"""
+
+    def __init__(self, vectorstore_path=VECTORSTORE_PATH):
+        self.vectorstore_path = vectorstore_path
+        self.recommender = None
+        self.version = None
+        self.loaded_at = None
+        self._reload_lock = threading.Lock()
+
+    def _build(self):
+        from exercise_recommender import ExerciseRecommender
+        recommender = ExerciseRecommender(self.vectorstore_path)
+        recommender.initialize()
+        if not recommender.is_initialized():
+            raise RuntimeError("Recommender failed to initialize")
+        return recommender, recommender.vectorstore_manager.get_index_version()
+
+    def load(self):
+        self.recommender, self.version = self._build()
+        self.loaded_at = time.time()
+        print(f"✅ Serving index version {self.version}")
+
+    def reload_if_changed(self):
+        """Load a new index version in the caller's thread and swap it in; True if swapped"""
+        if self.recommender is None or not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            version = self.recommender.vectorstore_manager.get_index_version()
+            if version is None or version == self.version:
+                return False
+            print(f"🔄 New index version {version}, reloading...")
+            recommender, version = self._build()
+            # In-flight requests finish on the old recommender they already hold
+            self.recommender, self.version = recommender, version
+            self.loaded_at = time.time()
+            print(f"✅ Serving index version {self.version}")
+            return True
+        except Exception as e:
+            print(f"⚠️ Reload failed, still serving {self.version}: {e}")
+            return False
+        finally:
+            self._reload_lock.release()
+
+
+class RecommenderService:
+    """Minimal ASGI application; no framework beyond the server itself"""
+
+    def __init__(self, holder=None, reload_interval=SERVICE_RELOAD_INTERVAL):
+        self.holder = holder or RecommenderHolder()
+        self.reload_interval = reload_interval
+        self._reload_task = None
+        # Set in workers forked by prefork.PreforkServer
+        self.worker = None
+        self.routes = {
+            ('POST', '/recommend'): self.recommend,
+            ('POST', '/recommend/stream'): self.recommend_stream,
+            ('POST', '/recommend/batch'): self.recommend_batch,
+            ('GET', '/tenants'): self.list_tenants,
+            ('POST', '/tenants'): self.create_tenant,
+            ('DELETE', '/tenants'): self.delete_tenant,
+            ('GET', '/status'): self.status,
+            ('GET', '/metrics'): self.metrics,
+            ('GET', '/health'): self.health
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    # Preforked workers inherit a loaded recommender
+                    if self.holder.recommender is None:
+                        await asyncio.get_running_loop().run_in_executor(None, self.holder.load)
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                if self.worker is not None:
+                    self.worker['startup_ms'] = (time.perf_counter() - self.worker['forked_at']) * 1000.0
+                    print(f"✅ Worker {self.worker['pid']} ready {self.worker['startup_ms']:.1f} ms after fork")
+                if self.reload_interval:
+                    self._reload_task = asyncio.create_task(self._watch_index())
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._reload_task is not None:
+                    self._reload_task.cancel()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _watch_index(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await loop.run_in_executor(None, self.holder.reload_if_changed)
+
+    async def _http(self, scope, receive, send):
+        handler = self.routes.get((scope['method'], scope['path']))
+        if handler is None:
+            known_path = any(path == scope['path'] for _, path in self.routes)
+            status = 405 if known_path else 404
+            await self._send_json(send, status, {'error': "Method not allowed" if known_path else "Not found"})
+            return
+
+        try:
+            body = await self._read_body(receive)
+            payload = loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            await self._send_json(send, 400, {'error': f"Invalid request body: {e}"})
+            return
+
+        try:
+            status, response = await handler(payload)
+        except Exception as e:
+            status, response = 500, {'error': str(e)}
+
+        if inspect.isasyncgen(response):
+            await self._send_stream(send, status, response)
+        elif isinstance(response, str):
+            await self._send(send, status, response.encode('utf-8'), b"text/plain; version=0.0.4")
+        else:
+            await self._send_json(send, status, response)
+
+    async def _read_body(self, receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b"")
+            size += len(chunk)
+            if size > SERVICE_MAX_BODY_BYTES:
+                raise ValueError("body too large")
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b"".join(chunks)
+
+    async def _send(self, send, status, body, content_type):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b"content-type", content_type), (b"content-length", str(len(body)).encode())]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _send_json(self, send, status, payload):
+        await self._send(send, status, dumps(payload), b"application/json")
+
+    async def _send_stream(self, send, status, events):
+        """Newline-delimited JSON, one chunk per event, flushed as soon as it is produced"""
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b"content-type", b"application/x-ndjson")]
+        })
+        try:
+            async for event in events:
+                await send({'type': 'http.response.body', 'body': dumps(event) + b"\n", 'more_body': True})
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            await send({'type': 'http.response.body', 'body': dumps({'type': 'error', 'error': str(e)}) + b"\n",
+                        'more_body': True})
+        await send({'type': 'http.response.body', 'body': b""})
+
+    def _response(self, result):
+        result['index_version'] = self.holder.version
+        return result
+
+    def _recommend_request(self, payload):
+        """(recommender, query, filters, tenant) for a /recommend body, or (status, error response)"""
+        recommender = self.holder.recommender
+        if recommender is None:
+            return 503, {'error': "Recommender is loading"}
+        query = payload.get('query')
+        if not isinstance(query, str) or not query.strip():
+            return 400, {'error': "'query' must be a non-empty string"}
+        filters = payload.get('filters')
+        if filters is not None and not isinstance(filters, dict):
+            return 400, {'error': "'filters' must be an object"}
+        try:
+            validate_filters(filters)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        tenant = payload.get('tenant')
+        if tenant is not None and not isinstance(tenant, str):
+            return 400, {'error': "'tenant' must be a string"}
+        return recommender, query, filters, tenant
+
+    async def recommend(self, payload):
+        request = self._recommend_request(payload)
+        if len(request) == 2:
+            return request
+        recommender, query, filters, tenant = request
+
+        # Blocking work runs in the thread pool; concurrent requests share embedding batches
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, functools.partial(
+            recommender.search, query, bool(payload.get('profile')), tenant=tenant, filters=filters
+        ))
+        return (422 if result['error'] else 200), self._response(result)
+
+    async def recommend_stream(self, payload):
+        request = self._recommend_request(payload)
+        if len(request) == 2:
+            return request
+        recommender, query, filters, tenant = request
+        return 200, self._stream_events(recommender.stream_search(query, tenant=tenant, filters=filters))
+
+    async def _stream_events(self, events):
+        # Each retrieval stage runs in the thread pool; the event loop only flushes results
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await loop.run_in_executor(None, next, events, None)
+            if event is None:
+                return
+            if event['type'] == 'done':
+                self._response(event['response'])
+            yield event
+
+    async def recommend_batch(self, payload):
+        recommender = self.holder.recommender
+        if recommender is None:
+            return 503, {'error': "Recommender is loading"}
+        queries = payload.get('queries')
+        if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+            return 400, {'error': "'queries' must be a list of strings"}
+        if len(queries) > SERVICE_MAX_BATCH:
+            return 400, {'error': f"At most {SERVICE_MAX_BATCH} queries per batch"}
+        tenant = payload.get('tenant')
+        if tenant is not None and not isinstance(tenant, str):
+            return 400, {'error': "'tenant' must be a string"}
+
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(None, functools.partial(recommender.search, q, tenant=tenant)) for q in queries
+        ))
+        return 200, {'results': [self._response(r) for r in results], 'index_version': self.holder.version}
+
+    async def list_tenants(self, payload):
+        recommender = self.holder.recommender
+        if recommender is None:
+            return 503, {'error': "Recommender is loading"}
+        tenants = recommender.tenants
+        summaries = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: [tenants.describe(tenant_id) for tenant_id in tenants.list_tenants()]
+        )
+        return 200, {'tenants': summaries}
+
+    async def create_tenant(self, payload):
+        recommender = self.holder.recommender
+        if recommender is None:
+            return 503, {'error': "Recommender is loading"}
+        tenant_id = payload.get('tenant_id')
+        if not isinstance(tenant_id, str):
+            return 400, {'error': "'tenant_id' must be a string"}
+
+        # Embedding custom exercises is blocking work
+        create = functools.partial(
+            recommender.tenants.create, tenant_id, equipment=payload.get('equipment'),
+            exclude=payload.get('exclude') or (), custom_exercises=payload.get('custom_exercises') or ()
+        )
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, create)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        return 200, await loop.run_in_executor(None, recommender.tenants.describe, tenant_id)
+
+    async def delete_tenant(self, payload):
+        recommender = self.holder.recommender
+        if recommender is None:
+            return 503, {'error': "Recommender is loading"}
+        tenant_id = payload.get('tenant_id')
+        if not isinstance(tenant_id, str):
+            return 400, {'error': "'tenant_id' must be a string"}
+        try:
+            if tenant_id not in recommender.tenants.list_tenants():
+                return 404, {'error': f"Unknown tenant: {tenant_id}"}
+            recommender.tenants.delete(tenant_id)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        return 200, {'deleted': tenant_id}
+
+    async def status(self, payload):
+        recommender = self.holder.recommender
+        if recommender is None:
+            return 503, {'ready': False}
+        status = await asyncio.get_running_loop().run_in_executor(None, recommender.get_status)
+        status.update({
+            'ready': True,
+            'pid': os.getpid(),
+            'index_version': self.holder.version,
+            'loaded_at': self.holder.loaded_at
+        })
+        return 200, status
+
+    async def metrics(self, payload):
+        return 200, metrics.render_prometheus()
+
+    async def health(self, payload):
+        ready = self.holder.recommender is not None
+        health = {'ready': ready, 'index_version': self.holder.version}
+        if ready:
+            health['index_mapping'] = self.holder.recommender.vectorstore_manager.get_index_mapping()
+        if self.worker is not None:
+            from prefork import memory_usage
+            health.update({'pid': self.worker['pid'], 'startup_ms': self.worker['startup_ms'],
+                           'memory': memory_usage()})
+        return (200 if ready else 503), health
+
+
+app = RecommenderService()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gym Exercise Recommender HTTP service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    parser.add_argument("--preload", action="store_true", default=SERVICE_PRELOAD,
+                        help="initialize the recommender once and fork the workers from it")
+    args = parser.parse_args()
+
+    if args.preload:
+        from prefork import PreforkServer
+        PreforkServer(app, args.host, args.port, args.workers).run()
+        return
+
+    import uvicorn
+    uvicorn.run("service:app", host=args.host, port=args.port, workers=args.workers,
+                timeout_keep_alive=SERVICE_KEEP_ALIVE, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Precomputed exercise-to-exercise kNN graph for substitute lookups"""
+import os
+import numpy as np
+from lexical_index import normalize_phrase, equipment_terms
+from config import SIMILARITY_GRAPH_K
+
+# Filters accepted by SimilarityGraph.neighbors
+GRAPH_FILTERS = ('same_muscle', 'different_equipment', 'equipment')
+
+
+class SimilarityGraph:
+    """Nearest exercises for every row, stored as compact int32 / float16 arrays.
+
+    Each row keeps its ``k`` nearest exercises overall plus its ``k`` nearest
+    with the same main muscle, merged by score, so muscle-constrained lookups
+    still find ``k`` substitutes. Missing slots hold -1.
+    """
+
+    def __init__(self, neighbors, scores, muscle_ids, equipment_ids, muscle_names, equipment_names):
+        self.neighbors = neighbors
+        self.scores = scores
+        self.muscle_ids = muscle_ids
+        self.equipment_ids = equipment_ids
+        self.muscle_names = list(muscle_names)
+        self.equipment_names = list(equipment_names)
+        self._equipment_terms = [equipment_terms(name) for name in self.equipment_names]
+
+    @classmethod
+    def build(cls, vectors, muscles, equipment, k=SIMILARITY_GRAPH_K, block_size=1024):
+        """Build the graph from unit-normalized vectors and per-row muscle / equipment labels"""
+        muscle_ids, muscle_names = _factorize(muscles)
+        equipment_ids, equipment_names = _factorize(equipment, key=normalize_phrase)
+        n = len(vectors)
+        width = 2 * k
+        neighbors = np.full((n, width), -1, dtype=np.int32)
+        scores = np.zeros((n, width), dtype=np.float16)
+
+        for start in range(0, n, block_size):
+            block = slice(start, min(start + block_size, n))
+            similarity = vectors[block] @ vectors.T
+            rows = np.arange(block.start, block.stop)
+            similarity[rows - start, rows] = -np.inf
+
+            same_muscle = np.where(muscle_ids[rows][:, None] == muscle_ids[None, :], similarity, -np.inf)
+            candidates = np.concatenate([_top_k(similarity, k), _top_k(same_muscle, k)], axis=1)
+
+            for i, row_candidates in enumerate(candidates):
+                row_candidates = np.unique(row_candidates)
+                row_scores = similarity[i, row_candidates]
+                keep = np.isfinite(row_scores)
+                row_candidates, row_scores = row_candidates[keep], row_scores[keep]
+                order = np.argsort(-row_scores, kind='stable')
+                neighbors[start + i, :len(order)] = row_candidates[order]
+                scores[start + i, :len(order)] = row_scores[order]
+
+        return cls(neighbors, scores, muscle_ids, equipment_ids, muscle_names, equipment_names)
+
+    def neighbors_of(self, row_id, k=SIMILARITY_GRAPH_K, same_muscle=False, different_equipment=False,
+                     equipment=None):
+        """Up to ``k`` (row_id, similarity) substitutes for a row, most similar first.
+
+        ``equipment`` restricts results to the given equipment names, e.g. what
+        is free in the gym right now; names match case-insensitively and a
+        head term such as "lever" covers every lever variant.
+        """
+        candidates = self.neighbors[row_id]
+        mask = candidates >= 0
+        safe = np.where(mask, candidates, 0)
+        if same_muscle:
+            mask &= self.muscle_ids[safe] == self.muscle_ids[row_id]
+        if different_equipment:
+            mask &= self.equipment_ids[safe] != self.equipment_ids[row_id]
+        if equipment is not None:
+            wanted = {normalize_phrase(name) for name in equipment}
+            allowed = [i for i, terms in enumerate(self._equipment_terms) if terms & wanted]
+            mask &= np.isin(self.equipment_ids[safe], allowed)
+
+        selected = np.flatnonzero(mask)[:k]
+        return [(int(candidates[i]), float(self.scores[row_id, i])) for i in selected]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path,
+            neighbors=self.neighbors,
+            scores=self.scores,
+            muscle_ids=self.muscle_ids,
+            equipment_ids=self.equipment_ids,
+            muscle_names=np.asarray(self.muscle_names, dtype=str),
+            equipment_names=np.asarray(self.equipment_names, dtype=str)
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            # Graphs saved with raw equipment labels: merge case and zero-width-space variants
+            remap, equipment_names = _factorize(data['equipment_names'].tolist(), key=normalize_phrase)
+            return cls(
+                data['neighbors'], data['scores'], data['muscle_ids'], remap[data['equipment_ids']],
+                data['muscle_names'].tolist(), equipment_names
+            )
+
+
+def _factorize(values, key=str):
+    """Integer codes (int32) and the distinct labels they refer to, compared by ``key``"""
+    names, codes = np.unique(np.asarray([key(v) for v in values], dtype=str), return_inverse=True)
+    return codes.astype(np.int32), names.tolist()
+
+
+def _top_k(similarity, k):
+    """Column indices of the k largest entries of each row (unordered)"""
+    k = min(k, similarity.shape[1])
+    return np.argpartition(-similarity, k - 1, axis=1)[:, :k]
@@ -0,0 +1,236 @@
+"""Per-gym catalogue overlays on top of the shared base index"""
+import json
+import os
+import re
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+from attribute_index import AttributeIndex
+from lexical_index import normalize_phrase, equipment_terms
+from data_processor import format_exercise_description
+from config import TENANTS_PATH
+
+# Fields of a custom exercise; anything not given is shown as N/A
+EXERCISE_FIELDS = ['Exercise Name', 'Equipment', 'Variation', 'Utility', 'Mechanics', 'Force', 'Preparation',
+                   'Execution', 'Difficulty (1-5)', 'Main_muscle', 'Synergist_Muscles', 'Secondary Muscles']
+
+
+class CustomDocument:
+    """Stand-in for a langchain Document for exercises that only live in a tenant overlay"""
+
+    def __init__(self, page_content, metadata):
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+class TenantOverlay:
+    """What one gym adds to and removes from the base catalogue.
+
+    ``available`` is a boolean mask over the base rows (stored bit-packed);
+    custom exercises get row ids after the base rows, ``base_size + i``, and
+    are searched by brute force since there are only a handful per gym.
+    """
+
+    def __init__(self, tenant_id, spec, available, custom, vectors, base_version=None, mtime=None):
+        self.tenant_id = tenant_id
+        self.spec = spec
+        self.available = available
+        self.custom = custom
+        self.vectors = vectors
+        self.base_version = base_version
+        self.mtime = mtime
+        self.base_size = len(available)
+        self.documents = [
+            CustomDocument(entry['llm_entry'], {
+                'row_id': self.base_size + i,
+                'Main_muscle': entry['Main_muscle'],
+                'Exercise_Name': entry['Exercise Name'],
+                'Difficulty': entry['Difficulty (1-5)'],
+                'tenant': tenant_id
+            })
+            for i, entry in enumerate(custom)
+        ]
+        self.custom_muscles = [entry['Main_muscle'] for entry in custom]
+        self._attribute_index = None
+
+    @property
+    def size(self):
+        return len(self.custom)
+
+    @property
+    def available_fraction(self):
+        return float(self.available.mean()) if self.base_size else 1.0
+
+    def custom_allowed(self, filters):
+        """Boolean mask over the custom exercises matching attribute ``filters``, None if unfiltered"""
+        if not filters or not self.size:
+            return None
+        if self._attribute_index is None:
+            self._attribute_index = AttributeIndex.from_dataframe(pd.DataFrame(self.custom))
+        return self._attribute_index.to_mask(self._attribute_index.evaluate(filters))
+
+    def search_custom(self, query_vectors, k, allowed=None):
+        """Top custom rows per (unit-normalized) query vector, as (scores, row_ids) matrices.
+
+        Custom rows outside the ``allowed`` mask are returned as -1.
+        """
+        if not self.size:
+            empty = np.empty((len(query_vectors), 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        scores = query_vectors @ self.vectors.T
+        if allowed is not None:
+            scores[:, ~allowed] = -np.inf
+        k = min(k, self.size)
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+        top_scores = np.take_along_axis(scores, order, axis=1)
+        return top_scores, np.where(np.isfinite(top_scores), order + self.base_size, -1)
+
+
+def compute_availability(table, equipment=None, exclude=()):
+    """Base rows a gym can offer: equipment it owns, minus exercises it excludes by name"""
+    available = np.ones(len(table), dtype=bool)
+    if equipment is not None:
+        wanted = {normalize_phrase(name) for name in equipment}
+        owned = table['Equipment'].map(lambda value: bool(equipment_terms(value) & wanted))
+        available &= owned.to_numpy(dtype=bool)
+    if exclude:
+        excluded = {normalize_phrase(name) for name in exclude}
+        available &= ~table['Exercise Name'].map(normalize_phrase).isin(excluded).to_numpy(dtype=bool)
+    return available
+
+
+class TenantRegistry:
+    """Creates, stores and caches tenant overlays for one VectorStoreManager.
+
+    Each tenant is a directory holding a bit-packed availability mask and the
+    vectors of its custom exercises (``overlay.npz``) next to its spec and
+    custom exercises (``tenant.json``). The embedding model and base index
+    are shared, so adding a tenant only embeds its custom exercises.
+    """
+
+    def __init__(self, manager, root=TENANTS_PATH):
+        self.manager = manager
+        self.root = root
+        self._tenants = {}
+        self._lock = threading.Lock()
+
+    def _spec_file(self, tenant_id):
+        return os.path.join(self._tenant_dir(tenant_id), "tenant.json")
+
+    def _tenant_dir(self, tenant_id):
+        if not re.fullmatch(r"[A-Za-z0-9_.-]+", tenant_id or ""):
+            raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+        return os.path.join(self.root, tenant_id)
+
+    def create(self, tenant_id, equipment=None, exclude=(), custom_exercises=()):
+        """Create or replace a tenant.
+
+        ``equipment`` lists what the gym owns (None means everything),
+        ``exclude`` names base exercises it does not offer and
+        ``custom_exercises`` are dicts with at least ``Exercise Name`` and
+        ``Main_muscle``.
+        """
+        spec = {'equipment': list(equipment) if equipment is not None else None, 'exclude': list(exclude)}
+        custom = []
+        for exercise in custom_exercises:
+            if not exercise.get('Exercise Name') or not exercise.get('Main_muscle'):
+                raise ValueError("Custom exercises need an 'Exercise Name' and a 'Main_muscle'")
+            entry = {field: exercise.get(field, 'N/A') for field in EXERCISE_FIELDS}
+            entry['llm_entry'] = format_exercise_description(entry)
+            custom.append(entry)
+
+        vectors = np.empty((0, self.manager.get_vectors().shape[1]), dtype=np.float32)
+        if custom:
+            vectors = np.asarray(self.manager.embedding.embed_documents([e['llm_entry'] for e in custom]),
+                                 dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        overlay = self._make_overlay(tenant_id, spec, custom, vectors)
+        self._save(overlay)
+        with self._lock:
+            self._tenants[tenant_id] = overlay
+        return overlay
+
+    def _make_overlay(self, tenant_id, spec, custom, vectors):
+        available = compute_availability(self.manager.get_exercise_table(), spec['equipment'], spec['exclude'])
+        return TenantOverlay(tenant_id, spec, available, custom, vectors, self.manager.get_index_version())
+
+    def _save(self, overlay):
+        tenant_dir = self._tenant_dir(overlay.tenant_id)
+        os.makedirs(tenant_dir, exist_ok=True)
+        np.savez(
+            os.path.join(tenant_dir, "overlay.npz"),
+            available=np.packbits(overlay.available),
+            base_size=np.int64(overlay.base_size),
+            vectors=overlay.vectors
+        )
+        with open(os.path.join(tenant_dir, "tenant.json"), 'w') as f:
+            json.dump({
+                'tenant_id': overlay.tenant_id,
+                'base_version': overlay.base_version,
+                'spec': overlay.spec,
+                'custom': overlay.custom
+            }, f, indent=2, default=str)
+        overlay.mtime = os.path.getmtime(os.path.join(tenant_dir, "tenant.json"))
+
+    def _load(self, tenant_id, mtime=None):
+        tenant_dir = self._tenant_dir(tenant_id)
+        with open(os.path.join(tenant_dir, "tenant.json"), 'r') as f:
+            payload = json.load(f)
+        with np.load(os.path.join(tenant_dir, "overlay.npz")) as data:
+            base_size = int(data['base_size'])
+            available = np.unpackbits(data['available'], count=base_size).astype(bool)
+            vectors = data['vectors']
+
+        if payload['base_version'] != self.manager.get_index_version():
+            # Base rows moved: recompute the mask from the spec instead of trusting row positions
+            print(f"🔄 Base index changed, refreshing tenant {tenant_id}")
+            overlay = self._make_overlay(tenant_id, payload['spec'], payload['custom'], vectors)
+            self._save(overlay)
+            return overlay
+        return TenantOverlay(tenant_id, payload['spec'], available, payload['custom'], vectors,
+                             payload['base_version'], mtime)
+
+    def get(self, tenant_id):
+        """The overlay for a tenant, loaded from disk on first use.
+
+        Overlays are reloaded when their tenant.json changes and dropped when
+        it is gone, so tenants created or deleted by another process (e.g.
+        another service worker) are picked up.
+        """
+        try:
+            mtime = os.path.getmtime(self._spec_file(tenant_id))
+        except OSError:
+            with self._lock:
+                self._tenants.pop(tenant_id, None)
+            raise KeyError(f"Unknown tenant: {tenant_id}")
+
+        overlay = self._tenants.get(tenant_id)
+        if overlay is None or overlay.mtime != mtime:
+            overlay = self._load(tenant_id, mtime)
+            with self._lock:
+                self._tenants[tenant_id] = overlay
+        return overlay
+
+    def list_tenants(self):
+        if not os.path.exists(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, name, "tenant.json")))
+
+    def describe(self, tenant_id):
+        """Summary of one tenant: its spec, how much of the base catalogue it offers and its custom exercises"""
+        overlay = self.get(tenant_id)
+        return {
+            'tenant_id': tenant_id,
+            'equipment': overlay.spec['equipment'],
+            'exclude': overlay.spec['exclude'],
+            'available_fraction': overlay.available_fraction,
+            'custom_exercises': [entry['Exercise Name'] for entry in overlay.custom]
+        }
+
+    def delete(self, tenant_id):
+        with self._lock:
+            self._tenants.pop(tenant_id, None)
+        shutil.rmtree(self._tenant_dir(tenant_id), ignore_errors=True)
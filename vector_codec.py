@@ -0,0 +1,159 @@
+"""Compressed exercise vectors: float16, PCA-reduced or binary sign codes with exact re-scoring"""
+import os
+import numpy as np
+from config import VECTOR_PCA_DIM, VECTOR_SHORTLIST_FACTOR, VECTOR_SCORE_CHUNK_ROWS, VECTOR_RECALL_K, \
+    VECTOR_RECALL_QUERIES
+
+# Accepted values of VECTOR_COMPRESSION; 'none' keeps the float32 FAISS index
+COMPRESSION_MODES = ('none', 'float16', 'pca', 'binary')
+
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def chunked_scores(queries, rows, decode=None, chunk_rows=VECTOR_SCORE_CHUNK_ROWS):
+    """``queries @ rows.T`` as float32, converting only ``chunk_rows`` stored rows at a time.
+
+    ``decode`` turns a chunk of stored rows into float32 vectors; by default
+    they are cast. The stored matrix (often memory-mapped float16) is never
+    copied as a whole.
+    """
+    scores = np.empty((len(queries), rows.shape[0]), dtype=np.float32)
+    for start in range(0, rows.shape[0], chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        chunk = decode(chunk) if decode is not None else chunk.astype(np.float32)
+        scores[:, start:start + len(chunk)] = queries @ chunk.T
+    return scores
+
+
+def _signs(codes):
+    """Packed sign bits as +1 / -1 float32 vectors"""
+    return np.unpackbits(codes, axis=1).astype(np.float32) * 2.0 - 1.0
+
+
+class CompressedVectors:
+    """First-stage codes held in memory plus float16 row vectors memory-mapped from disk.
+
+    ``float16`` scores the float16 vectors directly. ``pca`` scores codes of
+    ``VECTOR_PCA_DIM`` float16 principal components and ``binary`` one sign
+    bit per dimension (by Hamming distance); both then re-score a shortlist of
+    ``k * VECTOR_SHORTLIST_FACTOR`` rows exactly against the float16 vectors,
+    so only the shortlisted rows' pages are read. Stored rows are widened to
+    float32 ``VECTOR_SCORE_CHUNK_ROWS`` at a time, never as a whole. Scores
+    are cosine similarities of unit vectors.
+    """
+
+    def __init__(self, mode, vectors, codes=None, mean=None, components=None):
+        if mode not in COMPRESSION_MODES[1:]:
+            raise ValueError(f"Unknown vector compression: {mode}. Valid modes: {', '.join(COMPRESSION_MODES)}")
+        self.mode = mode
+        self.vectors = vectors
+        self.codes = codes
+        self.mean = mean
+        self.components = components
+
+    @classmethod
+    def build(cls, vectors, mode, pca_dim=VECTOR_PCA_DIM):
+        """Encode unit-normalized float32 vectors"""
+        vectors = _unit(vectors)
+        codes = mean = components = None
+        if mode == 'pca':
+            mean = vectors.mean(axis=0)
+            # Principal axes of the centred vectors, largest variance first
+            _, _, axes = np.linalg.svd(vectors - mean, full_matrices=False)
+            components = axes[:min(pca_dim, axes.shape[0])].astype(np.float32)
+            codes = ((vectors - mean) @ components.T).astype(np.float16)
+        elif mode == 'binary':
+            codes = np.packbits(vectors > 0, axis=1)
+        return cls(mode, vectors.astype(np.float16), codes, mean, components)
+
+    @property
+    def num_rows(self):
+        return self.vectors.shape[0]
+
+    @property
+    def code_bytes(self):
+        """Bytes per row held in memory for the first stage"""
+        codes = self.vectors if self.codes is None else self.codes
+        return codes.shape[1] * codes.dtype.itemsize
+
+    @property
+    def resident_bytes(self):
+        """Bytes searches can page in: the first-stage codes plus the float16 vectors used for re-scoring"""
+        arrays = [self.vectors] + [a for a in (self.codes, self.mean, self.components) if a is not None]
+        return sum(int(a.nbytes) for a in arrays)
+
+    @classmethod
+    def files(cls, path):
+        """Paths written by ``save(path)``"""
+        return [path, cls._vectors_path(path)]
+
+    def _first_stage(self, queries):
+        """Approximate similarity of every row to every query"""
+        if self.mode == 'pca':
+            return queries @ self.mean[:, None] + chunked_scores(queries @ self.components.T, self.codes)
+        # For +1 / -1 sign vectors the dot product is bits - 2 * Hamming distance, so it ranks the same
+        return chunked_scores(_signs(np.packbits(queries > 0, axis=1)), self.codes, decode=_signs)
+
+    def search(self, queries, k):
+        """(scores, row_ids) of the k most similar rows per query, best first"""
+        queries = _unit(queries)
+        k = min(k, self.num_rows)
+        if self.mode == 'float16':
+            scores = chunked_scores(queries, self.vectors)
+            rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            shortlist = min(self.num_rows, max(k, k * VECTOR_SHORTLIST_FACTOR))
+            approximate = self._first_stage(queries)
+            rows = np.argpartition(-approximate, shortlist - 1, axis=1)[:, :shortlist]
+            # Exact re-scoring touches only the shortlisted rows
+            rescored = np.einsum('qd,qsd->qs', queries, self.vectors[rows].astype(np.float32))
+            best = np.argpartition(-rescored, k - 1, axis=1)[:, :k]
+            rows = np.take_along_axis(rows, best, axis=1)
+
+        scores = np.einsum('qd,qkd->qk', queries, self.vectors[rows].astype(np.float32))
+        order = np.argsort(-scores, axis=1, kind='stable')
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+    def measure_recall(self, vectors, k=VECTOR_RECALL_K, num_queries=VECTOR_RECALL_QUERIES, seed=0):
+        """Mean recall@k against exact float32 search, using stored rows as queries (excluding themselves)"""
+        exact_vectors = _unit(vectors)
+        rng = np.random.default_rng(seed)
+        query_rows = rng.choice(self.num_rows, size=min(num_queries, self.num_rows), replace=False)
+        queries = exact_vectors[query_rows]
+        k = min(k, self.num_rows - 1)
+
+        exact = queries @ exact_vectors.T
+        exact[np.arange(len(query_rows)), query_rows] = -np.inf
+        truth = np.argpartition(-exact, k - 1, axis=1)[:, :k]
+
+        _, found = self.search(queries, k + 1)
+        hits = 0
+        for i, row in enumerate(query_rows):
+            hits += len(set(found[i][found[i] != row][:k].tolist()) & set(truth[i].tolist()))
+        return hits / (k * len(query_rows))
+
+    def save(self, path):
+        """Codes go to ``path`` (.npz); the float16 vectors to a .npy next to it, so they can be memory-mapped"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        arrays = {'mode': np.asarray(self.mode)}
+        for name in ('codes', 'mean', 'components'):
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        np.savez(path, **arrays)
+        np.save(self._vectors_path(path), np.ascontiguousarray(self.vectors))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in ('codes', 'mean', 'components') if name in data}
+            mode = str(data['mode'])
+        vectors = np.load(cls._vectors_path(path), mmap_mode='r' if mmap else None)
+        return cls(mode, vectors, **arrays)
+
+    @staticmethod
+    def _vectors_path(path):
+        return os.path.splitext(path)[0] + "_float16.npy"
@@ -1,18 +1,80 @@
 import pickle
 import os
+import hashlib
 import json
 from datetime import datetime
-from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.docstore.document import Document
+import numpy as np
+from lazy_imports import lazy_import
 from data_processor import GymDataProcessor
-from config import VECTORSTORE_PATH, EMBEDDING_MODEL
+from embedding_batcher import BatchingEmbeddings
+from embedding_cache import CachedEmbeddings
+from lexical_index import LexicalIndex
+from similarity_graph import SimilarityGraph
+from attribute_index import AttributeIndex
+from muscle_matrix import MuscleMatrix
+from vector_codec import CompressedVectors
+from field_index import FieldIndex
+from metrics import metrics
+from config import VECTORSTORE_PATH, EMBEDDING_MODEL, EMBED_BATCHING_ENABLED, EMBED_CACHE_ENABLED, LEXICAL_INDEX_FILE, \
+    VECTORSTORE_MMAP, SIMILARITY_GRAPH_FILE, ATTRIBUTE_INDEX_FILE, MUSCLE_MATRIX_FILE, VECTOR_COMPRESSION, \
+    COMPRESSED_VECTORS_FILE, VECTOR_RECALL_K, MULTI_VECTOR_ENABLED, FIELD_INDEX_FILE
+
+# FAISS and the HuggingFace encoder (torch) load on first use, not on import
+lc_vectorstores = lazy_import("langchain.vectorstores")
+lc_embeddings = lazy_import("langchain.embeddings")
+lc_docstore = lazy_import("langchain.docstore.document")
+lc_embeddings_base = lazy_import("langchain.embeddings.base")
+faiss = lazy_import("faiss")
+
+
+def _register_embeddings():
+    """Let langchain treat the embedding wrappers as Embeddings without importing it up front.
+
+    The wrappers implement the Embeddings protocol without subclassing it;
+    registering them as virtual subclasses keeps FAISS calling their
+    ``embed_query`` instead of treating them as plain callables.
+    """
+    for wrapper in (BatchingEmbeddings, CachedEmbeddings):
+        lc_embeddings_base.Embeddings.register(wrapper)
 
 class VectorStoreManager:
-    def __init__(self):
+    def __init__(self, vectorstore_path=VECTORSTORE_PATH, mmap_index=VECTORSTORE_MMAP,
+                 vector_compression=VECTOR_COMPRESSION, multi_vector=MULTI_VECTOR_ENABLED):
+        self.vectorstore_path = vectorstore_path
+        self.mmap_index = mmap_index
+        self.vector_compression = vector_compression
+        self.multi_vector = multi_vector
         self.vectorstore = None
-        self.embedding = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-        self.metadata_file = os.path.join(VECTORSTORE_PATH, "metadata.json")
+        self.embedding = lc_embeddings.HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        if EMBED_BATCHING_ENABLED:
+            # Concurrent searches share forward passes instead of encoding one prompt each
+            self.embedding = BatchingEmbeddings(self.embedding)
+        if EMBED_CACHE_ENABLED:
+            # Repeated prompts and probe queries are answered without touching the encoder
+            self.embedding = CachedEmbeddings(self.embedding, EMBEDDING_MODEL)
+        self.metadata_file = os.path.join(self.vectorstore_path, "metadata.json")
+        self.lexical_index = None
+        self.lexical_index_file = os.path.join(self.vectorstore_path, LEXICAL_INDEX_FILE)
+        self.attribute_index = None
+        self.attribute_index_file = os.path.join(self.vectorstore_path, ATTRIBUTE_INDEX_FILE)
+        self.muscle_matrix = None
+        self.muscle_matrix_file = os.path.join(self.vectorstore_path, MUSCLE_MATRIX_FILE)
+        self.field_index = None
+        self.field_index_file = os.path.join(self.vectorstore_path, FIELD_INDEX_FILE)
+        self.compressed_vectors = None
+        self.compressed_vectors_file = os.path.join(self.vectorstore_path, COMPRESSED_VECTORS_FILE)
+        self._compression_stats = None
+        self.similarity_graph = None
+        self.similarity_graph_file = os.path.join(self.vectorstore_path, SIMILARITY_GRAPH_FILE)
+        self._exercise_table = None
+        self._vectors = None
+    
+    def get_exercise_table(self):
+        """Get the processed exercise table, whose row order matches the index"""
+        if self._exercise_table is None:
+            processor = GymDataProcessor()
+            self._exercise_table = processor.generate_exercise_descriptions()
+        return self._exercise_table
     
     def _get_data_hash(self):
         """Get a hash of the current data to detect changes"""
@@ -21,7 +83,8 @@ class VectorStoreManager:
             data = processor.generate_exercise_descriptions()
             # Simple hash based on data shape and first few entries
             data_info = f"{len(data)}_{data.iloc[0]['llm_entry'][:100] if len(data) > 0 else ''}"
-            return hash(data_info)
+            # hashlib rather than hash(), which is salted per process and never matches on restart
+            return hashlib.md5(data_info.encode('utf-8')).hexdigest()
         except:
             return None
     
@@ -33,6 +96,8 @@ class VectorStoreManager:
             "embedding_model": EMBEDDING_MODEL,
             "num_documents": self._get_vectorstore_size()
         }
+        if self._compression_stats:
+            metadata["vector_compression"] = self._compression_stats
         
         os.makedirs(os.path.dirname(self.metadata_file), exist_ok=True)
         with open(self.metadata_file, 'w') as f:
@@ -49,20 +114,22 @@ class VectorStoreManager:
         except:
             return None
     
+    def get_index_version(self):
+        """Identifier of the index on disk; it changes whenever the index is rebuilt"""
+        metadata = self._load_metadata()
+        if metadata is None:
+            return None
+        return f"{metadata.get('data_hash')}@{metadata.get('created_at')}"
+    
     def _get_vectorstore_size(self):
         """Get the number of documents in the vectorstore"""
         if self.vectorstore is None:
             return 0
-        try:
-            # This is a rough estimate - FAISS doesn't have a direct count method
-            test_search = self.vectorstore.similarity_search("test", k=1000)
-            return len(test_search)
-        except:
-            return 0
+        return self.vectorstore.index.ntotal
     
     def _vectorstore_exists(self):
         """Check if vectorstore files exist"""
-        return os.path.exists(VECTORSTORE_PATH) and os.path.exists(os.path.join(VECTORSTORE_PATH, "index.faiss"))
+        return os.path.exists(self.vectorstore_path) and os.path.exists(os.path.join(self.vectorstore_path, "index.faiss"))
     
     def _should_rebuild_vectorstore(self):
         """Determine if vectorstore needs to be rebuilt"""
@@ -93,6 +160,7 @@ class VectorStoreManager:
     
     def load_or_create_vectorstore(self, force_rebuild=False):
         """Load existing vectorstore or create new one if needed"""
+        _register_embeddings()
         try:
             # Check if we need to rebuild
             if force_rebuild or self._should_rebuild_vectorstore():
@@ -111,20 +179,64 @@ class VectorStoreManager:
     def _load_existing_vectorstore(self):
         """Load existing vectorstore from disk"""
         try:
-            self.vectorstore = FAISS.load_local(VECTORSTORE_PATH, self.embedding, allow_dangerous_deserialization=True)
+            self.vectorstore = self._read_vectorstore()
+            self._vectors = None
             
-            # Test the vectorstore
-            test_results = self.vectorstore.similarity_search("test", k=1)
-            if not test_results:
+            # Check the vectorstore without scanning (and paging in) the whole index
+            if self.vectorstore.index.ntotal == 0:
                 raise ValueError("Vectorstore appears to be empty")
             
-            print(f"✅ Loaded existing vectorstore with ~{len(test_results)} documents")
+            self._load_lexical_index()
+            self._load_attribute_index()
+            self._load_muscle_matrix()
+            self._load_similarity_graph()
+            self._load_compressed_vectors()
+            self._load_field_index()
+            
+            print(f"✅ Loaded existing vectorstore with {self.vectorstore.index.ntotal} documents")
             return self.vectorstore
             
         except Exception as e:
             print(f"❌ Failed to load existing vectorstore: {e}")
             raise e
     
+    def _read_vectorstore(self):
+        """Read the FAISS index and its docstore once, memory-mapping the index when ``mmap_index`` is set.
+
+        With vector compression the float32 index is always mapped: searches
+        read the compressed vectors, so its pages are only touched to rebuild
+        the codes.
+        """
+        index_file = os.path.join(self.vectorstore_path, "index.faiss")
+        if self._maps_index():
+            # IO_FLAG_MMAP_IFC maps flat indexes too (IO_FLAG_MMAP alone only maps IVF lists), so
+            # processes serving the same index share its page-cache pages instead of a private copy each
+            index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        else:
+            index = faiss.read_index(index_file)
+        with open(os.path.join(self.vectorstore_path, "index.pkl"), 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return lc_vectorstores.FAISS(self.embedding, index, docstore, index_to_docstore_id)
+    
+    def _maps_index(self):
+        return self.mmap_index or self.vector_compression != 'none'
+    
+    def get_index_mapping(self):
+        """How the FAISS index file is mapped into this process, from /proc/self/maps"""
+        index_file = os.path.realpath(os.path.join(self.vectorstore_path, "index.faiss"))
+        mapping = {'mmap': self._maps_index(), 'file': index_file, 'mappings': 0, 'mapped_mb': 0.0}
+        try:
+            with open("/proc/self/maps", 'r') as f:
+                for line in f:
+                    parts = line.split(None, 5)
+                    if len(parts) == 6 and parts[5].strip() == index_file:
+                        start, end = (int(address, 16) for address in parts[0].split('-'))
+                        mapping['mappings'] += 1
+                        mapping['mapped_mb'] += (end - start) / (1024 * 1024)
+        except OSError:
+            mapping['mappings'] = None
+        return mapping
+    
     def _create_new_vectorstore(self):
         """Create a new vectorstore from scratch"""
         try:
@@ -137,24 +249,46 @@ class VectorStoreManager:
             
             print(f"📝 Creating embeddings for {len(data)} exercises...")
             docs = [
-                Document(
+                lc_docstore.Document(
                     page_content=row['llm_entry'], 
                     metadata={
+                        'row_id': row_id,
                         'Main_muscle': row['Main_muscle'],
                         'Exercise_Name': row.get('Exercise Name', 'Unknown'),
                         'Difficulty': row.get('Difficulty (1-5)', 'Unknown')
                     }
                 )
-                for _, row in data.iterrows()
+                for row_id, (_, row) in enumerate(data.iterrows())
             ]
             
             print("🧠 Computing embeddings (this may take a few minutes)...")
-            self.vectorstore = FAISS.from_documents(docs, self.embedding)
+            self.vectorstore = lc_vectorstores.FAISS.from_documents(docs, self.embedding)
+            self._vectors = None
             
             # Save to disk
             print("💾 Saving vectorstore to disk...")
             self._save_vectorstore()
             
+            print("🔤 Building lexical index...")
+            self._build_lexical_index(data)
+            
+            print("🏷️ Building attribute index...")
+            self._build_attribute_index(data)
+            
+            print("💪 Building muscle matrix...")
+            self._build_muscle_matrix(data)
+            
+            print("🕸️ Building similarity graph...")
+            self._build_similarity_graph(data)
+            
+            if self.vector_compression != 'none':
+                print(f"🗜️ Compressing vectors ({self.vector_compression})...")
+                self._build_compressed_vectors()
+            
+            if self.multi_vector:
+                print("🧩 Embedding exercise fields...")
+                self._build_field_index(data)
+            
             # Save metadata
             data_hash = self._get_data_hash()
             self._save_metadata(data_hash)
@@ -169,9 +303,240 @@ class VectorStoreManager:
     def _save_vectorstore(self):
         """Save vectorstore to disk"""
         if self.vectorstore:
-            os.makedirs(VECTORSTORE_PATH, exist_ok=True)
-            self.vectorstore.save_local(VECTORSTORE_PATH)
-            print(f"💾 Vectorstore saved to {VECTORSTORE_PATH}")
+            os.makedirs(self.vectorstore_path, exist_ok=True)
+            self.vectorstore.save_local(self.vectorstore_path)
+            print(f"💾 Vectorstore saved to {self.vectorstore_path}")
+    
+    def _build_lexical_index(self, data):
+        """Build the BM25 index over the exercise table and save it next to the FAISS index"""
+        self.lexical_index = LexicalIndex.from_dataframe(data)
+        self.lexical_index.save(self.lexical_index_file)
+        print(f"🔤 Lexical index saved to {self.lexical_index_file}")
+    
+    def _load_lexical_index(self):
+        """Load the BM25 index, building it if the vectorstore predates it"""
+        try:
+            if os.path.exists(self.lexical_index_file):
+                self.lexical_index = LexicalIndex.load(self.lexical_index_file)
+            else:
+                print("🔤 No lexical index found, building one...")
+                self._build_lexical_index(self.get_exercise_table())
+        except Exception as e:
+            print(f"⚠️ Lexical index unavailable, using dense search only: {e}")
+            self.lexical_index = None
+    
+    def _build_attribute_index(self, data):
+        """Build the attribute bitmaps over the exercise table and save them next to the FAISS index"""
+        self.attribute_index = AttributeIndex.from_dataframe(data)
+        self.attribute_index.save(self.attribute_index_file)
+        print(f"🏷️ Attribute index saved to {self.attribute_index_file}")
+    
+    def _load_attribute_index(self):
+        """Load the attribute bitmaps, building them if the vectorstore predates them"""
+        try:
+            if os.path.exists(self.attribute_index_file):
+                self.attribute_index = AttributeIndex.load(self.attribute_index_file)
+            else:
+                print("🏷️ No attribute index found, building one...")
+                self._build_attribute_index(self.get_exercise_table())
+        except Exception as e:
+            print(f"⚠️ Attribute index unavailable, filters disabled: {e}")
+            self.attribute_index = None
+    
+    def _build_muscle_matrix(self, data):
+        """Parse the muscle columns into the exercise x muscle x role matrix and save it next to the FAISS index"""
+        self.muscle_matrix = MuscleMatrix.from_dataframe(data)
+        self.muscle_matrix.save(self.muscle_matrix_file)
+        print(f"💪 Muscle matrix saved to {self.muscle_matrix_file}")
+    
+    def _load_muscle_matrix(self):
+        """Load the muscle matrix, building it if the vectorstore predates it"""
+        try:
+            if os.path.exists(self.muscle_matrix_file):
+                self.muscle_matrix = MuscleMatrix.load(self.muscle_matrix_file)
+            else:
+                print("💪 No muscle matrix found, building one...")
+                self._build_muscle_matrix(self.get_exercise_table())
+            if self.muscle_matrix.matrix.shape[0] != self.vectorstore.index.ntotal:
+                raise ValueError("muscle matrix does not match the vectorstore")
+        except Exception as e:
+            print(f"⚠️ Muscle matrix unavailable: {e}")
+            self.muscle_matrix = None
+    
+    def _build_similarity_graph(self, data):
+        """Build the exercise kNN graph from the stored vectors and save it next to the FAISS index"""
+        self.similarity_graph = SimilarityGraph.build(self.get_vectors(), data['Main_muscle'], data['Equipment'])
+        self.similarity_graph.save(self.similarity_graph_file)
+        print(f"🕸️ Similarity graph saved to {self.similarity_graph_file}")
+    
+    def _load_similarity_graph(self):
+        """Load the kNN graph, building it if the vectorstore predates it"""
+        try:
+            if os.path.exists(self.similarity_graph_file):
+                self.similarity_graph = SimilarityGraph.load(self.similarity_graph_file)
+            else:
+                print("🕸️ No similarity graph found, building one...")
+                self._build_similarity_graph(self.get_exercise_table())
+            if len(self.similarity_graph.neighbors) != self.vectorstore.index.ntotal:
+                raise ValueError("similarity graph does not match the vectorstore")
+        except Exception as e:
+            print(f"⚠️ Similarity graph unavailable: {e}")
+            self.similarity_graph = None
+    
+    def _build_compressed_vectors(self):
+        """Encode the exact vectors with the configured compression and measure its recall"""
+        vectors = self._reconstruct_vectors()
+        compressed = CompressedVectors.build(vectors, self.vector_compression)
+        compressed.save(self.compressed_vectors_file)
+        # Everything the compressed path keeps: codes and float16 vectors, plus the float32 index it maps
+        float32_bytes = vectors.nbytes
+        disk_bytes = sum(os.path.getsize(path) for path in CompressedVectors.files(self.compressed_vectors_file))
+        disk_bytes += os.path.getsize(os.path.join(self.vectorstore_path, "index.faiss"))
+        mb = 1024 * 1024
+        self._compression_stats = {
+            "mode": compressed.mode,
+            "dimensions": int(vectors.shape[1]),
+            "code_bytes_per_vector": compressed.code_bytes,
+            "float32_mb": round(float32_bytes / mb, 2),
+            "resident_mb": round(compressed.resident_bytes / mb, 2),
+            "disk_mb": round(disk_bytes / mb, 2),
+            "memory_reduction": round(float32_bytes / compressed.resident_bytes, 2),
+            "recall_at_k": round(compressed.measure_recall(vectors), 4),
+            "recall_k": VECTOR_RECALL_K
+        }
+        self.compressed_vectors = CompressedVectors.load(self.compressed_vectors_file)
+        self._vectors = None
+        stats = self._compression_stats
+        print(f"🗜️ {compressed.mode} vectors: {stats['resident_mb']} MB resident vs {stats['float32_mb']} MB float32 "
+              f"({stats['memory_reduction']}x), {stats['disk_mb']} MB on disk, "
+              f"recall@{VECTOR_RECALL_K} {stats['recall_at_k']:.3f}")
+    
+    def _load_compressed_vectors(self):
+        """Load the compressed vectors, (re)building them when the configured mode changed"""
+        self.compressed_vectors = None
+        if self.vector_compression == 'none':
+            return
+        try:
+            metadata = self._load_metadata() or {}
+            self._compression_stats = metadata.get("vector_compression")
+            stats = self._compression_stats or {}
+            # Stats without resident_mb predate footprint reporting: rebuild to measure it
+            if os.path.exists(self.compressed_vectors_file) and stats.get("mode") == self.vector_compression \
+                    and "resident_mb" in stats:
+                self.compressed_vectors = CompressedVectors.load(self.compressed_vectors_file)
+            else:
+                print(f"🗜️ Compressing vectors ({self.vector_compression})...")
+                self._build_compressed_vectors()
+                # Keep created_at, so the index version (and serving workers) do not change
+                metadata["vector_compression"] = self._compression_stats
+                with open(self.metadata_file, 'w') as f:
+                    json.dump(metadata, f, indent=2)
+            if self.compressed_vectors.num_rows != self.vectorstore.index.ntotal:
+                raise ValueError("compressed vectors do not match the vectorstore")
+        except Exception as e:
+            print(f"⚠️ Compressed vectors unavailable, searching the float32 index: {e}")
+            self.compressed_vectors = None
+    
+    def _build_field_index(self, data):
+        """Embed the name, muscle and execution fields separately and save them next to the FAISS index"""
+        self.field_index = FieldIndex.build(data, self.embedding.embed_documents)
+        self.field_index.save(self.field_index_file)
+        print(f"🧩 Field index saved to {self.field_index_file}")
+    
+    def _load_field_index(self):
+        """Load the per-field vectors, building them if the vectorstore predates them"""
+        self.field_index = None
+        if not self.multi_vector:
+            return
+        try:
+            if os.path.exists(self.field_index_file):
+                self.field_index = FieldIndex.load(self.field_index_file)
+            else:
+                print("🧩 No field index found, embedding exercise fields...")
+                self._build_field_index(self.get_exercise_table())
+            if self.field_index.num_rows != self.vectorstore.index.ntotal:
+                raise ValueError("field index does not match the vectorstore")
+        except Exception as e:
+            print(f"⚠️ Field index unavailable, using single-vector search: {e}")
+            self.field_index = None
+    
+    def embed_queries(self, queries):
+        """Embed several queries in one call, as a float32 matrix"""
+        with metrics.timer('embed'):
+            if hasattr(self.embedding, 'embed_queries'):
+                vectors = self.embedding.embed_queries(list(queries))
+            else:
+                vectors = [self.embedding.embed_query(q) for q in queries]
+        return np.asarray(vectors, dtype=np.float32).reshape(len(queries), -1)
+    
+    def search_vectors(self, query_vectors, k, field_weights=None):
+        """Batched search, returning (distances, row_ids) matrices with one row per query.
+
+        With compressed vectors, or ``field_weights`` from ``field_index.weights``,
+        the distances are squared L2 distances between unit vectors and the
+        float32 FAISS index is not read.
+        """
+        k = min(k, self.vectorstore.index.ntotal)
+        with metrics.timer('search'):
+            if field_weights is not None and self.field_index is not None:
+                scores, rows = self.field_index.search(query_vectors, field_weights, k)
+                return 2.0 - 2.0 * scores, rows
+            if self.compressed_vectors is not None:
+                scores, rows = self.compressed_vectors.search(query_vectors, k)
+                return 2.0 - 2.0 * scores, rows
+            return self.vectorstore.index.search(np.ascontiguousarray(query_vectors, dtype=np.float32), k)
+    
+    def score_rows(self, query_vectors, rows, field_weights=None):
+        """Similarity of every query to the given rows, exact (or field-fused with ``field_weights``)"""
+        if field_weights is not None and self.field_index is not None:
+            return self.field_index.score(query_vectors, field_weights, rows)
+        norms = np.linalg.norm(query_vectors, axis=1, keepdims=True)
+        return (query_vectors / np.where(norms == 0, 1, norms)) @ self.get_vectors()[rows].T
+    
+    def _reconstruct_vectors(self):
+        index = self.vectorstore.index
+        vectors = index.reconstruct_n(0, index.ntotal).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+    
+    def get_vectors(self):
+        """All exercise vectors as a unit-normalized matrix in row order.
+
+        float32, or the memory-mapped float16 vectors when compression is on.
+        """
+        if self.compressed_vectors is not None:
+            return self.compressed_vectors.vectors
+        if self._vectors is None:
+            self._vectors = self._reconstruct_vectors()
+        return self._vectors
+    
+    def get_documents(self, row_ids):
+        """Look up the documents stored for the given row ids"""
+        id_map = self.vectorstore.index_to_docstore_id
+        return [self.vectorstore.docstore.search(id_map[row_id]) for row_id in row_ids]
+    
+    def prewarm_query_cache(self, queries=()):
+        """Embed known hot queries up front so they never reach the encoder on a request"""
+        if not isinstance(self.embedding, CachedEmbeddings):
+            return 0
+
+        try:
+            return self.embedding.prewarm(queries)
+        except Exception as e:
+            print(f"⚠️ Could not prewarm query cache: {e}")
+            return 0
+    
+    def get_embedding_stats(self):
+        """Get cache and batching statistics for the embedding stack"""
+        stats = {}
+        embedding = self.embedding
+        while embedding is not None:
+            if isinstance(embedding, CachedEmbeddings):
+                stats['cache'] = embedding.get_stats()
+            elif isinstance(embedding, BatchingEmbeddings):
+                stats['batching'] = embedding.get_stats()
+            embedding = getattr(embedding, 'embedding', None)
+        return stats
     
     def get_info(self):
         """Get information about the current vectorstore"""
@@ -181,7 +546,7 @@ class VectorStoreManager:
         metadata = self._load_metadata()
         info = {
             "status": "loaded",
-            "path": VECTORSTORE_PATH,
+            "path": self.vectorstore_path,
             "embedding_model": EMBEDDING_MODEL,
             "estimated_documents": self._get_vectorstore_size()
         }
@@ -189,7 +554,8 @@ class VectorStoreManager:
         if metadata:
             info.update({
                 "created_at": metadata.get("created_at"),
-                "data_hash": metadata.get("data_hash")
+                "data_hash": metadata.get("data_hash"),
+                "vector_compression": metadata.get("vector_compression")
             })
         
         return info
@@ -202,10 +568,10 @@ class VectorStoreManager:
     def delete_vectorstore(self):
         """Delete the existing vectorstore files"""
         try:
-            if os.path.exists(VECTORSTORE_PATH):
+            if os.path.exists(self.vectorstore_path):
                 import shutil
-                shutil.rmtree(VECTORSTORE_PATH)
-                print(f"🗑️ Deleted vectorstore at {VECTORSTORE_PATH}")
+                shutil.rmtree(self.vectorstore_path)
+                print(f"🗑️ Deleted vectorstore at {self.vectorstore_path}")
             else:
                 print("📁 No vectorstore to delete")
         except Exception as e:
@@ -1,8 +1,10 @@
 """Data visualization utilities"""
-import matplotlib.pyplot as plt
-import seaborn as sns
+from lazy_imports import lazy_import
 from data_processor import GymDataProcessor
 
+plt = lazy_import("matplotlib.pyplot")
+sns = lazy_import("seaborn")
+
 class GymDataVisualizer:
     def __init__(self):
         self.processor = GymDataProcessor()
@@ -0,0 +1,141 @@
+"""Multi-day workout plans from one vectorized scoring pass and a greedy assignment"""
+import time
+import numpy as np
+from lexical_index import normalize_phrase, equipment_terms
+from config import PLAN_EXERCISES_PER_MUSCLE, PLAN_REDUNDANCY_WEIGHT, PLAN_EQUIPMENT_REPEAT_PENALTY, \
+    PLAN_MECHANICS_BONUS, PLAN_JITTER
+
+
+class WorkoutPlanner:
+    """Fills every slot of a weekly split at once.
+
+    A slot is one exercise for one muscle on one day. All slots are scored
+    against all exercises as a single matrix; infeasible pairs (wrong muscle,
+    too hard, unavailable equipment) are -inf. The solver then repeatedly
+    fills the open slot with the fewest feasible exercises left with its best
+    exercise, removes that exercise (and its same-name variants) everywhere,
+    and penalizes similar exercises and repeated equipment on the same day.
+    """
+
+    def __init__(self, table, vectors, name_ids=None):
+        self.muscle_names = sorted(table['Main_muscle'].astype(str).unique())
+        muscle_lookup = {name: i for i, name in enumerate(self.muscle_names)}
+        self.muscle_ids = table['Main_muscle'].astype(str).map(muscle_lookup).to_numpy()
+        self.difficulty = table['Difficulty (1-5)'].fillna(0).to_numpy(dtype=np.float32)
+        self.compound = (table['Mechanics'].astype(str) == 'Compound').to_numpy()
+        self.exercise_names = table['Exercise Name'].map(normalize_phrase).to_numpy()
+
+        equipment = table['Equipment'].astype(str)
+        self.equipment_names, self.equipment_ids = np.unique(equipment.to_numpy(), return_inverse=True)
+        self._equipment_terms = [equipment_terms(name) for name in self.equipment_names]
+
+        self.vectors = vectors
+        self.name_ids = np.asarray(name_ids) if name_ids is not None else np.arange(len(table))
+
+        # How typical each exercise is of its muscle: similarity to the muscle's centroid
+        centroids = np.stack([vectors[self.muscle_ids == m].mean(axis=0) for m in range(len(self.muscle_names))])
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        self.typicality = vectors @ centroids.T
+
+    def _muscle_id(self, muscle):
+        for i, name in enumerate(self.muscle_names):
+            if name.lower() == str(muscle).strip().lower():
+                return i
+        raise ValueError(f"Unknown muscle: {muscle}. Valid muscles: {', '.join(self.muscle_names)}")
+
+    def _equipment_mask(self, equipment):
+        if equipment is None:
+            return np.ones(len(self.equipment_ids), dtype=bool)
+        wanted = {normalize_phrase(name) for name in equipment}
+        allowed = [i for i, terms in enumerate(self._equipment_terms) if terms & wanted]
+        return np.isin(self.equipment_ids, allowed)
+
+    def _expand_slots(self, days, per_muscle):
+        """(day index, muscle id, position within that muscle) for every slot"""
+        slots = []
+        for day, spec in enumerate(days):
+            counts = spec if isinstance(spec, dict) else {muscle: per_muscle for muscle in spec}
+            for muscle, count in counts.items():
+                muscle_id = self._muscle_id(muscle)
+                slots.extend((day, muscle_id, position) for position in range(count))
+        return np.asarray(slots, dtype=np.int64).reshape(-1, 3)
+
+    def generate(self, days, per_muscle=PLAN_EXERCISES_PER_MUSCLE, max_difficulty=5, equipment=None,
+                 exclude=(), seed=None, day_names=None):
+        """Generate a plan for a split such as ``[['Chest', 'Upper Arms'], ['Back'], {'Thighs': 3}]``.
+
+        Returns a dict with one entry per day listing ``row_id``, ``muscle`` and
+        ``score`` for each exercise, the slots that could not be filled, and the
+        time taken. ``exclude`` names exercises to leave out, matched like a
+        gym's excluded exercises. ``seed`` adds a small deterministic jitter so
+        members with the same split get different plans.
+        """
+        start = time.perf_counter()
+        slots = self._expand_slots(days, per_muscle)
+        slot_days, slot_muscles, positions = slots[:, 0], slots[:, 1], slots[:, 2]
+
+        # Score every slot against every exercise in one pass
+        feasible = self.muscle_ids[None, :] == slot_muscles[:, None]
+        feasible &= (self.difficulty <= max_difficulty)[None, :]
+        feasible &= self._equipment_mask(equipment)[None, :]
+        if exclude:
+            excluded = [normalize_phrase(name) for name in exclude]
+            feasible &= ~np.isin(self.exercise_names, excluded)[None, :]
+
+        scores = self.typicality[:, slot_muscles].T.copy()
+        # Lead each muscle with a compound movement, follow up with isolation work
+        wants_compound = (positions == 0)[:, None]
+        scores += PLAN_MECHANICS_BONUS * (wants_compound == self.compound[None, :])
+        if seed is not None:
+            scores += PLAN_JITTER * np.random.default_rng(seed).random(scores.shape, dtype=np.float32)
+        scores[~feasible] = -np.inf
+
+        assignment = np.full(len(slots), -1, dtype=np.int64)
+        assigned_scores = np.zeros(len(slots), dtype=np.float32)
+        open_slots = np.ones(len(slots), dtype=bool)
+        while open_slots.any():
+            # Most constrained open slot first, so scarce exercises go where they are needed
+            options = np.isfinite(scores).sum(axis=1)
+            options[~open_slots] = np.iinfo(options.dtype).max
+            slot = int(np.argmin(options))
+            open_slots[slot] = False
+            if options[slot] == 0:
+                continue
+
+            row = int(np.argmax(scores[slot]))
+            assignment[slot] = row
+            assigned_scores[slot] = scores[slot, row]
+
+            # Never repeat an exercise (or a variant with the same name) anywhere in the week
+            scores[:, self.name_ids == self.name_ids[row]] = -np.inf
+            scores[slot] = -np.inf
+
+            # Keep the rest of the day varied
+            same_day = open_slots & (slot_days == slot_days[slot])
+            if same_day.any():
+                penalty = PLAN_REDUNDANCY_WEIGHT * np.maximum(self.vectors @ self.vectors[row], 0)
+                penalty += PLAN_EQUIPMENT_REPEAT_PENALTY * (self.equipment_ids == self.equipment_ids[row])
+                scores[same_day] -= penalty[None, :]
+
+        plan_days = []
+        for day in range(len(days)):
+            in_day = np.flatnonzero(slot_days == day)
+            plan_days.append({
+                'day': day_names[day] if day_names else f"Day {day + 1}",
+                'muscles': [self.muscle_names[m] for m in dict.fromkeys(slot_muscles[in_day].tolist())],
+                'exercises': [
+                    {'row_id': int(assignment[s]), 'muscle': self.muscle_names[slot_muscles[s]],
+                     'score': float(assigned_scores[s])}
+                    for s in in_day if assignment[s] >= 0
+                ]
+            })
+
+        unfilled = [
+            {'day': plan_days[slot_days[s]]['day'], 'muscle': self.muscle_names[slot_muscles[s]]}
+            for s in np.flatnonzero(assignment < 0)
+        ]
+        return {
+            'days': plan_days,
+            'unfilled': unfilled,
+            'elapsed_ms': (time.perf_counter() - start) * 1000.0
+        }